@@ -0,0 +1,141 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Compare scanning throughput of the bytes (mmap) and str engines of rename.py.
+
+A corpus of files of mixed sizes is scanned, and rewritten in memory, by each
+engine. The bytes engine is measured reading every file, mapping every file, and
+with its default threshold (``rename.MMAP_THRESHOLD``) between the two. The str
+engine decodes each file as UTF-8, as replace_in_file did previously.
+
+Usage:
+    python -m benchmarks.bench_engine [megabytes_per_size ...]
+
+"""
+
+import os
+import sys
+import tempfile
+from collections.abc import Callable
+
+import rename
+
+from .common import timer
+
+
+SIZES: tuple[int, ...] = (1 << 10, 16 << 10, 64 << 10, 256 << 10, 4 << 20)
+LINE: bytes = b"def function(argument):  # some ordinary line of python source\n"
+
+
+def make_corpus(root: str, n_files: int, size: int) -> list[str]:
+    """Write n_files of (about) size bytes, one in a hundred mentioning PyTemplate."""
+    paths: list[str] = []
+    body: bytes = LINE * (size // len(LINE) + 1)
+    for n in range(n_files):
+        path: str = os.path.join(root, f"{size}_{n}.py")
+        with open(path, "wb") as f:
+            f.write(body[: size - 11])
+            f.write(b"PyTemplate\n" if n % 100 == 0 else b"# nothing.\n")
+        paths.append(path)
+
+    return paths
+
+
+def str_engine(path: str, replacer: rename.Replacer) -> int:
+    """Read, decode, and search text; encode replacements (the previous engine)."""
+    with open(path, "rb") as f:
+        os.fstat(f.fileno())
+        content: str = f.read().decode("utf-8")
+    if not replacer.search(content):
+        return 0
+    replacer.sub(content).encode("utf-8")
+
+    return 1
+
+
+def bytes_engine(threshold: int) -> Callable[[str, rename.Replacer], int]:
+    """Map (or read) and search bytes; splice replacements at the byte level."""
+
+    def engine(path: str, replacer: rename.Replacer) -> int:
+        rename.MMAP_THRESHOLD = threshold
+        with open(path, "rb") as f:
+            buffer = rename._contents(f, os.fstat(f.fileno()))
+            try:
+                if not replacer.find(buffer):
+                    return 0
+                replacer.splice(buffer)
+            finally:
+                if not isinstance(buffer, bytes):
+                    buffer.close()
+
+        return 1
+
+    return engine
+
+
+def run(
+    engine: Callable[[str, rename.Replacer], int],
+    paths: list[str],
+    replacer: rename.Replacer,
+) -> float:
+    """Time a single scan of every path."""
+    with timer() as elapsed:
+        for path in paths:
+            engine(path, replacer)
+
+    return elapsed[0]
+
+
+def main(corpus: list[int]) -> None:
+    """Benchmark entry point."""
+    default: int = rename.MMAP_THRESHOLD
+    engines: dict[str, Callable[[str, rename.Replacer], int]] = {
+        "str": str_engine,
+        "bytes (read)": bytes_engine(sys.maxsize),
+        "bytes (mmap)": bytes_engine(0),
+        "bytes": bytes_engine(default),
+    }
+    replacer = rename.Replacer({"PyTemplate": "Renamed"})
+    print(f"{'size':>9} {'files':>6} {'engine':>13} {'seconds':>9} {'MB/s':>9}")
+    for megabytes in corpus:
+        for size in SIZES:
+            n_files: int = max(4, (megabytes << 20) // size)
+            with tempfile.TemporaryDirectory() as root:
+                paths: list[str] = make_corpus(root, n_files, size)
+                for name, engine in engines.items():
+                    # NOTE: The page cache is warm after the first of several repeats.
+                    seconds: float = min(run(engine, paths, replacer) for _ in range(4))
+                    rate: float = size * n_files / seconds / 1e6
+                    print(f"{size:>9} {n_files:>6} {name:>13}", end=" ")
+                    print(f"{seconds:>9.3f} {rate:>9.1f}")
+    rename.MMAP_THRESHOLD = default
+
+
+if __name__ == "__main__":
+    main([int(j) for j in sys.argv[1:]] or [16])
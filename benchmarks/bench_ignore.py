@@ -0,0 +1,75 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Compare ignore backends of rename.py by subprocess spawns and wall time.
+
+Usage:
+    python -m benchmarks.bench_ignore [n_files ...]
+
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+
+import rename
+
+from .common import SpawnCounter, make_repo, timer
+
+
+def run(root: str, backend: str) -> tuple[int, float, int]:
+    """Dry run both rename phases, returning spawns, wall time, and matches."""
+    counter = SpawnCounter()
+    with contextlib.redirect_stdout(io.StringIO()), counter.patch(), timer() as elapsed:
+        git_root: str = rename.find_git_root(root)
+        ignored = rename.ignore_filter(root, git_root, backend, timeout=10)
+        total: int = rename.update_project_name(
+            root, "PyTemplate", "Renamed", True, git_root, ignored=ignored
+        )
+        total += rename.rename_directories_and_files(
+            root, "PyTemplate", "Renamed", True, git_root, ignored=ignored
+        )
+
+    return counter.count, elapsed[0], total
+
+
+def main(sizes: list[int]) -> None:
+    """Benchmark entry point."""
+    print(f"{'files':>8} {'backend':>13} {'spawns':>8} {'seconds':>9} {'matches':>8}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            make_repo(root, size)
+            for backend in ("check-ignore", "ls-files", "native"):
+                spawns, seconds, total = run(root, backend)
+                print(f"{size:>8} {backend:>13} {spawns:>8} {seconds:>9.3f} {total:>8}")
+
+
+if __name__ == "__main__":
+    main([int(j) for j in sys.argv[1:]] or [200, 1000])
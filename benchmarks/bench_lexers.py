@@ -0,0 +1,228 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Compare token throughput of the custom documentation lexers (docs/source/_ext).
+
+A large Python corpus (the sources of this repository, repeated) is tokenized by
+the stock PythonLexer, by a replica of the previous post-processing of
+MixinLexer (sequential comparisons per punctuation token, and a token type
+lookup per bracket), and by CustomPythonLexer with bracket coloring enabled,
+disabled (``n_brackets=0``), and skipped for a style without ``Punctuation.LevelN``
+colors, by the compiled master regex engine (``engine="machine"``) of the python
+and cython lexers, and by the standard library tokenizer (``engine="tokenize"``) of
+the python lexer. As regular expression matching dominates tokenization, the
+post-processing alone is also measured, replaying a pre-tokenized stream.
+
+Lastly, the corpus is split into snippets (top level definitions), tokenized by a
+pool of threads with a single shared lexer, or with a lexer instantiated per
+snippet (with and without a style to inspect).
+
+Usage:
+    python -m benchmarks.bench_lexers [megabytes ...]
+
+"""
+
+import os
+import sys
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar
+
+from pygments.lexer import Lexer, RegexLexer
+from pygments.lexers.python import PythonLexer
+from pygments.token import Name, Punctuation, _TokenType
+
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "docs", "source", "_ext"))
+
+from lexers import (  # noqa: E402
+    CustomCythonLexer,
+    CustomPythonLexer,
+    MixinLexer,
+    python_tokens,
+)
+from utils import get_bracket_level  # noqa: E402
+
+from .common import timer  # noqa: E402
+
+
+SOURCES: tuple[str, ...] = (
+    "rename.py",
+    os.path.join("src", "PyTemplate", "engine.py"),
+    os.path.join("docs", "source", "_ext", "lexers.py"),
+)
+
+
+class LegacyMixin(MixinLexer):
+    """Post-processing of MixinLexer prior to precomputed bracket levels."""
+
+    def __init__(self, **options) -> None:
+        super().__init__(**options)
+        self._indices: list[int] = []
+
+    def get_tokens_unprocessed(
+        self,
+        text,
+        stack=("root",),
+    ) -> Iterator[tuple[int, _TokenType, str]]:
+        _token: _TokenType
+        tokens = super(MixinLexer, self).get_tokens_unprocessed(text, stack)
+        for idx, token, value in tokens:
+            _token = token
+            if token is Name and value.isupper():
+                _token = Name.Constant
+
+            elif token is Punctuation:
+                # NOTE: Equivalent to the match statement (of or-patterns) it replaced.
+                if value in ("(", "[", "{", "<"):
+                    level: int = len(self._indices) % self.n_brackets
+                    self._indices.append(level)
+                    _token = get_bracket_level(level)
+                elif value in ("}", "]", ")", ">"):
+                    _token = (
+                        get_bracket_level(self._indices.pop())
+                        if self._indices
+                        else Punctuation.Error
+                    )
+
+            yield idx, _token, value
+
+
+class LegacyPythonLexer(LegacyMixin, PythonLexer):
+    """CustomPythonLexer with its previous post-processing."""
+
+    tokens = python_tokens
+
+
+class Replay(RegexLexer):
+    """Replay a pre-tokenized stream in place of regular expression matching."""
+
+    tokens: ClassVar[dict[str, list]] = {"root": []}
+    stream: ClassVar[list[tuple[int, _TokenType, str]]] = []
+
+    def get_tokens_unprocessed(
+        self,
+        text,
+        stack=("root",),
+    ) -> Iterator[tuple[int, _TokenType, str]]:
+        yield from self.stream
+
+
+class LegacyReplay(LegacyMixin, Replay):
+    """Previous post-processing of a replayed stream."""
+
+
+class CustomReplay(MixinLexer, Replay):
+    """Current post-processing of a replayed stream."""
+
+
+def make_corpus(megabytes: int) -> str:
+    """Concatenate repository sources until the corpus reaches megabytes."""
+    text: str = ""
+    for source in SOURCES:
+        with open(os.path.join(ROOT, source), encoding="utf-8") as f:
+            text += f.read()
+
+    return text * max(1, (megabytes << 20) // len(text))
+
+
+def run(lexer: Lexer, text: str) -> tuple[int, float]:
+    """Time the tokenization of text, returning the number of tokens produced."""
+    n_tokens: int = 0
+    with timer() as elapsed:
+        for _ in lexer.get_tokens_unprocessed(text):
+            n_tokens += 1
+
+    return n_tokens, elapsed[0]
+
+
+def run_threads(
+    lexer: Callable[[], Lexer],
+    snippets: list[str],
+    n_threads: int,
+) -> tuple[int, float]:
+    """Time the tokenization of snippets by a pool of threads."""
+
+    def tokenize(snippet: str) -> int:
+        return sum(1 for _ in lexer().get_tokens(snippet))
+
+    with ThreadPoolExecutor(n_threads) as pool, timer() as elapsed:
+        n_tokens: int = sum(pool.map(tokenize, snippets))
+
+    return n_tokens, elapsed[0]
+
+
+def main(corpus: list[int], n_threads: int = 8) -> None:
+    """Benchmark entry point."""
+    lexers: dict[str, Lexer] = {
+        "pygments": PythonLexer(),
+        "legacy": LegacyPythonLexer(),
+        "custom": CustomPythonLexer(),
+        "n_brackets=0": CustomPythonLexer(n_brackets=0),
+        "style=default": CustomPythonLexer(style="default"),
+        "machine": CustomPythonLexer(engine="machine"),
+        "tokenize": CustomPythonLexer(engine="tokenize"),
+        "cython": CustomCythonLexer(),
+        "cython machine": CustomCythonLexer(engine="machine"),
+        "replay legacy": LegacyReplay(),
+        "replay custom": CustomReplay(),
+        "replay off": CustomReplay(n_brackets=0),
+    }
+    print(f"{'MB':>5} {'lexer':>14} {'tokens':>9} {'seconds':>9} {'tokens/s':>11}")
+    for megabytes in corpus:
+        text: str = make_corpus(megabytes)
+        Replay.stream = list(RegexLexer.get_tokens_unprocessed(lexers["custom"], text))
+        for name, lexer in lexers.items():
+            n_tokens, seconds = min(
+                (run(lexer, text) for _ in range(5)), key=lambda r: r[1]
+            )
+            print(f"{len(text) / 1e6:>5.1f} {name:>14} {n_tokens:>9}", end=" ")
+            print(f"{seconds:>9.3f} {n_tokens / seconds:>11.0f}")
+
+    shared = CustomPythonLexer()
+    factories: dict[str, Callable[[], Lexer]] = {
+        "shared": lambda: shared,
+        "per call": CustomPythonLexer,
+        "per call style": lambda: CustomPythonLexer(style="styles.VSCodeDarkPlus"),
+    }
+    print(f"\n{'MB':>5} {'lexer':>14} {'snippets':>9} {'seconds':>9} {'tokens/s':>11}")
+    for megabytes in corpus:
+        snippets: list[str] = make_corpus(megabytes).split("\n\n\n")
+        for name, factory in factories.items():
+            n_tokens, seconds = min(
+                (run_threads(factory, snippets, n_threads) for _ in range(5)),
+                key=lambda r: r[1],
+            )
+            print(f"{megabytes:>5} {name:>14} {len(snippets):>9}", end=" ")
+            print(f"{seconds:>9.3f} {n_tokens / seconds:>11.0f}")
+
+
+if __name__ == "__main__":
+    main([int(j) for j in sys.argv[1:]] or [4])
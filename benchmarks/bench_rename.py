@@ -0,0 +1,175 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Time rename.py end to end on synthetic repositories, dry and real.
+
+Each size is generated once (reproducibly), then every measurement runs on a
+fresh copy of it, so real runs never see the changes of a previous run. Copies
+are made outside of the timed region.
+
+Usage:
+    python -m benchmarks.bench_rename [n_files ...] [--json PATH] [options]
+
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections.abc import Callable
+
+import rename
+
+from .common import SpawnCounter, make_repo, timer
+
+
+def _update(root: str, dry_run: bool) -> int:
+    git_root: str = rename.find_git_root(root)
+    ignored = rename.ignore_filter(root, git_root, "ls-files")
+
+    return rename.update_project_name(
+        root, "PyTemplate", "Renamed", dry_run, git_root, ignored=ignored
+    )
+
+
+def _rename(root: str, dry_run: bool) -> int:
+    git_root: str = rename.find_git_root(root)
+    ignored = rename.ignore_filter(root, git_root, "ls-files")
+
+    return rename.rename_directories_and_files(
+        root, "PyTemplate", "Renamed", dry_run, git_root, ignored=ignored
+    )
+
+
+def _main(root: str, dry_run: bool, options: tuple[str, ...] = ()) -> int:
+    argv: list[str] = ["rename.py", "--path", root, "--new-name", "Renamed", "-q"]
+    argv += ["--no-manifest", "--no-journal", "--report", "json", *options]
+    if dry_run:
+        argv.append("--dry-run")
+
+    stdout = io.StringIO()
+    original: list[str] = sys.argv
+    sys.argv = argv
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(
+            io.StringIO()
+        ):
+            rename.main()
+    finally:
+        sys.argv = original
+
+    return json.loads(stdout.getvalue())["total"]
+
+
+TARGETS: dict[str, Callable[[str, bool], int]] = {
+    "update_project_name": _update,
+    "rename_directories_and_files": _rename,
+    "main": _main,
+    "main --jobs 4": lambda root, dry_run: _main(root, dry_run, ("--jobs", "4")),
+}
+
+
+def measure(
+    template: str, target: Callable[[str, bool], int], dry_run: bool
+) -> tuple[float, int, int]:
+    """Time a target on a fresh copy of template, returning seconds, spawns, count."""
+    with tempfile.TemporaryDirectory() as directory:
+        root: str = os.path.join(directory, "repo")
+        shutil.copytree(template, root, symlinks=True)
+        counter = SpawnCounter()
+        with contextlib.redirect_stdout(io.StringIO()), counter.patch(), timer() as t:
+            count: int = target(root, dry_run)
+
+    return t[0], counter.count, count
+
+
+def parse_args() -> argparse.Namespace:
+    """Define and return parsed arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[1000, 10000])
+    parser.add_argument("--json", help="Also write results to this file.")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--sizes-bytes", type=int, nargs="+", default=[256, 4096])
+    parser.add_argument("--binary-ratio", type=float, default=0.05)
+    parser.add_argument("--match-density", type=float, default=0.1)
+    parser.add_argument("--ignore-rules", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Benchmark entry point."""
+    args: argparse.Namespace = parse_args()
+    results: list[dict] = []
+    header: str = f"{'files':>7} {'target':>28} {'mode':>4} {'seconds':>8}"
+    print(f"{header} {'files/s':>9} {'spawns':>6} {'count':>6}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as template:
+            make_repo(
+                template,
+                size,
+                depth=args.depth,
+                sizes=args.sizes_bytes,
+                binary_ratio=args.binary_ratio,
+                match_density=args.match_density,
+                ignore_rules=args.ignore_rules,
+                seed=args.seed,
+            )
+            for name, target in TARGETS.items():
+                for dry_run in (True, False):
+                    seconds, spawns, count = min(
+                        measure(template, target, dry_run) for _ in range(args.repeat)
+                    )
+                    mode: str = "dry" if dry_run else "real"
+                    row: str = f"{size:>7} {name:>28} {mode:>4} {seconds:>8.3f}"
+                    print(f"{row} {size / seconds:>9.0f} {spawns:>6} {count:>6}")
+                    results.append(
+                        {
+                            "files": size,
+                            "target": name,
+                            "dry_run": dry_run,
+                            "seconds": seconds,
+                            "spawns": spawns,
+                            "count": count,
+                        }
+                    )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"options": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
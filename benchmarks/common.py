@@ -0,0 +1,165 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Shared helpers to construct synthetic repositories and measure rename.py."""
+
+import contextlib
+import math
+import os
+import random
+import subprocess
+import time
+from collections.abc import Iterator, Sequence
+from typing import Optional
+
+
+def git(root: str, *args: str) -> None:
+    """Run a quiet git command within root."""
+    subprocess.run(
+        ["git", "-C", root, *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def make_repo(
+    root: str,
+    n_files: int,
+    fanout: int = 8,
+    name: str = "PyTemplate",
+    *,
+    depth: Optional[int] = None,
+    sizes: Sequence[int] = (16,),
+    binary_ratio: float = 0.0,
+    match_density: float = 0.25,
+    ignore_rules: int = 0,
+    seed: int = 0,
+) -> str:
+    """Create a (reproducible) git repository with n_files over a balanced tree.
+
+    Args:
+        root (str): Directory in which to create the repository.
+        n_files (int): Number of files created.
+        fanout (int): Number of subdirectories of each directory.
+        name (str): Project name mentioned by files, and carried by directories.
+        depth (int): Depth of the tree, overriding fanout if given.
+        sizes (Sequence[int]): Sizes of (text) files, each chosen at random.
+        binary_ratio (float): Fraction of files with binary content.
+        match_density (float): Fraction of text files which mention name.
+        ignore_rules (int): Number of additional .gitignore rules, spread over
+            the root and nested .gitignore files.
+        seed (int): Seed of every random choice.
+
+    Every eighth directory carries name, and one in ten files is untracked but
+    ignored (``*.log``).
+
+    """
+    rng = random.Random(seed)
+    if depth is not None:
+        fanout = max(2, math.ceil(n_files ** (1 / max(1, depth))))
+
+    git(root, "init", "-q")
+    rules: list[str] = ["*.log", "build/"]
+    nested: dict[str, list[str]] = {}
+    for i in range(ignore_rules):
+        rule: str = rng.choice(
+            [f"*.tmp{i}", f"gen_{i}/", f"**/cache_{i}", f"!keep_{i}.log", f"[a-c]x{i}?"]
+        )
+        if i % 3 == 2:
+            nested.setdefault(f"dir_{i % fanout}", []).append(rule)
+        else:
+            rules.append(rule)
+    with open(os.path.join(root, ".gitignore"), "w", encoding="utf-8") as f:
+        f.write("\n".join(rules) + "\n")
+
+    line: bytes = b"import os  # an ordinary line of python source\n"
+    for n in range(n_files):
+        parts: list[str] = []
+        k: int = n // fanout
+        while k:
+            k, r = divmod(k - 1, fanout)
+            parts.append(f"{name}_{r}" if r % 8 == 0 else f"dir_{r}")
+        directory = os.path.join(root, *reversed(parts))
+        os.makedirs(directory, exist_ok=True)
+
+        content: bytes
+        if rng.random() < binary_ratio:
+            content = b"\x89PNG\r\n\x1a\n\x00" + rng.randbytes(rng.choice(sizes))
+        else:
+            size: int = rng.choice(sizes)
+            content = (line * (size // len(line) + 1))[:size]
+            if rng.random() < match_density:
+                content += f"import {name}\n".encode()
+        suffix: str = ".log" if n % 10 == 0 else ".py"
+        with open(os.path.join(directory, f"file_{n}{suffix}"), "wb") as f:
+            f.write(content)
+
+    for directory, lines in nested.items():
+        if os.path.isdir(os.path.join(root, directory)):
+            with open(
+                os.path.join(root, directory, ".gitignore"), "w", encoding="utf-8"
+            ) as f:
+                f.write("\n".join(lines) + "\n")
+
+    git(root, "add", "-A")
+
+    return root
+
+
+class SpawnCounter:
+    """Count calls made to subprocess.run while active."""
+
+    def __init__(self) -> None:
+        self.count: int = 0
+
+    @contextlib.contextmanager
+    def patch(self) -> Iterator["SpawnCounter"]:
+        original = subprocess.run
+
+        def counted(*args, **kwargs):
+            self.count += 1
+            return original(*args, **kwargs)
+
+        subprocess.run = counted  # type: ignore[assignment]
+        try:
+            yield self
+        finally:
+            subprocess.run = original  # type: ignore[assignment]
+
+
+@contextlib.contextmanager
+def timer() -> Iterator[list[float]]:
+    """Measure elapsed wall time (seconds), stored as the sole list element."""
+    elapsed: list[float] = [0.0]
+    start: float = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed[0] = time.perf_counter() - start
@@ -0,0 +1,289 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Persistent, content-addressed cache of highlighted code blocks.
+
+Rendered code blocks (including viewcode module pages) are stored in memory, with
+least recently used eviction, and on disk, shared between builds (e.g. each
+version built by sphinx_multiversion). Entries are keyed by a hash of the source
+text, lexer, lexer options, style, formatter, and a fingerprint of the custom
+extensions (and pygments version) responsible for their rendering.
+
+"""
+
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+import pygments
+from sphinx import highlighting
+from sphinx.application import Sphinx
+from sphinx.highlighting import PygmentsBridge, lexer_classes
+from sphinx.util import logging
+
+
+logger = logging.getLogger(__name__)
+
+# NOTE: Modules which determine the rendering of a code block.
+SOURCES: tuple[str, ...] = (
+    "lexers.py",
+    "machine.py",
+    "styles.py",
+    "tokenizer.py",
+    "utils.py",
+)
+
+
+def _qualname(obj: Any) -> str:
+    """Fully qualified name of a class (or its repr)."""
+    if isinstance(obj, type):
+        return f"{obj.__module__}.{obj.__qualname__}"
+
+    return repr(obj)
+
+
+def fingerprint(directory: str = os.path.dirname(__file__)) -> str:
+    """Hash the contents of custom extensions, and the pygments version."""
+    digest = hashlib.sha256(pygments.__version__.encode())
+    for name in SOURCES:
+        with open(os.path.join(directory, name), "rb") as f:
+            digest.update(name.encode())
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+@contextmanager
+def _warnings() -> Iterator[list[Any]]:
+    """Records logged by the highlighter (i.e. warnings), while within context."""
+    records: list[Any] = []
+
+    def record(entry: Any) -> bool:
+        records.append(entry)
+        return True
+
+    target = highlighting.logger.logger
+    target.addFilter(record)
+    try:
+        yield records
+    finally:
+        target.removeFilter(record)
+
+
+class HighlightCache:
+    """Two tier (memory, then disk) cache of highlighted code blocks.
+
+    Args:
+        directory (str): Directory of the on disk store (disabled if empty).
+        maxsize (int): Maximum number of entries kept in memory.
+
+    """
+
+    directory: str
+    maxsize: int
+    _memory: OrderedDict[str, str]
+
+    def __init__(self, directory: str = "", maxsize: int = 1024) -> None:
+        self.directory = os.path.expanduser(directory)
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._fingerprint = fingerprint()
+        # NOTE: Hits, hits from disk, and misses, in shared memory, inherited by
+        # the worker processes forked by a parallel (-j) build.
+        self._counts = multiprocessing.Array("q", 3)
+
+    def _count(self, hit: bool, disk: bool = False) -> None:
+        with self._counts.get_lock():
+            self._counts[0 if hit else 2] += 1
+            self._counts[1] += disk
+
+    @property
+    def hits(self) -> int:
+        """Number of code blocks served from the cache."""
+        return self._counts[0]
+
+    @property
+    def disk_hits(self) -> int:
+        """Number of code blocks served from disk (rather than memory)."""
+        return self._counts[1]
+
+    @property
+    def misses(self) -> int:
+        """Number of code blocks rendered."""
+        return self._counts[2]
+
+    def key(self, bridge: PygmentsBridge, source: str, lang: str, *args: Any) -> str:
+        """Hash every input to the rendering of source, as highlighted by bridge."""
+        digest = hashlib.sha256(self._fingerprint.encode())
+        for part in (
+            bridge.dest,
+            _qualname(bridge.formatter),
+            *(f"{k}={_qualname(v)}" for k, v in sorted(bridge.formatter_args.items())),
+            lang,
+            _qualname(lexer_classes.get(lang)),
+            *(repr(a) for a in args),
+            source,
+        ):
+            digest.update(part.encode())
+            digest.update(b"\0")
+
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.html")
+
+    def get(self, key: str) -> Optional[str]:
+        """Retrieve a rendered code block, from memory, or else from disk."""
+        try:
+            self._memory.move_to_end(key)
+            self._count(True)
+            return self._memory[key]
+        except KeyError:
+            pass
+
+        if self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    value: str = f.read()
+            except OSError:
+                pass
+            else:
+                self._count(True, True)
+                self._remember(key, value)
+                return value
+
+        self._count(False)
+        return None
+
+    def _remember(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, value: str) -> None:
+        """Store a rendered code block, in memory and on disk."""
+        self._remember(key, value)
+        if not self.directory:
+            return
+
+        path: str = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # NOTE: Concurrent builds may write the same entry; readers only ever
+            # observe a complete file, since it is renamed into place.
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("highlight cache: unable to store %s (%s)", path, e)
+
+    def wrap(self, bridge: PygmentsBridge) -> None:
+        """Serve bridge.highlight_block from the cache (unless it warned)."""
+        highlight_block: Callable[..., str] = bridge.highlight_block
+
+        def cached(
+            source: str,
+            lang: str,
+            opts: Optional[dict[str, Any]] = None,
+            force: bool = False,
+            location: Any = None,
+            **kwargs: Any,
+        ) -> str:
+            if not isinstance(source, str):
+                source = source.decode()
+            # NOTE: location only determines where warnings (if any) are reported.
+            key: str = self.key(
+                bridge,
+                source,
+                lang,
+                sorted((opts or {}).items()),
+                force,
+                sorted(kwargs.items()),
+            )
+            value: Optional[str] = self.get(key)
+            if value is None:
+                with _warnings() as warnings:
+                    value = highlight_block(
+                        source, lang, opts, force, location, **kwargs
+                    )
+                # NOTE: Blocks which warned (e.g. lexing errors) are not stored, so
+                # every build reports their warnings (and fails with -W).
+                if not warnings:
+                    self.put(key, value)
+
+            return value
+
+        bridge.highlight_block = cached  # type: ignore[method-assign]
+
+    def report(self) -> str:
+        """Summarize cache hits and misses."""
+        total: int = self.hits + self.misses
+        rate: float = 100 * self.hits / total if total else 0.0
+
+        return (
+            f"highlight cache: {self.hits} hit(s) ({self.disk_hits} from disk), "
+            f"{self.misses} miss(es), {rate:.1f}% hit rate."
+        )
+
+
+def _builder_inited(app: Sphinx) -> None:
+    highlighter: Optional[PygmentsBridge] = getattr(app.builder, "highlighter", None)
+    if highlighter is None:
+        return
+    cache = HighlightCache(
+        app.config.highlight_cache_dir, app.config.highlight_cache_size
+    )
+    cache.wrap(highlighter)
+    app.highlight_cache = cache  # type: ignore[attr-defined]
+
+
+def _build_finished(app: Sphinx, exception: Optional[Exception]) -> None:
+    cache: Optional[HighlightCache] = getattr(app, "highlight_cache", None)
+    if cache is not None:
+        logger.info(cache.report())
+
+
+def setup(app: Sphinx) -> dict[str, Any]:
+    """Register the highlight cache with a sphinx application."""
+    app.add_config_value("highlight_cache_dir", "", "")
+    app.add_config_value("highlight_cache_size", 1024, "")
+    app.connect("builder-inited", _builder_inited)
+    app.connect("build-finished", _build_finished)
+
+    return {
+        "version": "0.0.1",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
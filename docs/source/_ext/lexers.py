@@ -27,12 +27,20 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-"""Customized python lexer."""
+"""Customized python (and cython) lexers, as a sphinx extension.
+
+Usage:
+    Add ``lexers`` to the extensions of a sphinx configuration (with this directory
+    on sys.path), replacing the default python and cython lexers.
+
+"""
 
 from collections import deque
 from collections.abc import Iterator
-from typing import ClassVar
+from typing import TYPE_CHECKING, Any, ClassVar, Optional
 
+import machine
+import tokenizer
 from pygments.lexer import bygroups, combined, include, words
 from pygments.lexers.python import CythonLexer, PythonLexer, RegexLexer
 from pygments.token import (
@@ -47,7 +55,12 @@ from pygments.token import (
     Whitespace,
     _TokenType,
 )
-from utils import get_bracket_level
+from pygments.util import get_choice_opt
+from utils import count_bracket_levels, nbrackets
+
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
 
 
 def _find(it, obj, key=lambda a, b: a == b) -> int:
@@ -64,35 +77,75 @@ def _get_index(n: int):
     return inner
 
 
+# NOTE: Brackets which open (True) or close (False) a level of nesting.
+BRACKETS: dict[str, bool] = {
+    "(": True,
+    "[": True,
+    "{": True,
+    "<": True,
+    ")": False,
+    "]": False,
+    "}": False,
+    ">": False,
+}
+
+
+ENGINES: tuple[str, ...] = ("regex", "machine")
+
+
 class MixinLexer(RegexLexer):
     """Regex Mixin Lexer class.
 
+    Options:
+        n_brackets (int): Number of bracket levels colored in rotation (0 disables
+            bracket coloring).
+        style (Union[str, type[Style]]): Style the output is highlighted with. When
+            it colors no ``Punctuation.LevelN`` tokens, brackets are not recolored.
+        engine (str): Either ``regex`` (default), matching each rule of a state in
+            turn, or ``machine``, matching a compiled alternation of the rules of
+            each state (see machine.py). Python lexers also accept ``tokenize``,
+            driven by the standard library tokenizer (see tokenizer.py). All
+            produce identical tokens.
+
     Notes:
         1. Supports primitive rainbow bracket coloring.
         2. Supports primitive constant declaration (uppercase variables)
+        3. Bracket depth is scoped to each call, so a single instance may be shared
+           (e.g. by threads).
 
     """
 
+    engines: ClassVar[tuple[str, ...]] = ENGINES
     n_brackets: int
-    _stack: deque[int]
+    engine: str
+    _levels: tuple[_TokenType, ...]
+    _brackets: dict[str, bool]
 
     def __init__(self, **options) -> None:
         self.n_brackets = int(options.pop("n_brackets", 4))
+        style = options.pop("style", None)
+        self.engine = get_choice_opt(options, "engine", self.engines, "regex")
+        options.pop("engine", None)
         super().__init__(**options)
-        self._stack = deque[int]()
-
-    def _enter(self) -> _TokenType:
+        # NOTE: Token types of each level are looked up once, rather than per bracket.
+        self._levels = tuple(nbrackets(self.n_brackets))
+        recolor: bool = bool(self._levels) and (
+            style is None or count_bracket_levels(style) > 0
+        )
+        self._brackets = BRACKETS if recolor else {}
+
+    def _enter(self, depth: deque[_TokenType]) -> _TokenType:
         """Retrieve next token in cycle."""
-        idx = len(self._stack) % self.n_brackets
-        self._stack.append(idx)
+        token: _TokenType = self._levels[len(depth) % self.n_brackets]
+        depth.append(token)
 
-        return get_bracket_level(idx)
+        return token
 
-    def _exit(self) -> _TokenType:
+    @staticmethod
+    def _exit(depth: deque[_TokenType]) -> _TokenType:
         """Remove element from stack and return token."""
         try:
-            idx: int = self._stack.pop()
-            return get_bracket_level(idx)
+            return depth.pop()
 
         # NOTE: Only additional ending brackets trigger this (e.g. `{{ }}}` ).
         # NOTE: We are not attempting to detect correct matching brackets (e.g. `(]` )
@@ -105,19 +158,28 @@ class MixinLexer(RegexLexer):
         stack=("root",),
     ) -> Iterator[tuple[int, _TokenType, str]]:
         _token: _TokenType
-        for idx, token, value in super().get_tokens_unprocessed(text, stack):
+        opening: Optional[bool]
+        brackets: dict[str, bool] = self._brackets
+        # NOTE: Bracket depth is local to each call (rather than instance), so that
+        # calls neither interfere with each other, nor inherit unbalanced brackets.
+        depth = deque[_TokenType]()
+        tokens: Iterator[tuple[int, _TokenType, str]]
+        if self.engine == "machine":
+            tokens = machine.tokenize(self, text, stack)
+        elif self.engine == "tokenize":
+            tokens = tokenizer.tokenize(self, text, stack)
+        else:
+            tokens = super().get_tokens_unprocessed(text, stack)
+        for idx, token, value in tokens:
             _token = token
-            if token is Name and value.isupper():
-                _token = Name.Constant
+            if token is Name:
+                if value.isupper():
+                    _token = Name.Constant
 
             elif token is Punctuation:
-                match value:
-                    case "(" | "[" | "{" | "<":
-                        _token = self._enter()
-                    case "}" | "]" | ")" | ">":
-                        _token = self._exit()
-                    case _:
-                        ...
+                opening = brackets.get(value)
+                if opening is not None:
+                    _token = self._enter(depth) if opening else self._exit(depth)
 
             yield idx, _token, value
 
@@ -230,6 +292,7 @@ class CustomPythonLexer(MixinLexer, PythonLexer):
 
     """
 
+    engines: ClassVar[tuple[str, ...]] = (*ENGINES, "tokenize")
     tokens: ClassVar[dict[str, list]] = python_tokens
 
 
@@ -478,3 +541,17 @@ class CustomCythonLexer(MixinLexer, CythonLexer):
     """Custom enhanced regex-based cython lexer."""
 
     tokens: ClassVar[dict[str, list]] = cython_tokens
+
+
+def setup(app: "Sphinx") -> dict[str, Any]:
+    """Register custom lexers with a sphinx application."""
+    # NOTE: Lexers are registered by class, and instantiated (stateless between
+    # calls) by each process of a parallel build.
+    app.add_lexer("python", CustomPythonLexer)
+    app.add_lexer("cython", CustomCythonLexer)
+
+    return {
+        "version": "0.0.1",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
@@ -0,0 +1,376 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Compiled (master regex) state machine engine of regex lexers.
+
+Pygments' RegexLexer attempts each rule of the current state, in order, at every
+position. Here, consecutive rules of each state are compiled into a single
+alternation of named groups, so a single match (in C) finds the first matching
+rule, identified by ``lastgroup``. As an alternation commits to its first
+matching alternative, the match of each rule is identical to the one RegexLexer
+finds, and so is the token stream.
+
+To avoid attempting alternatives which cannot match at all, each alternation is
+also compiled (on first use) for each ascii character, holding only those rules
+(in order) which may start with that character. The next character of the text
+selects the alternation matched.
+
+Rules whose flags differ from the lexer's (e.g. a leading ``(?i)``) are scoped to
+their alternative, as ``(?i:...)``. Rules which cannot be combined (back references,
+named or conditional groups) are matched on their own, in order. Callbacks (e.g.
+bygroups) receive a match of their own rule, so group numbers are preserved.
+
+"""
+
+import re
+from collections.abc import Generator, Iterator, Sequence
+from typing import Any, Callable, Optional, Union
+
+from pygments.lexer import RegexLexer
+from pygments.token import Error, Whitespace, _TokenType
+
+
+try:
+    from re import _parser as sre_parse  # type: ignore[attr-defined]
+except ImportError:  # NOTE: python < 3.11
+    import sre_parse
+
+
+Rule = tuple[Callable[..., Optional[re.Match]], Any, Any]
+Match = Callable[..., Optional[re.Match]]
+# NOTE: A segment matches one (single) rule, or else a table of combined rules,
+# selecting the alternation matched by the next character (if dispatched).
+Segment = tuple[Match, Optional["Dispatch"], Optional[Rule], dict[str, Rule]]
+Machine = dict[str, list[Segment]]
+
+# NOTE: Constructs which depend on group numbering (or names) of a rule.
+UNCOMBINABLE: re.Pattern = re.compile(r"\\[1-9]|\\g<|\(\?P[=<]|\(\?\(|\(\?<\w")
+ASCII: int = 128
+# NOTE: Largest character range enumerated within the first characters of a rule.
+MAX_RANGE: int = 256
+GLOBAL_FLAGS: re.Pattern = re.compile(r"^\(\?[aiLmsux]+\)")
+SCOPED_FLAGS: dict[int, str] = {
+    re.IGNORECASE: "i",
+    re.MULTILINE: "m",
+    re.DOTALL: "s",
+    re.VERBOSE: "x",
+}
+
+_MACHINES: dict[type, Machine] = {}
+
+
+def _pattern(rule: Rule) -> re.Pattern:
+    """Compiled regular expression of a rule (bound to its match method)."""
+    return rule[0].__self__  # type: ignore[attr-defined]
+
+
+def _alternative(pattern: re.Pattern, flags: int) -> Optional[str]:
+    """Express pattern as an alternative of a regex with flags (if possible)."""
+    if UNCOMBINABLE.search(pattern.pattern) is not None:
+        return None
+    if pattern.flags == flags:
+        return pattern.pattern
+    if (pattern.flags ^ flags) & ~sum(SCOPED_FLAGS):
+        return None
+    add: str = "".join(c for f, c in SCOPED_FLAGS.items() if pattern.flags & ~flags & f)
+    remove: str = "".join(
+        c for f, c in SCOPED_FLAGS.items() if flags & ~pattern.flags & f
+    )
+
+    scope: str = f"{add}-{remove}" if remove else add
+
+    return f"(?{scope}:{GLOBAL_FLAGS.sub('', pattern.pattern)})"
+
+
+# NOTE: Regular expressions of character categories (which a rule may start with).
+CATEGORIES: dict[Any, str] = {
+    sre_parse.CATEGORY_DIGIT: r"\d",
+    sre_parse.CATEGORY_NOT_DIGIT: r"\D",
+    sre_parse.CATEGORY_SPACE: r"\s",
+    sre_parse.CATEGORY_NOT_SPACE: r"\S",
+    sre_parse.CATEGORY_WORD: r"\w",
+    sre_parse.CATEGORY_NOT_WORD: r"\W",
+}
+
+# NOTE: Characters a rule may start with, and categories (or ranges) of characters.
+First = tuple[set[int], set[str]]
+
+
+def _never(text: str, pos: int) -> None:
+    """Match nothing (in place of a dispatched alternation)."""
+
+
+def _first(pattern: Sequence) -> tuple[Optional[First], bool]:
+    """Characters a parsed pattern may start with (None if any), and if nullable."""
+    chars: set[int] = set()
+    classes: set[str] = set()
+    first: Optional[First]
+    nullable: bool
+    for op, av in pattern:
+        if op is sre_parse.LITERAL:
+            first, nullable = ({av}, set()), False
+        elif op is sre_parse.IN:
+            first, nullable = _first_in(av), False
+        elif op is sre_parse.CATEGORY:
+            first, nullable = _first_in([(op, av)]), False
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue  # NOTE: zero width assertions only further restrict a match.
+        elif op is sre_parse.SUBPATTERN:
+            if av[1] & re.IGNORECASE:
+                return None, True
+            first, nullable = _first(av[-1])
+        elif op is sre_parse.BRANCH:
+            first, nullable = (set(), set()), False
+            for branch in av[1]:
+                alternative, empty = _first(branch)
+                if alternative is None:
+                    return None, True
+                first[0].update(alternative[0])
+                first[1].update(alternative[1])
+                nullable |= empty
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) or (
+            op is getattr(sre_parse, "POSSESSIVE_REPEAT", None)
+        ):
+            first, nullable = _first(av[2])
+            nullable |= av[0] == 0
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            first, nullable = _first(av)
+        else:
+            return None, True
+        if first is None:
+            return None, True
+        chars |= first[0]
+        classes |= first[1]
+        if not nullable:
+            return (chars, classes), False
+
+    return (chars, classes), True
+
+
+def _first_in(items: Sequence) -> Optional[First]:
+    chars: set[int] = set()
+    classes: set[str] = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.add(av)
+        elif op is sre_parse.RANGE and av[1] - av[0] < MAX_RANGE:
+            chars.update(range(av[0], av[1] + 1))
+        elif op is sre_parse.RANGE:
+            classes.add(f"[{re.escape(chr(av[0]))}-{re.escape(chr(av[1]))}]")
+        elif op is sre_parse.CATEGORY and av in CATEGORIES:
+            classes.add(CATEGORIES[av])
+        else:
+            return None
+
+    return chars, classes
+
+
+def _starts(pattern: re.Pattern) -> tuple[Optional[First], bool]:
+    if pattern.flags & re.IGNORECASE:
+        return None, True
+
+    return _first(sre_parse.parse(pattern.pattern, pattern.flags))
+
+
+class Dispatch(dict):
+    """Alternations of rules, by the character they are attempted at (compiled lazily).
+
+    Ascii characters select an alternation of those rules which may start with them.
+    Any other character (or none, at the end of text) selects an alternation of
+    every rule which may start with it: those naming characters outside of ascii,
+    those with categories (or large ranges) of characters, those which may match
+    nothing, or those which are not analyzed.
+
+    """
+
+    def __init__(self, group: list[tuple[str, Rule]], flags: int) -> None:
+        super().__init__()
+        self.group = group
+        self.flags = flags
+        self.starts = [_starts(_pattern(rule)) for _, rule in group]
+        self.classes: dict[str, Match] = {
+            j: re.compile(j, flags).fullmatch
+            for first, _ in self.starts
+            if first is not None
+            for j in first[1]
+        }
+        self.compiled: dict[tuple[int, ...], Match] = {}
+
+    def _may_start(self, first: Optional[First], nullable: bool, c: str) -> bool:
+        if first is None or nullable:
+            return True
+        if c and ord(c) < ASCII:
+            return ord(c) in first[0] or any(self.classes[j](c) for j in first[1])
+        return bool(first[1]) or max(first[0], default=0) >= ASCII
+
+    def __missing__(self, c: str) -> Match:
+        indices = tuple(n for n, j in enumerate(self.starts) if self._may_start(*j, c))
+        if indices not in self.compiled:
+            pattern: str = "|".join(f"(?P<_{n}>{self.group[n][0]})" for n in indices)
+            # NOTE: An empty alternation never matches.
+            self.compiled[indices] = re.compile(pattern or "(?!)", self.flags).match
+        match: Match = self.compiled[indices]
+        self[c] = match
+
+        return match
+
+
+def _segments(rules: list[Rule], flags: int) -> list[Segment]:
+    """Compile consecutive combinable rules of a state into alternations."""
+    segments: list[Segment] = []
+    group: list[tuple[str, Rule]] = []
+
+    def flush() -> None:
+        if len(group) == 1:
+            segments.append((group[0][1][0], None, group[0][1], {}))
+        elif group:
+            table: dict[str, Rule] = {f"_{n}": j[1] for n, j in enumerate(group)}
+            segments.append((_never, Dispatch(list(group), flags), None, table))
+        group.clear()
+
+    alternative: Optional[str]
+    for rule in rules:
+        alternative = _alternative(_pattern(rule), flags)
+        if alternative is not None:
+            group.append((alternative, rule))
+            continue
+        flush()
+        segments.append((rule[0], None, rule, {}))
+    flush()
+
+    return segments
+
+
+def compile_machine(cls: type[RegexLexer]) -> Machine:
+    """Compile (and cache) the states of a regex lexer class (once instantiated)."""
+    try:
+        return _MACHINES[cls]
+    except KeyError:
+        pass
+    flags: int = re.compile("", cls.flags).flags
+    machine: Machine = {
+        state: _segments(rules, flags) for state, rules in cls._tokens.items()
+    }
+    _MACHINES[cls] = machine
+
+    return machine
+
+
+def tokenize(
+    lexer: RegexLexer,
+    text: str,
+    stack: tuple[str, ...] = ("root",),
+) -> Iterator[tuple[int, _TokenType, str]]:
+    """Split text into (index, tokentype, value), as RegexLexer does."""
+    yield from run(lexer, text, 0, list(stack))
+
+
+def run(
+    lexer: RegexLexer,
+    text: str,
+    pos: int,
+    statestack: list[str],
+    until: Optional[int] = None,
+) -> Generator[tuple[int, _TokenType, str], None, int]:
+    """Tokenize text from pos, returning the position where tokenization stopped.
+
+    Args:
+        lexer: Lexer instance, whose rules are applied.
+        text: Source text.
+        pos: Index of text to start from, in state statestack[-1].
+        statestack: Stack of lexer states, modified in place.
+        until: Stop at the first position at or beyond this index, at which the
+            lexer is back in its root state. Defaults to the end of text.
+
+    Returns:
+        Index of text where tokenization stopped.
+
+    """
+    machine: Machine = compile_machine(type(lexer))
+    segments: list[Segment] = machine[statestack[-1]]
+    if until is None:
+        until = len(text) + 1
+    m: Optional[re.Match]
+    segment: Segment
+    dispatch: Optional[Dispatch]
+    new_state: Union[tuple, int, str, None]
+    while 1:
+        if pos >= until and statestack == ["root"]:
+            return pos
+        for segment in segments:
+            dispatch = segment[1]
+            if dispatch is None:
+                m = segment[0](text, pos)
+            else:
+                m = dispatch[text[pos : pos + 1]](text, pos)
+            if m:
+                break
+        else:
+            # NOTE: As RegexLexer, when no rule matches (see its comments).
+            try:
+                if text[pos] == "\n":
+                    statestack = ["root"]
+                    segments = machine["root"]
+                    yield pos, Whitespace, "\n"
+                    pos += 1
+                    continue
+                yield pos, Error, text[pos]
+                pos += 1
+            except IndexError:
+                return pos
+            continue
+
+        _, _, single, table = segment
+        rexmatch, action, new_state = single or table[m.lastgroup]  # type: ignore[index]
+        if action is not None:
+            if type(action) is _TokenType:
+                yield pos, action, m.group()
+            else:
+                yield from action(lexer, m if single else rexmatch(text, pos))
+        pos = m.end()
+        if new_state is not None:
+            if isinstance(new_state, tuple):
+                for state in new_state:
+                    if state == "#pop":
+                        if len(statestack) > 1:
+                            statestack.pop()
+                    elif state == "#push":
+                        statestack.append(statestack[-1])
+                    else:
+                        statestack.append(state)
+            elif isinstance(new_state, int):
+                if abs(new_state) >= len(statestack):
+                    del statestack[1:]
+                else:
+                    del statestack[new_state:]
+            elif new_state == "#push":
+                statestack.append(statestack[-1])
+            else:
+                raise AssertionError(f"wrong state def: {new_state!r}")
+            segments = machine[statestack[-1]]
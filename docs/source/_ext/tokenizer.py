@@ -0,0 +1,250 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Tokenize engine of python lexers, driven by the standard library tokenizer.
+
+The standard library tokenizer (in C, since python 3.12) splits valid python source
+into tokens, without attempting rules in turn. Each token is mapped to the tokens the
+lexer would produce at its position, without the lexer attempting any rule, wherever
+that is known to hold:
+
+* Whitespace between tokens is either a newline (``Whitespace``) or a run of blanks
+  (``Text``), as the lexer's root state splits it.
+* Names, operators and numbers are lexed once (by the lexer's own rules) in a minimal
+  context, and the result (with the whitespace before it) is cached by that context
+  (e.g. a preceding ``.`` or a following ``(``). Keywords whose tokens depend on a
+  wider context (e.g. ``yield from``, or ``match`` at the start of a line) are not
+  cached.
+
+Everything else (strings and docstrings, comments, imports, line continuations, ...)
+is tokenized by the lexer's rules (see machine.py), from the end of the previous
+token until the lexer is back in its root state. Hence, tokens are identical to those
+of the lexer itself. Source which the standard library fails to tokenize (e.g. an
+incomplete snippet) is tokenized by the lexer alone.
+
+"""
+
+import io
+import keyword
+import re
+import tokenize as _tokenize
+from collections.abc import Generator, Iterator
+from typing import Any, Optional
+
+from machine import run
+from pygments.lexer import RegexLexer
+from pygments.token import Text, Whitespace, _TokenType
+
+
+Token = tuple[int, _TokenType, str]
+Result = Optional[tuple[Token, ...]]
+
+NAME: int = _tokenize.NAME
+CACHED: frozenset[int] = frozenset((_tokenize.OP, _tokenize.NUMBER))
+SKIPPED: frozenset[int] = frozenset(
+    (
+        _tokenize.NEWLINE,
+        _tokenize.NL,
+        _tokenize.INDENT,
+        _tokenize.DEDENT,
+        _tokenize.ENDMARKER,
+    )
+)
+KEYWORDS: tuple[str, ...] = (*keyword.kwlist, *keyword.softkwlist)
+PAREN: re.Pattern = re.compile(r"\s*\(")
+WORD: re.Pattern = re.compile(r"\w")
+BLANKS: re.Pattern = re.compile(r"\n|[^\S\n]+")
+_MISSING: Any = object()
+# NOTE: Cached token kinds, whitespace and contexts of a lexer are few, but are not
+# bounded by the lexer (e.g. names), hence the cache is cleared once full.
+MAXSIZE: int = 1 << 16
+_CACHES: dict[type, dict[tuple, Result]] = {}
+
+
+def _offsets(text: str) -> list[int]:
+    """Index of text at which each (1-indexed) line starts."""
+    offsets: list[int] = [0]
+    total: int = 0
+    for line in text.split("\n"):
+        offsets.append(total)
+        total += len(line) + 1
+    # NOTE: The end marker follows the last line.
+    offsets.append(total)
+
+    return offsets
+
+
+def _tokens(text: str) -> list[tuple[int, int, int, str]]:
+    """Tokenize text as (type, start, end, string), with indices of text.
+
+    Tokens of whitespace alone (newlines, indents, ...) are skipped.
+
+    """
+    offsets: list[int] = _offsets(text)
+
+    return [
+        (kind, offsets[i] + j, offsets[k] + m, string)
+        for kind, string, (i, j), (k, m), _ in _tokenize.generate_tokens(
+            io.StringIO(text).readline
+        )
+        if kind not in SKIPPED
+    ]
+
+
+def _lex(lexer: RegexLexer, text: str, start: int, end: int) -> Result:
+    """Tokens of text[start:end] (relative to start), if lexed from and to root."""
+    stack: list[str] = ["root"]
+    tokens: list[Token] = []
+    gen: Generator[Token, None, int] = run(lexer, text, start, stack, end)
+    while 1:
+        try:
+            idx, token, value = next(gen)
+        except StopIteration as stop:
+            if stop.value != end or stack != ["root"]:
+                return None
+            return tuple(tokens)
+        tokens.append((idx - start, token, value))
+
+
+def _name(lexer: RegexLexer, name: str, before: str, after: str) -> Result:
+    """Tokens of a name, between the characters before and after it."""
+    if before != "." and not WORD.match(before):
+        before = " "
+    if after != "(" and not WORD.match(after):
+        after = " "
+    result: Result = _lex(lexer, before + name + after, 1, len(name) + 1)
+    if name not in KEYWORDS or result is None:
+        return result
+
+    # NOTE: Rules of other names only look at the adjacent characters (the next
+    # ``(`` of a call aside). Those of keywords may also look at the start of the
+    # line (e.g. ``match``), or the next word (e.g. ``yield from``).
+    contexts: list[tuple[str, str]] = []
+    if after == " ":
+        contexts.extend((before, f" {j} ") for j in KEYWORDS)
+    if before == " ":
+        contexts.append(("\n", after))
+    for j, k in contexts:
+        if _lex(lexer, j + name + k, 1, len(name) + 1) != result:
+            return None
+
+    return result
+
+
+def _classify(
+    lexer: RegexLexer, kind: int, gap: str, string: str, before: str, after: str
+) -> Result:
+    """Tokens of a token and the whitespace before it (relative to its start)."""
+    if gap and not gap.isspace():
+        return None
+    result: Result = (
+        _name(lexer, string, before, after)
+        if kind == NAME
+        else _lex(lexer, string + after, 0, len(string))
+    )
+    if result is None:
+        return None
+    n: int = len(gap)
+
+    return (
+        *(
+            (m.start(), Whitespace if m.group() == "\n" else Text, m.group())
+            for m in BLANKS.finditer(gap)
+        ),
+        *((n + idx, token, value) for idx, token, value in result),
+    )
+
+
+def _fallback(lexer: RegexLexer, text: str, stack: tuple[str, ...]) -> Iterator[Token]:
+    """Tokenize text with the regex engine alone."""
+    return RegexLexer.get_tokens_unprocessed(lexer, text, stack)
+
+
+def tokenize(
+    lexer: RegexLexer,
+    text: str,
+    stack: tuple[str, ...] = ("root",),
+) -> Iterator[Token]:
+    """Split text into (index, tokentype, value), as RegexLexer does."""
+    # NOTE: Line offsets are those of newlines only (carriage returns are
+    # normalized by Lexer.get_tokens).
+    if tuple(stack) != ("root",) or "\r" in text:
+        yield from _fallback(lexer, text, stack)
+        return
+    try:
+        tokens: list[tuple[int, int, int, str]] = _tokens(text)
+    except (_tokenize.TokenError, SyntaxError):
+        yield from _fallback(lexer, text, stack)
+        return
+    # NOTE: Error tokens may split what the lexer matches as one token (e.g. names
+    # with combining marks, on python 3.11), hence the regex engine alone is used.
+    if any(kind == _tokenize.ERRORTOKEN for kind, *_ in tokens):
+        yield from _fallback(lexer, text, stack)
+        return
+
+    cache: dict[tuple, Result] = _CACHES.setdefault(type(lexer), {})
+    result: Result
+    pos: int = 0
+    for kind, start, end, string in tokens:
+        if start < pos:
+            # NOTE: Already tokenized by the lexer, which may have stopped within.
+            if end > pos:
+                pos = yield from run(lexer, text, pos, ["root"], end)
+            continue
+
+        result = None
+        if kind == NAME:
+            # NOTE: A call may be separated from its name by whitespace.
+            after: str = text[end : end + 1]
+            if after.isspace() and PAREN.match(text, end):
+                after = "("
+            key: tuple = (kind, text[pos:start], string, text[start - 1 : start], after)
+        elif kind in CACHED:
+            key = (kind, text[pos:start], string, "", text[end : end + 1])
+        else:
+            key = ()
+        if key:
+            result = cache.get(key, _MISSING)
+            if result is _MISSING:
+                if len(cache) >= MAXSIZE:
+                    cache.clear()
+                result = cache[key] = _classify(lexer, *key)
+
+        if result is None:
+            # NOTE: Lexed from the end of the previous token (e.g. docstrings start at
+            # the start of the line), until back in its root state.
+            pos = yield from run(lexer, text, pos, ["root"], end)
+            continue
+
+        for idx, token, value in result:
+            yield pos + idx, token, value
+        pos = end
+
+    if pos < len(text):
+        yield from run(lexer, text, pos, ["root"])
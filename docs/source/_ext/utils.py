@@ -29,8 +29,11 @@
 
 """Common shared utility functions."""
 
-from typing import Iterator
+import importlib
+from typing import Iterator, Union
 
+from pygments.style import Style
+from pygments.styles import get_style_by_name
 from pygments.token import _TokenType, string_to_tokentype
 
 
@@ -55,3 +58,24 @@ def dynamic_brackets(colors: list[str]) -> list[tuple[_TokenType, str]]:
 def get_brackets(colors: list[str]) -> dict[_TokenType, str]:
     """Get brackets in dictionary form."""
     return dict(dynamic_brackets(colors))
+
+
+def get_style(style: Union[str, type[Style]]) -> type[Style]:
+    """Resolve a style by name (or dotted path, e.g. styles.VSCodeDarkPlus)."""
+    if not isinstance(style, str):
+        return style
+    if "." in style:
+        module, _, name = style.rpartition(".")
+        return getattr(importlib.import_module(module), name)
+
+    return get_style_by_name(style)
+
+
+def count_bracket_levels(style: Union[str, type[Style]]) -> int:
+    """Count bracket depth levels (consecutive from zero) colored by a style."""
+    styles: dict[_TokenType, str] = get_style(style).styles
+    n: int = 0
+    while styles.get(get_bracket_level(n)):
+        n += 1
+
+    return n
@@ -32,9 +32,6 @@
 import os
 import sys
 
-from sphinx.application import Sphinx
-from sphinx.highlighting import lexer_classes as _lexer_registry
-
 
 sys.path.insert(0, os.path.abspath("../src/"))  # Required to see python package
 sys.path.append(os.path.abspath("./_ext"))  # Required for custom extensions
@@ -57,6 +54,8 @@ extensions = [
     "sphinx.ext.autosummary",
     "sphinx.ext.napoleon",
     "sphinx_multiversion",
+    "lexers",  # custom python and cython lexers (./_ext)
+    "cache",  # cache of highlighted code blocks (./_ext)
 ]
 
 napoleon_google_docstring = True  # Use google docstring format (sphinx.ext.napoleon)
@@ -77,6 +76,17 @@ exclude_patterns = []
 # Use custom syntax highlighting (style)
 pygments_style = "styles.VSCodeDarkPlus"
 pygments_dark_style = "styles.VSCodeDarkPlus"
+# Match a compiled alternation of the rules of each lexer state (./_ext/machine.py)
+highlight_options = {
+    "python": {"engine": "machine"},
+    "cython": {"engine": "machine"},
+}
+
+# Cache highlighted code blocks (shared by every version of sphinx_multiversion)
+highlight_cache_dir = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", "~/.cache"), "pytemplate-docs", "highlight"
+)
+highlight_cache_size = 4096
 
 # -- Options for HTML output -------------------------------------------------
 # https://www.sphinx-doc.org/en/master/usage/configuration.html#options-for-html-output
@@ -117,21 +127,3 @@ html_sidebars = {
     ],
 }
 html_additional_pages = {"page": "page.html"}
-
-
-def setup(app: Sphinx) -> None:
-    """Custom sphinx application startup setup."""
-    from lexers import CustomCythonLexer, CustomPythonLexer  # type: ignore
-
-    # NOTE: overwrite default python and cython lexers
-    app.add_lexer("python", CustomPythonLexer)
-    assert "python" in _lexer_registry, "python language not found in registry"
-    assert _lexer_registry["python"] == CustomPythonLexer, (
-        "custom Python Lexer not found in registry."
-    )
-
-    app.add_lexer("cython", CustomCythonLexer)
-    assert "cython" in _lexer_registry, "cython language not found in registry"
-    assert _lexer_registry["cython"] == CustomCythonLexer, (
-        "custom Cython Lexer not found in registry."
-    )
@@ -35,21 +35,260 @@ Arguments:
     path (str): root path of project (defaults to cwd)
     dry-run (bool): print out what files / directories would be modified
     timeout (int): Time in seconds to allow a subprocess to run.
+    ignore-backend (str): how ignored paths are identified (defaults to ls-files)
+    jobs (int): number of worker threads used to update files (defaults to 1)
+    include (list[str]): only update contents of files matching these globs
+    exclude (list[str]): do not update contents of files matching these globs
+    max-size (str): skip updating contents of files larger than this (e.g. 10M)
+    map (list[str]): additional old=new mappings replaced in the same pass
+    map-file (str): file of additional old=new mappings, one per line
+    case-variants (bool): also replace case variants of each mapping
+    journal (str): directory of the rename journal (defaults to .git/rename-journal)
+    no-journal (bool): do not journal operations
+    resume (bool): resume an interrupted rename, skipping completed work
+    rollback (bool): revert the last rename, restoring original contents and paths
+    manifest (str): path of the content manifest (defaults to .git/rename-manifest.json)
+    no-manifest (bool): neither consult nor update the content manifest
+    index (bool): maintain a trigram index, only reading files which may match
+    index-dir (str): directory of the trigram index (defaults to .git/rename-index)
+    where (list[str]): report lines using these names (with the index), then exit
+    quiet (bool): do not log each file updated or renamed
+    report (str): format of the final report, text (default) or json
+    profile (bool): profile the run, and report peak memory
+    profile-output (str): write profiling statistics (pstats) to this file
+    profile-limit (int): number of functions listed by profile (defaults to 15)
+    plan (str): write a plan of every edit and rename to this file (as a dry run)
+    apply (str): apply a plan written by --plan, without scanning the tree again
+    matches (str): report every match (line and column) to this file, as a dry run
+    matches-format (str): format of matches, jsonl (default) or a unified diff
+    io-limit (str): limit I/O to bytes[,ops] per second (e.g. 20M,500)
+    low-priority (bool): lower the CPU (nice) and I/O (ionice) priority of the process
+    archive (str): rename members of a tar or zip archive, without extracting it
+    output (str): path of the archive written by archive
+    deferred (str): write renames deferred outside of the sparse checkout to this file
+    fleet (str): file of repositories to rename in parallel, one `path [old=new]`
+        per line
+    fleet-jobs (int): number of repositories renamed concurrently (defaults to cpus)
 
 Notes:
-    * client must have git installed.
+    * client must have git installed, unless using the native ignore backend.
+    * paths outside of a sparse checkout (skip-worktree) are never opened nor renamed.
 
 """
 
 import argparse
+import bisect
+import contextlib
+import copy
+import cProfile
+import fnmatch
+import functools
+import hashlib
+import heapq
+import importlib
+import io
+import json
+import mmap
 import os
+import pstats
+import re
+import shutil
+import stat
+import struct
 import subprocess
-from collections.abc import Iterator
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from array import array
+from collections import Counter, deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from typing import IO, Any, BinaryIO, Optional, TextIO, Union, cast
+
+
+class Telemetry:
+    """Counters, phase timings, and the slowest files of a run.
+
+    A single (module level) instance, ``TELEMETRY``, is updated by every stage of a
+    rename: subprocess spawns, stat calls, bytes read and written, and files
+    scanned, written, or renamed. Per-phase wall and CPU time are recorded with
+    ``phase``, and only the slowest ``slowest`` files are retained (in a heap).
+    Updates are thread safe, so counts are exact with ``--jobs``.
+
+    """
+
+    def __init__(self, slowest: int = 10) -> None:
+        self.slowest: int = slowest
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Discard everything recorded so far."""
+        with self._lock:
+            self.counters: Counter[str] = Counter()
+            self.phases: dict[str, dict[str, float]] = {}
+            self.throttled: float = 0.0
+            self._files: list[tuple[float, str]] = []
+
+    def add(self, key: str, n: int = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self.counters[key] += n
+
+    def throttle(self, seconds: float) -> None:
+        """Record time spent waiting on an I/O limit."""
+        with self._lock:
+            self.throttled += seconds
+
+    def file(self, path: str, seconds: float) -> None:
+        """Record the time spent processing a single file."""
+        with self._lock:
+            if len(self._files) < self.slowest:
+                heapq.heappush(self._files, (seconds, path))
+            elif seconds > self._files[0][0]:
+                heapq.heapreplace(self._files, (seconds, path))
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Measure wall and (process) CPU time spent within a phase."""
+        wall: float = time.perf_counter()
+        cpu: float = time.process_time()
+        try:
+            yield
+        finally:
+            timing = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            timing["wall"] += time.perf_counter() - wall
+            timing["cpu"] += time.process_time() - cpu
+
+    def report(self) -> dict[str, Any]:
+        """Summarize counters, timings, and throughput of the rename phase."""
+        seconds: float = self.phases.get("rename", {}).get("wall", 0.0)
+        rate: float = 1 / seconds if seconds else 0.0
+
+        return {
+            "phases": self.phases,
+            "counters": dict(self.counters),
+            "files_per_second": self.counters["files_scanned"] * rate,
+            "mb_per_second": self.counters["bytes_read"] / 1e6 * rate,
+            "throttled_seconds": self.throttled,
+            "slowest": [
+                {"path": path, "seconds": t} for t, path in sorted(self._files)[::-1]
+            ],
+        }
+
+
+TELEMETRY: Telemetry = Telemetry()
+
+
+class Throttle:
+    """Limit the rate of I/O, in bytes and operations per second, across threads.
+
+    A token bucket per limit holds (at most) a second of tokens. Each operation
+    takes its tokens, and may leave a bucket in debt; the caller then sleeps until
+    the debt is repaid, so a large read is paid for before the next one begins.
+    Time spent sleeping is recorded by ``TELEMETRY``. A single (module level)
+    instance, ``THROTTLE``, is consulted by the walker, readers, and writers, and
+    is unlimited unless configured (see ``--io-limit``).
+
+    """
+
+    def __init__(
+        self,
+        bytes_per_second: Optional[float] = None,
+        ops_per_second: Optional[float] = None,
+    ) -> None:
+        self._lock = threading.Lock()
+        self.configure(bytes_per_second, ops_per_second)
+
+    def configure(
+        self,
+        bytes_per_second: Optional[float] = None,
+        ops_per_second: Optional[float] = None,
+    ) -> None:
+        """Set (or, with None, remove) each limit, refilling both buckets."""
+        with self._lock:
+            self.rates: tuple[Optional[float], Optional[float]] = (
+                bytes_per_second or None,
+                ops_per_second or None,
+            )
+            self._tokens: list[float] = [j or 0.0 for j in self.rates]
+            self._last: float = time.monotonic()
+
+    def __bool__(self) -> bool:
+        return self.rates != (None, None)
+
+    def __call__(self, nbytes: int = 0, ops: int = 1) -> None:
+        """Take tokens for an operation, sleeping while either bucket is in debt."""
+        if not self:
+            return
+
+        wait: float = 0.0
+        with self._lock:
+            now: float = time.monotonic()
+            elapsed: float = now - self._last
+            self._last = now
+            for i, (rate, amount) in enumerate(zip(self.rates, (nbytes, ops))):
+                if rate is None:
+                    continue
+                tokens: float = min(rate, self._tokens[i] + elapsed * rate) - amount
+                self._tokens[i] = tokens
+                wait = max(wait, -tokens / rate)
+        if wait > 0:
+            time.sleep(wait)
+            TELEMETRY.throttle(wait)
+
+
+THROTTLE: Throttle = Throttle()
+
+
+def parse_io_limit(value: str) -> tuple[Optional[int], Optional[float]]:
+    """Parse an I/O limit as `bytes[,ops]` per second (e.g. 20M, 20M,500 or ,500)."""
+    size, _, ops = value.partition(",")
+    try:
+        return (
+            parse_size(size) if size.strip() else None,
+            float(ops) if ops.strip() else None,
+        )
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            f"Expected an I/O limit as bytes[,ops] per second: {value!r}"
+        ) from e
+
+
+def lower_priority(log: Callable[[str], None] = print) -> None:
+    """Lower the CPU (nice) and I/O (best effort, lowest) priority of this process.
+
+    Threads and processes started afterwards inherit both priorities.
+
+    """
+    if hasattr(os, "nice"):
+        os.nice(10)
+    if shutil.which("ionice") is None:
+        log("[Warning] ionice is unavailable; only the CPU priority is lowered.")
+        return
+    TELEMETRY.add("spawns")
+    result = subprocess.run(
+        ["ionice", "-c", "2", "-n", "7", "-p", str(os.getpid())],
+        capture_output=True,
+        check=False,
+    )
+    if result.returncode:
+        log(f"[Warning] ionice failed: {result.stderr.decode().strip()}")
 
 
 def bypass(path: str, git_root: str, timeout: int = 1) -> bool:
     """Use git to identify if a path is ignored as specified by a .gitignore file."""
     # NOTE: Do not capture errors to avoid assuming a path is included or not.
+    TELEMETRY.add("spawns")
     result = subprocess.run(
         ["git", "-C", git_root, "check-ignore", path],
         stdout=subprocess.DEVNULL,
@@ -61,8 +300,535 @@ def bypass(path: str, git_root: str, timeout: int = 1) -> bool:
     return result.returncode == 0
 
 
+def list_candidates(root: str, timeout: Optional[float] = None) -> set[str]:
+    """Enumerate all tracked and untracked (but not ignored) paths beneath root.
+
+    A single ``git ls-files`` call replaces one ``git check-ignore`` call per entry.
+    Paths are joined onto ``root`` as given, so they compare equal to those built
+    while walking the tree with ``os.path.join``. Parent directories are included.
+
+    """
+    TELEMETRY.add("spawns")
+    result = subprocess.run(
+        ["git", "-C", root, "ls-files", "-c", "-o", "--exclude-standard", "-z"],
+        check=True,
+        capture_output=True,
+        timeout=timeout,
+    )
+
+    candidates: set[str] = set()
+    for raw in result.stdout.split(b"\0"):
+        if not raw:
+            continue
+        parts: list[str] = os.fsdecode(raw).split("/")
+        # NOTE: Stop ascending once a parent is known, since its ancestors are too.
+        for depth in range(len(parts), 0, -1):
+            full_path = os.path.join(root, *parts[:depth])
+            if full_path in candidates:
+                break
+            candidates.add(full_path)
+
+    return candidates
+
+
+def find_repo_root(start_path: str) -> Optional[str]:
+    """Locate the enclosing git working tree without invoking git."""
+    path: str = os.path.realpath(start_path)
+    while True:
+        if os.path.exists(os.path.join(path, ".git")):
+            return path
+        parent: str = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _git_dirs(top: str) -> tuple[Optional[str], Optional[str]]:
+    """Resolve the (git, common) directories of a working tree, if any."""
+    git_dir: str = os.path.join(top, ".git")
+    if os.path.isfile(git_dir):
+        # NOTE: Worktrees and submodules point to their git directory from a file.
+        with open(git_dir, "r", encoding="utf-8") as f:
+            content: str = f.read().strip()
+        if not content.startswith("gitdir:"):
+            return None, None
+        git_dir = os.path.join(top, content[len("gitdir:") :].strip())
+
+    if not os.path.isdir(git_dir):
+        return None, None
+
+    common_dir: str = git_dir
+    try:
+        with open(os.path.join(git_dir, "commondir"), "r", encoding="utf-8") as f:
+            common_dir = os.path.join(git_dir, f.read().strip())
+    except FileNotFoundError:
+        pass
+
+    return git_dir, common_dir
+
+
+def _config_value(paths: list[str], section: str, key: str) -> Optional[str]:
+    """Read the last value of a key from a sequence of git config files."""
+    value: Optional[str] = None
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines: list[str] = f.readlines()
+        except (FileNotFoundError, IsADirectoryError, PermissionError):
+            continue
+
+        current: str = ""
+        for raw in lines:
+            line: str = raw.strip()
+            if not line or line[0] in "#;":
+                continue
+            if line.startswith("["):
+                current = (line[1:].split("]", 1)[0].split() or [""])[0].lower()
+                continue
+            name, _, found = line.partition("=")
+            if current == section and name.strip().lower() == key:
+                value = found.strip().strip('"')
+
+    return value
+
+
+def _excludes_file(common_dir: Optional[str]) -> str:
+    """Identify the global excludes file (``core.excludesFile``)."""
+    xdg: str = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    paths: list[str] = []
+    if not os.environ.get("GIT_CONFIG_NOSYSTEM"):
+        paths.append("/etc/gitconfig")
+    if "GIT_CONFIG_GLOBAL" in os.environ:
+        paths.append(os.environ["GIT_CONFIG_GLOBAL"])
+    else:
+        paths.extend(
+            [os.path.join(xdg, "git", "config"), os.path.expanduser("~/.gitconfig")]
+        )
+    if common_dir is not None:
+        paths.append(os.path.join(common_dir, "config"))
+
+    value: Optional[str] = _config_value(paths, "core", "excludesfile")
+    if value is None:
+        return os.path.join(xdg, "git", "ignore")
+
+    return os.path.expanduser(value)
+
+
+def _translate_class(pattern: str, start: int) -> tuple[Optional[str], int]:
+    """Translate a bracket expression beginning at start, returning its end."""
+    i: int = start + 1
+    negate: bool = i < len(pattern) and pattern[i] in "!^"
+    if negate:
+        i += 1
+
+    chars: list[str] = []
+    first: int = i
+    while i < len(pattern) and (pattern[i] != "]" or i == first):
+        if pattern[i] == "\\" and i + 1 < len(pattern):
+            i += 1
+            chars.append(re.escape(pattern[i]))
+        elif (
+            pattern[i] == "-"
+            and chars
+            and i + 1 < len(pattern)
+            and pattern[i + 1] != "]"
+        ):
+            chars.append("-")
+        else:
+            chars.append(re.escape(pattern[i]))
+        i += 1
+
+    if i >= len(pattern):
+        return None, start + 1
+
+    body: str = "".join(chars)
+    if negate:
+        return f"[^/{body}]", i + 1
+
+    return f"(?!/)[{body}]", i + 1
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore (wildmatch) glob into a regular expression."""
+    out: list[str] = []
+    i: int = 0
+    n: int = len(pattern)
+    while i < n:
+        char: str = pattern[i]
+        if char == "*":
+            j: int = i
+            while j < n and pattern[j] == "*":
+                j += 1
+            # NOTE: Only `**` bounded by slashes (or either end) spans directories.
+            if j - i == 2 and (i == 0 or pattern[i - 1] == "/"):
+                if j == n:
+                    out.append(".*")
+                    i = j
+                    continue
+                if pattern[j] == "/":
+                    out.append("(?:.*/)?")
+                    i = j + 1
+                    continue
+            out.append("[^/]*")
+            i = j
+            continue
+
+        if char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            translated, end = _translate_class(pattern, i)
+            if translated is not None:
+                out.append(translated)
+                i = end
+                continue
+            out.append(re.escape(char))
+        elif char == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+
+    return "".join(out)
+
+
+def _parse_pattern(line: str) -> Optional[tuple[bool, bool, str]]:
+    """Parse a gitignore line into (negated, directory only, regex)."""
+    line = line.rstrip("\r\n")
+    if not line or line.startswith("#"):
+        return None
+
+    # NOTE: Trailing spaces are ignored unless escaped with a backslash.
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+
+    negated: bool = line.startswith("!")
+    if negated:
+        line = line[1:]
+
+    dir_only: bool = line.endswith("/")
+    if dir_only:
+        line = line.rstrip("/")
+
+    if not line:
+        return None
+
+    anchored: bool = "/" in line
+    regex: str = _translate(line.lstrip("/") if anchored else line)
+    if not anchored:
+        regex = f"(?:.*/)?{regex}"
+
+    return negated, dir_only, regex
+
+
+class _Patterns:
+    """Rules of a single ignore file compiled into one regular expression.
+
+    Rules are combined in reverse order so the first alternative to match is the
+    last rule listed, which mirrors git's precedence (last matching rule wins).
+
+    """
+
+    __slots__ = ("dir_only", "files", "negated", "pattern")
+
+    def __init__(self, rules: list[tuple[bool, bool, str]]) -> None:
+        self.negated: frozenset[str] = frozenset(
+            f"r{n}" for n, rule in enumerate(rules) if rule[0]
+        )
+        self.dir_only: frozenset[str] = frozenset(
+            f"r{n}" for n, rule in enumerate(rules) if rule[1]
+        )
+        self.pattern: re.Pattern = self._compile(rules, directories=True)
+        self.files: re.Pattern = self._compile(rules, directories=False)
+
+    @staticmethod
+    def _compile(rules: list[tuple[bool, bool, str]], directories: bool) -> re.Pattern:
+        alternatives: list[str] = [
+            f"(?P<r{n}>{regex})"
+            for n, (_, dir_only, regex) in reversed(list(enumerate(rules)))
+            if directories or not dir_only
+        ]
+
+        return re.compile("|".join(alternatives) or "(?!)", re.DOTALL)
+
+    @classmethod
+    def read(cls, path: str) -> Optional["_Patterns"]:
+        """Compile an ignore file, if present and not empty."""
+        try:
+            with open(path, "r", encoding="utf-8", errors="surrogateescape") as f:
+                rules = [rule for line in f if (rule := _parse_pattern(line))]
+        except (
+            FileNotFoundError,
+            NotADirectoryError,
+            IsADirectoryError,
+            PermissionError,
+        ):
+            return None
+
+        return cls(rules) if rules else None
+
+    def match(self, relpath: str, is_dir: Callable[[], bool]) -> Optional[bool]:
+        """Return True (ignored), False (re-included), or None (no rule matches)."""
+        found = self.pattern.fullmatch(relpath)
+        if found is None:
+            return None
+
+        if found.lastgroup in self.dir_only and not is_dir():
+            found = self.files.fullmatch(relpath)
+            if found is None:
+                return None
+
+        return found.lastgroup not in self.negated
+
+
+class GitIgnore:
+    """Pure python gitignore engine, evaluating ignore rules without spawning git.
+
+    Reads ``core.excludesFile``, ``.git/info/exclude``, and ``.gitignore`` of each
+    directory, compiling every file once. Compiled rules are cached per directory
+    and inherited by its children as the walk descends. Works equally well on
+    exported trees lacking a ``.git`` directory.
+
+    Notes:
+        * Rules are evaluated like ``git check-ignore --no-index``; tracked files
+          which match an ignore pattern are bypassed.
+
+    """
+
+    def __init__(self, root: str, git_root: Optional[str] = None) -> None:
+        self.root: str = root
+        self.top: str = os.path.realpath(git_root or find_repo_root(root) or root)
+        self._prefix: str = os.path.join(root, "")
+
+        relroot: str = os.path.relpath(os.path.realpath(root), self.top)
+        self._relroot: str = "" if relroot == "." else relroot.replace(os.sep, "/")
+
+        _, common_dir = _git_dirs(self.top)
+        base: list[Optional[_Patterns]] = [_Patterns.read(_excludes_file(common_dir))]
+        if common_dir is not None:
+            base.append(_Patterns.read(os.path.join(common_dir, "info", "exclude")))
+
+        # NOTE: Ordered by decreasing precedence; frames are (directory, patterns).
+        self._base: tuple[tuple[str, _Patterns], ...] = tuple(
+            ("", patterns) for patterns in reversed(base) if patterns is not None
+        )
+        self._frames: dict[str, tuple[tuple[str, _Patterns], ...]] = {}
+
+    def _relative(self, path: str) -> str:
+        if path.startswith(self._prefix):
+            rel: str = path[len(self._prefix) :]
+        else:
+            rel = os.path.relpath(path, self.root)
+        if os.sep != "/":
+            rel = rel.replace(os.sep, "/")
+
+        return f"{self._relroot}/{rel}" if self._relroot else rel
+
+    def frames(self, directory: str) -> tuple[tuple[str, _Patterns], ...]:
+        """Retrieve compiled rules applicable within a directory (relative to top)."""
+        pending: list[str] = []
+        current: str = directory
+        while current not in self._frames:
+            pending.append(current)
+            if not current:
+                break
+            current = current.rpartition("/")[0]
+
+        inherited = self._frames.get(current, self._base)
+        for name in reversed(pending):
+            patterns = _Patterns.read(os.path.join(self.top, name, ".gitignore"))
+            if patterns is not None:
+                inherited = ((name, patterns), *inherited)
+            self._frames[name] = inherited
+
+        return inherited
+
+    def __call__(self, path: str) -> bool:
+        """Return True if path is ignored (i.e. should be bypassed)."""
+        rel: str = self._relative(path)
+        directory, _, name = rel.rpartition("/")
+        if name == ".git":
+            return True
+
+        is_dir = functools.cache(
+            lambda: os.path.isdir(path) and not os.path.islink(path)
+        )
+        for base, patterns in self.frames(directory):
+            ignored = patterns.match(rel[len(base) + 1 :] if base else rel, is_dir)
+            if ignored is not None:
+                return ignored
+
+        return False
+
+
+INDEX_EXTENDED: int = 0x4000
+INDEX_SKIP_WORKTREE: int = 0x4000
+# NOTE: Size (in bytes) of object names, by object format of a repository.
+OBJECT_FORMATS: dict[str, int] = {"sha1": 20, "sha256": 32}
+
+
+def read_index(index_path: str, object_format: str = "sha1") -> list[tuple[str, bool]]:
+    """Read paths (relative to top) of a git index, and whether each is skip-worktree.
+
+    Sparse checkouts mark every path outside of the checkout skip-worktree, as may a
+    client explicitly (``git update-index --skip-worktree``). Entries of a sparse
+    index (``index.sparse``) may name directories, ending with ``/``. Entries hold
+    the object name of each path, whose size depends on the ``object_format`` of
+    the repository (``extensions.objectFormat``); an unknown format has no entries.
+
+    Notes:
+        * The index is parsed directly (versions 2 to 4), rather than spawning
+          ``git ls-files -t``, so the native backend does not require git.
+
+    """
+    hash_size: Optional[int] = OBJECT_FORMATS.get(object_format.lower())
+    if hash_size is None:
+        return []
+    try:
+        with open(index_path, "rb") as f:
+            data: bytes = f.read()
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return []
+    if len(data) < 12 or data[:4] != b"DIRC":
+        return []
+
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        return []
+
+    entries: list[tuple[str, bool]] = []
+    position: int = 12
+    path: bytes = b""
+    for _ in range(count):
+        start: int = position
+        # NOTE: Flags follow stat fields (40 bytes) and the object name.
+        flags: int = struct.unpack_from(">H", data, start + 40 + hash_size)[0]
+        extended: int = 0
+        position = start + 42 + hash_size
+        if flags & INDEX_EXTENDED and version >= 3:
+            extended = struct.unpack_from(">H", data, position)[0]
+            position += 2
+        if version == 4:
+            # NOTE: Paths are prefix compressed: strip N bytes of the previous path.
+            c: int = data[position]
+            position += 1
+            strip: int = c & 127
+            while c & 128:
+                c = data[position]
+                position += 1
+                strip = ((strip + 1) << 7) | (c & 127)
+            end: int = data.index(b"\0", position)
+            path = path[: len(path) - strip] + data[position:end]
+            position = end + 1
+        else:
+            end = data.index(b"\0", position)
+            path = data[position:end]
+            position = start + ((end - start + 8) & ~7)
+        entries.append((os.fsdecode(path), bool(extended & INDEX_SKIP_WORKTREE)))
+
+    return entries
+
+
+class SkipWorktree:
+    """Identify paths outside of a sparse checkout (or marked skip-worktree).
+
+    Such paths are bypassed without being opened (or even stat'd): on virtualized
+    checkouts, reading a file may hydrate it on demand. Directories holding only
+    skip-worktree paths are pruned entirely. Paths are compared as joined onto root
+    (as given), as they are while walking.
+
+    Notes:
+        * Untracked files within a pruned directory are bypassed too.
+
+    """
+
+    def __init__(self, root: str, git_root: str) -> None:
+        top: str = os.path.realpath(git_root)
+        git_dir, common_dir = _git_dirs(top)
+        relroot: str = os.path.relpath(os.path.realpath(root), top).replace(os.sep, "/")
+        prefix: str = "" if relroot == "." else f"{relroot}/"
+
+        entries: list[tuple[str, bool]] = []
+        if git_dir is not None and not relroot.startswith(".."):
+            config: list[str] = [os.path.join(common_dir or git_dir, "config")]
+            object_format: str = (
+                _config_value(config, "extensions", "objectformat") or "sha1"
+            )
+            entries = read_index(os.path.join(git_dir, "index"), object_format)
+
+        #: Skip-worktree paths beneath root, relative to root ("/" separated).
+        self.relative: list[str] = []
+        kept: set[str] = set()
+        pruned: set[str] = set()
+        for rel, skip in entries:
+            if not rel.startswith(prefix):
+                continue
+            parts: list[str] = rel[len(prefix) :].rstrip("/").split("/")
+            directories = ("/".join(parts[:n]) for n in range(1, len(parts)))
+            if skip:
+                self.relative.append("/".join(parts))
+                pruned.update(directories)
+            else:
+                kept.update(directories)
+
+        self.paths: set[str] = {
+            os.path.join(root, *rel.split("/"))
+            for rel in (*self.relative, *(pruned - kept))
+        }
+
+    def __len__(self) -> int:
+        return len(self.relative)
+
+    def __call__(self, path: str) -> bool:
+        """Return True if path is outside of the checkout (i.e. should be bypassed)."""
+        return path in self.paths
+
+    def deferred(self, replacer: "Replacer") -> list[tuple[str, str]]:
+        """List renames of skip-worktree paths, deferred until they are checked out."""
+        return [
+            (rel, replacer.sub(rel)) for rel in self.relative if replacer.search(rel)
+        ]
+
+
+def ignore_filter(
+    root: str,
+    git_root: str,
+    backend: str = "ls-files",
+    timeout: int = 1,
+) -> Callable[[str], bool]:
+    """Construct a predicate identifying which paths to bypass.
+
+    The timeout bounds each ``git check-ignore`` call. A single ``git ls-files``
+    enumerates the whole tree, which may take far longer (e.g. on a cold cache or
+    network filesystem), hence it is never timed out.
+
+    """
+    if backend == "native":
+        return GitIgnore(root, git_root)
+
+    if backend == "ls-files":
+        try:
+            candidates: set[str] = list_candidates(root)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(
+                f"Unable to list files with git ({e.stderr.decode().strip()}). "
+                "Use --ignore-backend native to identify ignored paths without git."
+            ) from e
+        return lambda path: path not in candidates
+
+    return functools.partial(bypass, git_root=git_root, timeout=timeout)
+
+
+def _either(
+    first: Callable[[str], bool], second: Callable[[str], bool], path: str
+) -> bool:
+    """Bypass paths identified by either predicate (checking the first, first)."""
+    return first(path) or second(path)
+
+
 def find_git_root(start_path: str, timeout: int = 1) -> str:
     """Confirm we are in a git repository."""
+    TELEMETRY.add("spawns")
     try:
         result = subprocess.run(
             ["git", "-C", start_path, "rev-parse", "--show-toplevel"],
@@ -73,46 +839,1680 @@ def find_git_root(start_path: str, timeout: int = 1) -> str:
         )
         return result.stdout.strip()
 
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError("This script must be run inside a Git repository.") from e
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError("This script must be run inside a Git repository.") from e
+
+
+def safe_scandir(path: str) -> Iterator[os.DirEntry]:
+    """Wrapper around os.scandir."""
+    THROTTLE()
+    try:
+        with os.scandir(path) as it:
+            yield from it
+    except PermissionError:
+        return
+
+
+# NOTE: Version control and tool directories are never walked.
+PRUNED_DIRECTORIES: frozenset[str] = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".tox",
+        ".nox",
+        ".venv",
+        "__pycache__",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".rename-journal",
+    }
+)
+
+SNIFF_SIZE: int = 8192
+
+MAGIC_NUMBERS: tuple[bytes, ...] = (
+    b"\x89PNG",
+    b"\xff\xd8\xff",  # jpeg
+    b"GIF87a",
+    b"GIF89a",
+    b"%PDF-",
+    b"PK\x03\x04",  # zip (wheel, jar, docx, ...)
+    b"\x1f\x8b",  # gzip
+    b"\xfd7zXZ\x00",  # xz
+    b"7z\xbc\xaf",
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"\x7fELF",
+    b"\xcf\xfa\xed\xfe",  # mach-o
+    b"\x00asm",  # wasm
+)
+
+LFS_POINTER: bytes = b"version https://git-lfs.github.com/spec/v1"
+# NOTE: Smaller files are cheaper to read than to map (see benchmarks/bench_engine.py).
+MMAP_THRESHOLD: int = 64 * 1024
+# NOTE: Larger files are streamed in chunks, so memory does not grow with file size.
+STREAM_THRESHOLD: int = 64 * 1024 * 1024
+STREAM_CHUNK: int = 1024 * 1024
+
+
+def parse_size(value: str) -> int:
+    """Parse a human readable size (e.g. 512, 64K, 10M, 1G) into bytes."""
+    units: dict[str, int] = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    value = value.strip().upper().removesuffix("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+
+    return int(value)
+
+
+def _compile_globs(patterns: Sequence[str]) -> Optional[re.Pattern]:
+    """Combine glob patterns into a single regular expression, compiled once."""
+    if not patterns:
+        return None
+
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+class Classifier:
+    """Decide, before any full read, whether the contents of a file are scanned.
+
+    Checks are ordered from cheapest to most expensive: include / exclude globs
+    (path only), then size and hardlinks (from ``fstat``), and finally the first
+    few KB of content, sniffed for NUL bytes, magic numbers, or git LFS pointers.
+    Globs without a slash are matched against the file name, otherwise against the
+    path relative to root. Reasons for each skipped file are tallied.
+
+    When ``candidates`` is set (e.g. from a ``TrigramIndex``), only files within
+    it (by path relative to root) are scanned at all.
+
+    """
+
+    def __init__(
+        self,
+        root: str,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        max_size: Optional[int] = None,
+    ) -> None:
+        self.root: str = root
+        self.max_size: Optional[int] = max_size
+        self.skipped: Counter[str] = Counter()
+        self._prefix: str = os.path.join(root, "")
+        self._include_name = _compile_globs([p for p in include if "/" not in p])
+        self._include_path = _compile_globs([p for p in include if "/" in p])
+        self._exclude_name = _compile_globs([p for p in exclude if "/" not in p])
+        self._exclude_path = _compile_globs([p for p in exclude if "/" in p])
+        self._include: bool = bool(include)
+        self.candidates: Optional[set[str]] = None
+        self._inodes: set[tuple[int, int]] = set()
+        self._lock = threading.Lock()
+
+    def _skip(self, reason: str) -> bool:
+        with self._lock:
+            self.skipped[reason] += 1
+
+        return True
+
+    def skip_path(self, path: str) -> bool:
+        """Return True if path is filtered out by include / exclude globs."""
+        if path.startswith(self._prefix):
+            rel: str = path[len(self._prefix) :]
+        else:
+            rel = os.path.relpath(path, self.root)
+        rel = rel.replace(os.sep, "/")
+        name: str = rel.rpartition("/")[2]
+
+        if self._include and not (
+            (self._include_name and self._include_name.match(name))
+            or (self._include_path and self._include_path.match(rel))
+        ):
+            return self._skip("not-included")
+
+        if (self._exclude_name and self._exclude_name.match(name)) or (
+            self._exclude_path and self._exclude_path.match(rel)
+        ):
+            return self._skip("excluded")
+
+        if self.candidates is not None and rel not in self.candidates:
+            return self._skip("no-match")
+
+        return False
+
+    def skip_content(self, st: os.stat_result, head: bytes) -> bool:
+        """Return True if a file is too large, already seen, or not text."""
+        if self.max_size is not None and st.st_size > self.max_size:
+            return self._skip("max-size")
+
+        if st.st_nlink > 1:
+            key: tuple[int, int] = (st.st_dev, st.st_ino)
+            with self._lock:
+                seen: bool = key in self._inodes
+                self._inodes.add(key)
+            if seen:
+                return self._skip("hardlink")
+
+        if head.startswith(LFS_POINTER):
+            return self._skip("lfs-pointer")
+
+        if b"\x00" in head or head.startswith(MAGIC_NUMBERS):
+            return self._skip("binary")
+
+        return False
+
+    def summary(self) -> str:
+        """Summarize counts of skipped files by reason."""
+        total: int = sum(self.skipped.values())
+        reasons: str = ", ".join(f"{k}={v}" for k, v in sorted(self.skipped.items()))
+
+        return f"Skipped {total} file(s)" + (f": {reasons}" if reasons else "")
+
+
+def walk(
+    path: str,
+    ignored: Callable[[str], bool],
+) -> Iterator[tuple[str, os.DirEntry]]:
+    """Iteratively walk a tree, yielding each (path, entry) once in post-order.
+
+    Children are always yielded before their parent directory, so a directory may
+    be renamed as soon as it is yielded. An explicit stack replaces recursion, and
+    memory is bounded by tree depth (one directory listing per level). Version
+    control and tool directories (``PRUNED_DIRECTORIES``) are never entered.
+
+    """
+    # NOTE: Listings are read eagerly, since renaming entries while a directory is
+    #       still being read may yield them twice (or not at all).
+    stack: list[tuple[str, Optional[os.DirEntry], Iterator[os.DirEntry]]] = [
+        (path, None, iter(sorted(safe_scandir(path), key=lambda e: e.name)))
+    ]
+    while stack:
+        directory, parent, entries = stack[-1]
+        for entry in entries:
+            full_path: str = os.path.join(directory, entry.name)
+            if entry.name in PRUNED_DIRECTORIES and entry.is_dir(follow_symlinks=False):
+                continue
+
+            if ignored(full_path):
+                continue
+
+            if entry.is_dir(follow_symlinks=False):
+                listing = sorted(safe_scandir(full_path), key=lambda e: e.name)
+                stack.append((full_path, entry, iter(listing)))
+                break
+
+            yield full_path, entry
+
+        else:
+            stack.pop()
+            if parent is not None:
+                yield directory, parent
+
+
+def _snake_case(name: str) -> str:
+    """Convert a name (e.g. PyTemplate, my-project) into snake case (py_template)."""
+    name = re.sub(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])", "_", name)
+
+    return re.sub(r"[\s-]+", "_", name).lower()
+
+
+def case_variants(old: str, new: str) -> dict[str, str]:
+    """Generate common case variants of a mapping (e.g. pytemplate, PY_TEMPLATE)."""
+    variants: dict[str, str] = {old: new}
+    for transform in (
+        str.lower,
+        str.upper,
+        _snake_case,
+        lambda s: _snake_case(s).upper(),
+        lambda s: _snake_case(s).replace("_", "-"),
+    ):
+        variants.setdefault(transform(old), transform(new))
+
+    return variants
+
+
+class Replacer:
+    """Substitute several (old -> new) mappings within a single scan of text.
+
+    Mappings are compiled into one alternation, longest keyword first, so every
+    file is scanned (and rewritten) at most once regardless of the number of
+    patterns. Replaced text is never rescanned, mirroring ``str.replace``.
+
+    File contents are matched as (UTF-8 encoded) bytes, so they are never decoded,
+    and any ASCII compatible encoding and line ending is preserved. A single
+    keyword is found with ``find`` (``memchr`` based), rather than a regex.
+
+    """
+
+    def __init__(self, mapping: dict[str, str]) -> None:
+        self.mapping: dict[str, str] = {k: v for k, v in mapping.items() if k != v}
+        keys: list[str] = sorted(self.mapping, key=len, reverse=True)
+        self.pattern: re.Pattern = re.compile("|".join(map(re.escape, keys)) or "(?!)")
+        self.encoded: dict[bytes, bytes] = {
+            k.encode("utf-8"): v.encode("utf-8") for k, v in self.mapping.items()
+        }
+        self.bytes_pattern: re.Pattern = re.compile(
+            b"|".join(map(re.escape, sorted(self.encoded, key=len, reverse=True)))
+            or b"(?!)"
+        )
+        self.longest: int = max(map(len, self.encoded), default=1)
+        self._needle: Optional[bytes] = (
+            next(iter(self.encoded)) if len(self.encoded) == 1 else None
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.mapping)
+
+    def _lookup(self, match: re.Match) -> str:
+        return self.mapping[match.group()]
+
+    def search(self, text: str) -> bool:
+        """Return True if any old keyword is found within text."""
+        return self.pattern.search(text) is not None
+
+    def sub(self, text: str) -> str:
+        """Replace all occurrences of old keywords within text."""
+        return self.pattern.sub(self._lookup, text)
+
+    def _lookup_bytes(self, match: re.Match) -> bytes:
+        return self.encoded[match.group()]
+
+    def find(self, buffer: Union[bytes, mmap.mmap]) -> bool:
+        """Return True if any old keyword is found within a buffer (of bytes)."""
+        if self._needle is not None:
+            return buffer.find(self._needle) != -1
+
+        return self.bytes_pattern.search(buffer) is not None
+
+    def splice(self, buffer: Union[bytes, mmap.mmap]) -> bytes:
+        """Replace all occurrences of old keywords within a buffer (of bytes)."""
+        return self.bytes_pattern.sub(self._lookup_bytes, buffer)
+
+    def stream_find(self, f: BinaryIO, digest: Optional[Any] = None) -> bool:
+        """Return True if any old keyword is found, reading a file chunk by chunk.
+
+        Consecutive windows overlap by the longest keyword (less one byte), so
+        keywords spanning chunk boundaries are found. Every chunk is fed to a
+        digest (``hashlib`` object), if given, otherwise reading stops at a match.
+
+        """
+        found: bool = False
+        tail: bytes = b""
+        while chunk := f.read(STREAM_CHUNK):
+            THROTTLE(len(chunk), 0)
+            if digest is not None:
+                digest.update(chunk)
+            window: bytes = tail + chunk
+            if not found:
+                found = self.find(window)
+                if found and digest is None:
+                    break
+            tail = window[len(window) - self.longest + 1 :]
+
+        return found
+
+    def stream_splice(self, f: BinaryIO) -> Iterator[bytes]:
+        """Yield the contents of a file with every keyword replaced, chunk by chunk.
+
+        A match starting before the last ``longest - 1`` bytes of a window lies
+        wholly within it, and is chosen exactly as a scan of the whole file would.
+        Later bytes (or those of a match past that point) are carried into the
+        next window, so output is identical to ``splice`` in bounded memory.
+
+        """
+        carry: bytes = b""
+        while True:
+            chunk: bytes = f.read(STREAM_CHUNK)
+            THROTTLE(len(chunk), 0)
+            window: bytes = carry + chunk
+            safe: int = max(0, len(window) - self.longest + 1) if chunk else len(window)
+            # NOTE: End of the last match accepted, and the growth of output so far.
+            accepted: list[int] = [0, 0]
+
+            def replace(
+                match: re.Match, safe: int = safe, accepted: list[int] = accepted
+            ) -> bytes:
+                if match.start() >= safe:
+                    return match.group()
+                value: bytes = self.encoded[match.group()]
+                accepted[0] = match.end()
+                accepted[1] += len(value) - len(match.group())
+                return value
+
+            # NOTE: Matches past the safe point are left as is, and rescanned later.
+            output: bytes = self.bytes_pattern.sub(replace, window)
+            cut: int = max(safe, accepted[0])
+            yield output[: cut + accepted[1]]
+            if not chunk:
+                return
+            carry = window[cut:]
+
+
+@functools.lru_cache(maxsize=32)
+def _single(old: str, new: str) -> Replacer:
+    return Replacer({old: new})
+
+
+def read_mapping(path: str) -> dict[str, str]:
+    """Read `old=new` mappings from a file, one per line (`#` begins a comment)."""
+    mapping: dict[str, str] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith("#"):
+                mapping.update([parse_mapping(line.rstrip("\r\n"))])
+
+    return mapping
+
+
+def parse_mapping(value: str) -> tuple[str, str]:
+    """Parse a single `old=new` mapping."""
+    old, sep, new = value.partition("=")
+    if not sep or not old:
+        raise argparse.ArgumentTypeError(f"Expected a mapping as old=new: {value!r}")
+
+    return old, new
+
+
+def _temporary(path: str) -> str:
+    """Temporary (sibling) path a file is written to before replacing it."""
+    directory, name = os.path.split(path)
+
+    return os.path.join(directory, f".{name}.rename-tmp")
+
+
+def atomic_write(
+    path: str, data: Union[bytes, Iterable[bytes]], st: os.stat_result
+) -> None:
+    """Write data (or chunks of it) to a temporary file, then atomically replace path.
+
+    Files with several hardlinks are rewritten in place instead, since replacing
+    one link would silently detach it from the others. Chunks may be produced
+    from path itself, so they are only copied in place once fully written. Data
+    is not synced here; see ``Journal.checkpoint``.
+
+    """
+    THROTTLE(len(data) if isinstance(data, bytes) else 0)
+    if st.st_nlink > 1 and isinstance(data, bytes):
+        with open(path, "r+b") as f:
+            TELEMETRY.add("bytes_written", f.write(data))
+            f.truncate()
+        return
+
+    temporary: str = _temporary(path)
+    try:
+        with open(temporary, "wb") as f:
+            for chunk in [data] if isinstance(data, bytes) else data:
+                if not isinstance(data, bytes):
+                    THROTTLE(len(chunk), 0)
+                TELEMETRY.add("bytes_written", f.write(chunk))
+        if st.st_nlink > 1:
+            with open(temporary, "rb") as src, open(path, "r+b") as dst:
+                shutil.copyfileobj(src, dst, STREAM_CHUNK)
+                dst.truncate()
+            os.remove(temporary)
+            return
+        os.chmod(temporary, stat.S_IMODE(st.st_mode))
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary)
+        raise
+
+
+def _fsync(path: str) -> None:
+    """Flush a file or directory to disk, ignoring entries which no longer exist."""
+    try:
+        fd: int = os.open(path, os.O_RDONLY)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _state_path(root: str, name: str) -> str:
+    """Locate state kept for a tree: within its git directory, or else a user cache."""
+    top: Optional[str] = find_repo_root(root)
+    git_dir: Optional[str] = None if top is None else _git_dirs(top)[0]
+    if git_dir is not None:
+        return os.path.join(git_dir, name)
+
+    cache: str = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    digest: str = hashlib.sha256(os.path.realpath(root).encode()).hexdigest()
+
+    return os.path.join(cache, "rename", digest[:16], name)
+
+
+class Journal:
+    """Write-ahead journal making a rename resumable, and reversible.
+
+    Every operation is recorded (and flushed) before it is applied. Original file
+    contents are preserved as a hardlink to the replaced inode (or a copy), so a
+    rollback restores them exactly. Completion records are buffered until a
+    checkpoint (once per directory), which first syncs the files and directories
+    touched, so a completion record never precedes the data it describes.
+
+    A resumed run first undoes operations lacking a completion record, then skips
+    completed work: rewritten files are not read again, and completed
+    directories (or renamed files) are pruned from the walk entirely.
+
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory: str = directory
+        self.path: str = os.path.join(directory, "journal.jsonl")
+        self.backups: str = os.path.join(directory, "backups")
+        self._lock = threading.RLock()
+        self._file: Optional[TextIO] = None
+        self._load()
+
+    def _load(self) -> None:
+        self.records: list[dict] = []
+        self.written: set[str] = set()
+        self.completed: set[str] = set()
+        self._done: set[int] = set()
+        self._pending: list[dict] = []
+        self._unsynced: set[str] = set()
+
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    with contextlib.suppress(json.JSONDecodeError):
+                        self.records.append(json.loads(line))
+
+        for record in self.records:
+            if record["op"] == "done":
+                self._done.add(record["id"])
+            elif record["op"] == "complete":
+                self.completed.add(record["path"])
+
+    @staticmethod
+    def default_directory(root: str) -> str:
+        """Store the journal within the git directory, or else beneath root."""
+        top: Optional[str] = find_repo_root(root)
+        common_dir: Optional[str] = None if top is None else _git_dirs(top)[1]
+        if common_dir is None:
+            return os.path.join(root, ".rename-journal")
+
+        return os.path.join(common_dir, "rename-journal")
+
+    @property
+    def interrupted(self) -> bool:
+        """Whether a previous run started but never finished."""
+        return bool(self.records) and self.records[-1]["op"] != "finish"
+
+    @property
+    def mapping(self) -> Optional[dict[str, str]]:
+        """Mapping recorded by the run which created this journal."""
+        for record in self.records:
+            if record["op"] == "start":
+                return record["mapping"]
+
+        return None
+
+    def _append(self, record: dict) -> None:
+        if self._file is None:
+            os.makedirs(self.backups, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")  # pylint: disable=R1732
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def start(self, mapping: dict[str, str], resume: bool = False) -> None:
+        """Begin a new run, or resume an interrupted one."""
+        if not resume:
+            if self.interrupted:
+                raise RuntimeError(
+                    f"An interrupted rename was found ({self.path}). "
+                    "Use --resume to continue it, or --rollback to revert it."
+                )
+            # NOTE: The journal never claims (nor clears) a directory of other files.
+            if (
+                not os.path.exists(self.path)
+                and os.path.isdir(self.directory)
+                and os.listdir(self.directory)
+            ):
+                raise RuntimeError(
+                    f"The journal directory ({self.directory}) is not empty, "
+                    "and holds no journal."
+                )
+            self._discard()
+            self._load()
+            self._append({"op": "start", "mapping": mapping})
+            return
+
+        if not self.interrupted:
+            raise RuntimeError("No interrupted rename was found to resume.")
+        if self.mapping != mapping:
+            raise RuntimeError("Mappings differ from those of the interrupted rename.")
+
+        # NOTE: Revert operations lacking a completion record, then skip the rest.
+        for record in reversed(self.records):
+            if "id" in record and record["op"] != "done":
+                if record["id"] not in self._done:
+                    self._undo(record)
+                elif record["op"] == "write":
+                    self.written.add(record["path"])
+                elif record["op"] == "rename":
+                    self.completed.add(record["dst"])
+
+    def _discard(self) -> None:
+        """Remove the journal and its backups (nothing else within its directory)."""
+        if not os.path.exists(self.path):
+            return
+        shutil.rmtree(self.backups, ignore_errors=True)
+        os.remove(self.path)
+        # NOTE: The directory itself is only removed once empty.
+        with contextlib.suppress(OSError):
+            os.rmdir(self.directory)
+
+    def _begin(self, record: dict) -> int:
+        with self._lock:
+            record["id"] = len(self.records)
+            self.records.append(record)
+            self._append(record)
+
+        return record["id"]
+
+    def begin_write(self, path: str, st: os.stat_result) -> int:
+        """Record an intent to rewrite a file, preserving its original content."""
+        with self._lock:
+            backup: str = os.path.join(self.backups, str(len(self.records)))
+            inplace: bool = st.st_nlink > 1
+            op: int = self._begin(
+                {"op": "write", "path": path, "backup": backup, "inplace": inplace}
+            )
+        if inplace:
+            shutil.copy2(path, backup)
+        else:
+            try:
+                os.link(path, backup)
+            except OSError:
+                shutil.copy2(path, backup)
+
+        return op
+
+    def begin_rename(self, src: str, dst: str, is_dir: bool) -> int:
+        """Record an intent to rename a path."""
+        # NOTE: Children of a directory must be durable before it is renamed.
+        if is_dir:
+            self.checkpoint()
+
+        return self._begin({"op": "rename", "src": src, "dst": dst})
+
+    def done(self, op: int) -> None:
+        """Mark an operation complete, pending the next checkpoint."""
+        with self._lock:
+            record: dict = self.records[op]
+            target: str = record["path"] if record["op"] == "write" else record["dst"]
+            if record["op"] == "write":
+                self._unsynced.add(target)
+            elif record["src"] in self._unsynced:
+                self._unsynced.discard(record["src"])
+                self._unsynced.add(target)
+            self._unsynced.add(os.path.dirname(target))
+            self._pending.append({"op": "done", "id": op})
+
+    def complete(self, path: str) -> None:
+        """Mark a directory (by its final path) and its contents complete."""
+        with self._lock:
+            self._pending.append({"op": "complete", "path": path})
+        self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Sync touched files and directories, then commit pending records."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            unsynced, self._unsynced = self._unsynced, set()
+            for path in sorted(unsynced, key=len, reverse=True):
+                _fsync(path)
+            for record in pending:
+                self._append(record)
+            # NOTE: Lost completion markers of unchanged directories are harmless.
+            if unsynced and self._file is not None:
+                os.fsync(self._file.fileno())
+
+    def finish(self) -> None:
+        """Commit all pending records, and mark the run finished."""
+        self.checkpoint()
+        with self._lock:
+            self._append({"op": "finish"})
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def _undo(self, record: dict) -> int:
+        """Revert a single operation, if it was (even partially) applied."""
+        if record["op"] == "rename":
+            if os.path.lexists(record["dst"]) and not os.path.lexists(record["src"]):
+                os.rename(record["dst"], record["src"])
+                return 1
+            return 0
+
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(_temporary(record["path"]))
+        if not os.path.exists(record["backup"]):
+            return 0
+        if record["inplace"]:
+            shutil.copyfile(record["backup"], record["path"])
+            os.remove(record["backup"])
+        else:
+            os.replace(record["backup"], record["path"])
+
+        return 1
+
+    def rollback(self, log: Callable[[str], None] = print) -> int:
+        """Revert every recorded operation (newest first), then discard the journal."""
+        count: int = 0
+        for record in reversed(self.records):
+            if record["op"] in ("write", "rename") and self._undo(record):
+                count += 1
+                target: str = record.get("path") or record["src"]
+                log(f"Reverted {record['op']}: {target}")
+        self._discard()
+
+        return count
+
+
+class Manifest:
+    """Persistent record of file contents, so unchanged files are never reopened.
+
+    Each file searched is recorded (by its path relative to root) with its size,
+    ``mtime_ns``, inode, a hash of its content, and whether it contains any old
+    keyword. A later run trusts an entry only while the stat of the file still
+    matches, and skips clean files with a single ``stat``. Entries are discarded
+    entirely when the mapping (or root) differs from the run which wrote them.
+
+    Like git's index, entries modified no earlier than the manifest itself was
+    written are considered racy, and are always read again.
+
+    """
+
+    version: int = 1
+
+    def __init__(self, path: str, root: str, replacer: Replacer, renames: bool = True):
+        self.path: str = path
+        self.root: str = os.path.realpath(root)
+        self.replacer: Replacer = replacer
+        self.renames: bool = renames
+        self.signature: str = hashlib.sha256(
+            json.dumps(
+                [self.version, self.root, sorted(replacer.mapping.items())]
+            ).encode("utf-8")
+        ).hexdigest()
+        self.entries: dict[str, list] = {}
+        self.updated: dict[str, list] = {}
+        self.hits: int = 0
+        self._prefix: str = os.path.join(root, "")
+        self._lock = threading.Lock()
+        self._timestamp: int = 0
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._timestamp = os.fstat(f.fileno()).st_mtime_ns
+                data: dict = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("signature") == self.signature:
+            self.entries = data["entries"]
+
+    @staticmethod
+    def default_path(root: str) -> str:
+        """Store the manifest within the git directory, or else a user cache."""
+        return _state_path(root, "rename-manifest.json")
+
+    def _key(self, path: str) -> str:
+        if path.startswith(self._prefix):
+            rel: str = path[len(self._prefix) :]
+        else:
+            rel = os.path.relpath(path, self.root)
+
+        return rel.replace(os.sep, "/")
+
+    def clean(self, path: str, st: os.stat_result) -> bool:
+        """Return True if a file is unchanged, and known to contain no old keyword."""
+        key: str = self._key(path)
+        entry: Optional[list] = self.entries.get(key)
+        if (
+            entry is None
+            or entry[4]
+            or entry[:3] != [st.st_size, st.st_mtime_ns, st.st_ino]
+            or st.st_mtime_ns >= self._timestamp
+        ):
+            return False
+
+        with self._lock:
+            self.updated[key] = entry
+            self.hits += 1
+
+        return True
+
+    def needle(self, path: str, digest: str) -> Optional[bool]:
+        """Whether content (by hash) previously recorded for a file had keywords."""
+        entry: Optional[list] = self.entries.get(self._key(path))
+        if entry is None or entry[3] != digest:
+            return None
+
+        return entry[4]
+
+    def record(self, path: str, st: os.stat_result, digest: str, needle: bool) -> None:
+        """Record the state of a file, under its path once renamed."""
+        key: str = self._key(path)
+        if self.renames:
+            key = "/".join(self.replacer.sub(part) for part in key.split("/"))
+        with self._lock:
+            self.updated[key] = [st.st_size, st.st_mtime_ns, st.st_ino, digest, needle]
+
+    def save(self) -> None:
+        """Atomically replace the manifest with entries of files seen this run."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary: str = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"signature": self.signature, "entries": self.updated}))
+        os.replace(temporary, self.path)
+
+
+def _hasher() -> Any:
+    return hashlib.blake2b(digest_size=16)
+
+
+def _digest(data: Union[bytes, mmap.mmap]) -> str:
+    hasher = _hasher()
+    hasher.update(data)
+
+    return hasher.hexdigest()
+
+
+def _fingerprint(
+    path: str, replacer: Replacer, data: Optional[bytes] = None
+) -> tuple[os.stat_result, str, bool]:
+    """Stat, hash, and search a file (whose content may already be known)."""
+    TELEMETRY.add("stats")
+    if data is not None:
+        return os.stat(path), _digest(data), replacer.find(data)
+
+    with open(path, "rb") as f:
+        hasher = _hasher()
+        found: bool = replacer.stream_find(f, hasher)
+
+        return os.fstat(f.fileno()), hasher.hexdigest(), found
+
+
+TRIGRAM_MAGIC: bytes = b"RNTRIGR1"
+_SEGMENT_HEADER = struct.Struct("<8sII")
+
+
+def trigrams(data: bytes) -> set[int]:
+    """Distinct trigrams (as 24 bit integers) within each line of data."""
+    found: set[tuple[int, int, int]] = set()
+    for line in set(data.split(b"\n")):
+        found.update(zip(line, line[1:], line[2:]))
+
+    return {(a << 16) | (b << 8) | c for a, b, c in found}
+
+
+class _Segment:
+    """Read only (mmap) view of a segment: sorted trigrams, offsets, and postings.
+
+    Arrays are written in native byte order, since an index is local to a machine.
+
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, n_keys, n_postings = _SEGMENT_HEADER.unpack_from(view)
+        if magic != TRIGRAM_MAGIC:
+            raise ValueError(f"Not a trigram index segment: {path}")
+
+        start: int = _SEGMENT_HEADER.size
+        self.keys = view[start : start + 4 * n_keys].cast("I")
+        start += 4 * n_keys
+        self.offsets = view[start : start + 4 * (n_keys + 1)].cast("I")
+        start += 4 * (n_keys + 1)
+        self.postings = view[start : start + 4 * n_postings].cast("I")
+
+    @staticmethod
+    def write(path: str, postings: dict[int, list[int]]) -> None:
+        """Atomically write posting lists (keyed by trigram) as a segment."""
+        keys = array("I", sorted(postings))
+        offsets = array("I", [0])
+        flat = array("I")
+        for key in keys:
+            flat.extend(postings[key])
+            offsets.append(len(flat))
+
+        temporary: str = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(_SEGMENT_HEADER.pack(TRIGRAM_MAGIC, len(keys), len(flat)))
+            keys.tofile(f)
+            offsets.tofile(f)
+            flat.tofile(f)
+        os.replace(temporary, path)
+
+    def lookup(self, key: int) -> memoryview:
+        """Sorted ids of files containing a trigram."""
+        i: int = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return self.postings[:0]
+
+        return self.postings[self.offsets[i] : self.offsets[i + 1]]
+
+    def close(self) -> None:
+        """Release every view, then unmap the segment."""
+        for view in (self.keys, self.offsets, self.postings):
+            view.release()
+        self._mmap.close()
+
+
+class TrigramIndex:
+    """Incrementally maintained trigram index, to find files without reading them.
+
+    A file can only contain a name if it contains every trigram of that name, so
+    intersecting the posting lists of those trigrams yields a (small) superset of
+    the files to verify. Postings are stored in segment files, loaded with mmap.
+
+    Files are tracked by size, ``mtime_ns`` and inode (racy entries are treated as
+    changed, as in the manifest). An update only reads files which changed since
+    they were indexed, and appends them as a new segment; the entries they
+    replace in older segments are simply no longer live. Segments are rebuilt
+    from scratch once too many accumulate, or most of their entries are stale.
+    Binary files (NUL bytes) are not indexed, and never candidates.
+
+    """
+
+    version: int = 1
+    max_segments: int = 8
+
+    def __init__(self, directory: str, root: str) -> None:
+        self.directory: str = directory
+        self.path: str = os.path.join(directory, "index.json")
+        self.root: str = root
+        self.files: dict[str, list] = {}
+        self.segments: dict[str, list[str]] = {}
+        self._next: int = 0
+        self._prefix: str = os.path.join(root, "")
+        self._mapped: dict[str, _Segment] = {}
+        self._timestamp: int = 0
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._timestamp = os.fstat(f.fileno()).st_mtime_ns
+                data: dict = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("version") == self.version and data.get("root") == os.path.realpath(
+            root
+        ):
+            self.files = data["files"]
+            self.segments = data["segments"]
+            self._next = data["next"]
+
+    @staticmethod
+    def default_directory(root: str) -> str:
+        """Store the index within the git directory, or else a user cache."""
+        return _state_path(root, "rename-index")
+
+    def _key(self, path: str) -> str:
+        if path.startswith(self._prefix):
+            rel: str = path[len(self._prefix) :]
+        else:
+            rel = os.path.relpath(path, self.root)
+
+        return rel.replace(os.sep, "/")
+
+    def _fresh(self, rel: str, st: os.stat_result) -> bool:
+        entry: Optional[list] = self.files.get(rel)
+
+        return (
+            entry is not None
+            and entry[2:] == [st.st_size, st.st_mtime_ns, st.st_ino]
+            and st.st_mtime_ns < self._timestamp
+        )
+
+    def _segment(self, name: str) -> _Segment:
+        if name not in self._mapped:
+            self._mapped[name] = _Segment(os.path.join(self.directory, name))
+
+        return self._mapped[name]
+
+    def close(self) -> None:
+        """Unmap every segment."""
+        for segment in self._mapped.values():
+            segment.close()
+        self._mapped.clear()
+
+    def update(self, ignored: Callable[[str], bool]) -> int:
+        """Index every new or changed file (and forget deleted ones).
+
+        Returns:
+            (int): number of files (re)read.
+
+        """
+        found: dict[str, os.stat_result] = {}
+        for full_path, entry in walk(self.root, ignored):
+            if entry.is_file(follow_symlinks=False):
+                TELEMETRY.add("stats")
+                found[self._key(full_path)] = entry.stat(follow_symlinks=False)
+
+        changed: list[str] = [
+            rel for rel, st in found.items() if not self._fresh(rel, st)
+        ]
+        stale: set[str] = set(changed)
+        before: int = len(self.files)
+        self.files = {
+            rel: entry
+            for rel, entry in self.files.items()
+            if rel in found and rel not in stale
+        }
+        total: int = sum(map(len, self.segments.values()))
+        if len(self.segments) >= self.max_segments or 2 * len(self.files) < total:
+            self.files.clear()
+            changed = list(found)
+
+        live: set[str] = {entry[0] for entry in self.files.values()}
+        if changed:
+            name: str = f"{self._next:08d}.seg"
+            self._next += 1
+            self.segments[name] = self._build(name, changed, found)
+            live.add(name)
+
+        self.close()
+        for name in [name for name in self.segments if name not in live]:
+            del self.segments[name]
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.directory, name))
+        if changed or len(self.files) != before:
+            self._save()
+
+        return len(changed)
+
+    def _build(
+        self, name: str, paths: list[str], found: dict[str, os.stat_result]
+    ) -> list[str]:
+        """Write a segment of files (by relative path), returning those indexed."""
+        postings: dict[int, list[int]] = {}
+        indexed: list[str] = []
+        for rel in paths:
+            try:
+                with open(os.path.join(self.root, rel), "rb") as f:
+                    data: bytes = f.read()
+            except OSError:
+                continue
+            # NOTE: Binary files are tracked (with id -1), but never indexed.
+            st: os.stat_result = found[rel]
+            binary: bool = b"\x00" in data[:SNIFF_SIZE]
+            self.files[rel] = [
+                name,
+                -1 if binary else len(indexed),
+                st.st_size,
+                st.st_mtime_ns,
+                st.st_ino,
+            ]
+            if binary:
+                continue
+            for key in trigrams(data):
+                postings.setdefault(key, []).append(len(indexed))
+            indexed.append(rel)
+
+        os.makedirs(self.directory, exist_ok=True)
+        _Segment.write(os.path.join(self.directory, name), postings)
+
+        return indexed
+
+    def _save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        temporary: str = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            data: dict = {
+                "version": self.version,
+                "root": os.path.realpath(self.root),
+                "next": self._next,
+                "segments": self.segments,
+                "files": self.files,
+            }
+            f.write(json.dumps(data))
+        os.replace(temporary, self.path)
+
+    def candidates(self, names: Iterable[str]) -> set[str]:
+        """Relative paths of indexed files which may contain any of the names."""
+        needles: list[set[int]] = []
+        for name in names:
+            data: bytes = name.encode("utf-8")
+            # NOTE: Trigrams never span lines, and short names have none at all.
+            if len(data) < 3 or b"\n" in data:
+                return {rel for rel, entry in self.files.items() if entry[1] >= 0}
+            needles.append(trigrams(data))
+
+        found: set[str] = set()
+        for name, paths in self.segments.items():
+            segment: _Segment = self._segment(name)
+            for keys in needles:
+                lists: list[memoryview] = sorted(map(segment.lookup, keys), key=len)
+                ids: set[int] = set(lists[0])
+                for postings in lists[1:]:
+                    if not ids:
+                        break
+                    ids.intersection_update(postings)
+                for i in ids:
+                    entry: Optional[list] = self.files.get(paths[i])
+                    if entry is not None and entry[:2] == [name, i]:
+                        found.add(paths[i])
+
+        return found
+
+
+def where(
+    index: TrigramIndex, names: Sequence[str], log: Callable[[str], None] = print
+) -> int:
+    """Report each line using any of the names, reading only candidate files."""
+    replacer = Replacer(dict.fromkeys(names, ""))
+    count: int = 0
+    for rel in sorted(index.candidates(replacer.mapping)):
+        try:
+            with open(os.path.join(index.root, rel), "r", encoding="utf-8") as f:
+                lines: list[str] = f.read().splitlines()
+        except (UnicodeDecodeError, FileNotFoundError) as e:
+            log(f"[Warning] ({e.__class__.__name__}) {rel}")
+            continue
+        for lineno, line in enumerate(lines, 1):
+            if replacer.search(line):
+                log(f"{rel}:{lineno}: {line.strip()}")
+                count += 1
+
+    return count
+
+
+class MatchIndex:
+    """Compact, array backed index of every keyword matched within a tree.
+
+    Each match takes five machine words (rather than a python object): the id of
+    its file, its byte offset, line and (byte) column, and the index of its
+    keyword, appended to parallel ``array`` columns. Matches of a file are always
+    contiguous, so millions of them are held in a few tens of MB, and written out
+    (as json lines, or unified diffs) file by file as a stream.
+
+    """
+
+    def __init__(self, root: str, replacer: Replacer) -> None:
+        self.root: str = root
+        self.replacer: Replacer = replacer
+        self.keys: list[bytes] = list(replacer.encoded)
+        self.paths: list[str] = []
+        self.file_ids: array = array("I")
+        self.offsets: array = array("Q")
+        self.lines: array = array("I")
+        self.columns: array = array("I")
+        self.key_ids: array = array("I")
+        #: Index (of the first match) of each file; file ids index paths and starts.
+        self.starts: array = array("Q")
+        #: Paths of files which are renamed (whether or not their contents match).
+        self.moved: list[str] = []
+        self._prefix: str = os.path.join(root, "")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def add(self, path: str, buffer: Union[bytes, mmap.mmap]) -> int:
+        """Index every match within the contents of a file, returning their count."""
+        key_ids: dict[bytes, int] = {k: i for i, k in enumerate(self.keys)}
+        offsets, lines, columns, keys = array("Q"), array("I"), array("I"), array("I")
+        line, line_start, position = 1, 0, 0
+        for match in self.replacer.bytes_pattern.finditer(buffer):
+            start: int = match.start()
+            newlines: int = _newlines(buffer, position, start)
+            if newlines:
+                line += newlines
+                line_start = buffer.rfind(b"\n", position, start) + 1
+            position = start
+            offsets.append(start)
+            lines.append(line)
+            columns.append(start - line_start + 1)
+            keys.append(key_ids[match.group()])
+        if not offsets:
+            return 0
+
+        rel: str = self._relative(path)
+        with self._lock:
+            self.starts.append(len(self.offsets))
+            self.file_ids.extend(array("I", [len(self.paths)]) * len(offsets))
+            self.paths.append(rel)
+            self.offsets.extend(offsets)
+            self.lines.extend(lines)
+            self.columns.extend(columns)
+            self.key_ids.extend(keys)
+
+        return len(offsets)
+
+    def _relative(self, path: str) -> str:
+        rel: str = path[len(self._prefix) :] if path.startswith(self._prefix) else path
+        return rel.replace(os.sep, "/")
+
+    def move(self, path: str) -> bool:
+        """Record a file whose path is renamed, returning whether it is."""
+        rel: str = self._relative(path)
+        if self.replacer.sub(rel) == rel:
+            return False
+        with self._lock:
+            self.moved.append(rel)
+
+        return True
+
+    def scan(self, path: str) -> int:
+        """Index every match within a file (mapped, rather than read, if large)."""
+        with open(path, "rb") as f:
+            st: os.stat_result = os.fstat(f.fileno())
+            buffer: Union[bytes, mmap.mmap] = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b""
+            )
+        try:
+            return self.add(path, buffer)
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+    def _spans(self) -> Iterator[tuple[str, int, int]]:
+        """Yield (path, first, last) match indices of each file, sorted by path."""
+        ends = [*self.starts[1:], len(self.offsets)]
+        for i in sorted(range(len(self.paths)), key=self.paths.__getitem__):
+            yield self.paths[i], self.starts[i], ends[i]
+
+    def jsonl(self, stream: BinaryIO) -> None:
+        """Write every match as a line of json, file by file (sorted by path)."""
+        encoded: dict[bytes, bytes] = self.replacer.encoded
+        for path, first, last in self._spans():
+            for i in range(first, last):
+                key: bytes = self.keys[self.key_ids[i]]
+                record: dict[str, Any] = {
+                    "path": path,
+                    "line": self.lines[i],
+                    "column": self.columns[i],
+                    "offset": self.offsets[i],
+                    "old": key.decode("utf-8"),
+                    "new": encoded[key].decode("utf-8"),
+                }
+                stream.write(json.dumps(record).encode("utf-8") + b"\n")
+
+    def diff(self, stream: BinaryIO, context: int = 3) -> None:
+        """Write a unified diff of every file matched (or moved), line by line.
+
+        Files are expected to be unchanged since they were indexed (a dry run).
+        Headers are those of ``git diff`` (renaming each file, as the rename
+        would), so the diff may be applied with ``git apply``. Files which are
+        renamed without any match (e.g. within a renamed directory) are pure
+        renames.
+
+        """
+        spans: dict[str, tuple[int, int]] = {j: (k, m) for j, k, m in self._spans()}
+        for path in sorted({*spans, *self.moved}):
+            if path not in spans:
+                new: str = self.replacer.sub(path)
+                stream.write(
+                    f"diff --git a/{path} b/{new}\nsimilarity index 100%\n"
+                    f"rename from {path}\nrename to {new}\n".encode("utf-8")
+                )
+                continue
+            first, last = spans[path]
+            changed: list[int] = sorted(set(self.lines[first:last]))
+            new = self.replacer.sub(path)
+            renamed: str = (
+                f"rename from {path}\nrename to {new}\n" if new != path else ""
+            )
+            header: bytes = (
+                f"diff --git a/{path} b/{new}\n{renamed}--- a/{path}\n+++ b/{new}\n"
+            ).encode("utf-8")
+            with open(os.path.join(self.root, *path.split("/")), "rb") as f:
+                for n, hunk in enumerate(_hunks(f, changed, self.replacer, context)):
+                    stream.write(header if n == 0 else b"")
+                    stream.write(hunk)
+
+
+def _newlines(buffer: Union[bytes, mmap.mmap], start: int, end: int) -> int:
+    """Count newlines within a range of a buffer (copying a chunk at a time)."""
+    if isinstance(buffer, bytes):
+        return buffer.count(b"\n", start, end)
+
+    return sum(
+        buffer[i : min(i + STREAM_CHUNK, end)].count(b"\n")
+        for i in range(start, end, STREAM_CHUNK)
+    )
+
+
+def _hunks(
+    f: BinaryIO, changed: list[int], replacer: Replacer, context: int
+) -> Iterator[bytes]:
+    """Yield hunks (of a unified diff) replacing keywords on the changed lines."""
+    # NOTE: Changed lines within twice the context of each other share a hunk.
+    groups: list[list[int]] = []
+    for target in changed:
+        if groups and target - groups[-1][1] <= 2 * context:
+            groups[-1][1] = target
+        else:
+            groups.append([target, target])
+
+    targets: set[int] = set(changed)
+    group: int = 0
+    lines: list[tuple[int, bytes]] = []
+    for number, line in enumerate(f, 1):
+        if number > groups[group][1] + context:
+            yield _hunk(lines, targets, replacer)
+            lines = []
+            group += 1
+            if group == len(groups):
+                return
+        if number >= groups[group][0] - context:
+            lines.append((number, line))
+    if lines:
+        yield _hunk(lines, targets, replacer)
+
+
+def _hunk(
+    lines: list[tuple[int, bytes]], targets: set[int], replacer: Replacer
+) -> bytes:
+    """Format a single hunk, whose changed lines are removed, then added, in runs."""
+    output: list[bytes] = [
+        f"@@ -{lines[0][0]},{len(lines)} +{lines[0][0]},{len(lines)} @@\n".encode()
+    ]
+    removed: list[bytes] = []
+    added: list[bytes] = []
+    for number, line in lines:
+        if number in targets:
+            removed.append(b"-" + _diff_line(line))
+            added.append(b"+" + _diff_line(replacer.splice(line)))
+            continue
+        output += removed + added
+        removed, added = [], []
+        output.append(b" " + _diff_line(line))
+    output += removed + added
+
+    return b"".join(output)
+
+
+def _diff_line(line: bytes) -> bytes:
+    if line.endswith(b"\n"):
+        return line
+
+    return line + b"\n\\ No newline at end of file\n"
+
+
+def _contents(f: BinaryIO, st: os.stat_result) -> Union[bytes, mmap.mmap]:
+    """Map (or read, if small) an entire file, hinting it is read sequentially."""
+    # NOTE: Empty files (and those, like procfs, reporting no size) cannot be mapped.
+    if st.st_size < MMAP_THRESHOLD or not st.st_size:
+        return f.read()
+
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        buffer.madvise(mmap.MADV_SEQUENTIAL)
+
+    return buffer
+
+
+def replace_in_file(
+    filepath: str,
+    old: str,
+    new: str,
+    dry_run: bool = False,
+    log: Callable[[str], None] = print,
+    classifier: Optional[Classifier] = None,
+    replacer: Optional[Replacer] = None,
+    journal: Optional[Journal] = None,
+    manifest: Optional[Manifest] = None,
+    matches: Optional[MatchIndex] = None,
+) -> int:
+    """Replace an old keyword (or every mapping of a replacer) found within a file.
+
+    Every match within a file to update is recorded in ``matches``, if given.
+    Without a classifier, files which are not text (e.g. binary) are still skipped.
+
+    """
+    replacer = replacer or _single(old, new)
+    if journal is not None and os.path.abspath(filepath) in journal.written:
+        return 0
+
+    if classifier is None:
+        classifier = Classifier(os.path.dirname(filepath))
+    elif classifier.skip_path(filepath):
+        return 0
+
+    digest: str = ""
+    found: Optional[bool] = None
+    data: Optional[bytes] = None
+    try:
+        # NOTE: A single stat suffices to skip files a manifest knows are clean.
+        if manifest is not None:
+            TELEMETRY.add("stats")
+            if manifest.clean(filepath, os.stat(filepath)):
+                return 0
+        with open(filepath, "rb") as f:
+            TELEMETRY.add("stats")
+            st: os.stat_result = os.fstat(f.fileno())
+            # NOTE: Streamed files are throttled chunk by chunk, as they are read.
+            THROTTLE(0 if st.st_size >= STREAM_THRESHOLD else st.st_size)
+            if st.st_size >= STREAM_THRESHOLD:
+                # NOTE: Huge files are streamed (again, once matched) in bounded memory.
+                if classifier.skip_content(st, f.read(SNIFF_SIZE)):
+                    return 0
+                f.seek(0)
+                hasher: Optional[Any] = None if manifest is None else _hasher()
+                found = replacer.stream_find(f, hasher)
+                digest = "" if hasher is None else hasher.hexdigest()
+                TELEMETRY.add("bytes_read", f.tell())
+                if found and matches is not None:
+                    matches.scan(filepath)
+            else:
+                buffer: Union[bytes, mmap.mmap] = _contents(f, st)
+                TELEMETRY.add("bytes_read", len(buffer))
+                try:
+                    if classifier.skip_content(st, buffer[:SNIFF_SIZE]):
+                        return 0
+                    if manifest is not None:
+                        digest = _digest(buffer)
+                        found = manifest.needle(filepath, digest)
+                    if found is None:
+                        found = replacer.find(buffer)
+                    if found and matches is not None:
+                        matches.add(filepath, buffer)
+                    # NOTE: Only matching files are spliced (and copied) at all.
+                    if found and not dry_run:
+                        data = replacer.splice(buffer)
+                finally:
+                    if isinstance(buffer, mmap.mmap):
+                        buffer.close()
+    except FileNotFoundError as e:
+        log(f"[Warning] ({e.__class__.__name__}) {filepath}")
+        return 0
+
+    TELEMETRY.add("files_scanned")
+    if not found:
+        if manifest is not None:
+            manifest.record(filepath, st, digest, False)
+        return 0
+
+    if dry_run:
+        log(f"[DRY RUN] Would update content within file: {filepath}")
+        if manifest is not None:
+            manifest.record(filepath, st, digest, True)
+
+    else:
+        op: int = -1
+        if journal is not None:
+            op = journal.begin_write(os.path.abspath(filepath), st)
+        if data is None:
+            with open(filepath, "rb") as f:
+                atomic_write(filepath, replacer.stream_splice(f), st)
+                TELEMETRY.add("bytes_read", f.tell())
+        else:
+            atomic_write(filepath, data, st)
+        if journal is not None:
+            journal.done(op)
+        if manifest is not None:
+            manifest.record(filepath, *_fingerprint(filepath, replacer, data))
+        TELEMETRY.add("files_written")
+        log(f"Updated content within file: {filepath}")
+
+    return 1
+
+
+class _Rewound:
+    """Readable stream of bytes already read (a sniffed head), then the rest.
+
+    Everything read is hashed, so a member may be compared with its replacement.
+
+    """
+
+    def __init__(self, head: bytes, f: IO[bytes]) -> None:
+        self._head: bytes = head
+        self._f: IO[bytes] = f
+        self.hasher: Any = _hasher()
+        self.hasher.update(head)
+
+    def read(self, n: int = -1) -> bytes:
+        """Read (exactly) n bytes, unless the end of the stream is reached first."""
+        if n >= 0 and n <= len(self._head):
+            data, self._head = self._head[:n], self._head[n:]
+            return data
+
+        rest: bytes = self._f.read(-1 if n < 0 else n - len(self._head))
+        self.hasher.update(rest)
+        data = self._head + rest
+        self._head = b""
+
+        return data
+
+
+def _archive_format(path: str) -> str:
+    """Identify the format (or compression of a tar archive) from its name."""
+    name: str = os.path.basename(path).lower()
+    if name.endswith(".zip"):
+        return "zip"
+    for suffixes, compression in (
+        ((".tar.gz", ".tgz"), "gz"),
+        ((".tar.bz2", ".tbz2", ".tbz"), "bz2"),
+        ((".tar.xz", ".txz"), "xz"),
+    ):
+        if name.endswith(suffixes):
+            return compression
+
+    return ""
+
+
+def _member_stat(mode: int, size: int) -> os.stat_result:
+    """Stat (of the fields a Classifier consults) describing an archive member."""
+    return os.stat_result((stat.S_IFREG | mode, 0, 0, 1, 0, 0, size, 0, 0, 0))
+
+
+def _stream_member(
+    name: str,
+    f: IO[bytes],
+    st: os.stat_result,
+    write: Callable[[bytes], Any],
+    replacer: Replacer,
+    classifier: Optional[Classifier],
+) -> bool:
+    """Write the contents of an archive member (replaced, unless skipped).
+
+    Returns:
+        (bool): True if the contents were changed.
+
+    """
+    head: bytes = f.read(SNIFF_SIZE)
+    stream = _Rewound(head, f)
+    if classifier is not None and (
+        classifier.skip_path(name) or classifier.skip_content(st, head)
+    ):
+        chunks: Iterable[bytes] = iter(
+            functools.partial(stream.read, STREAM_CHUNK), b""
+        )
+    else:
+        TELEMETRY.add("files_scanned")
+        chunks = replacer.stream_splice(cast(BinaryIO, stream))
+
+    hasher: Any = _hasher()
+    for chunk in chunks:
+        hasher.update(chunk)
+        write(chunk)
+    TELEMETRY.add("bytes_read", st.st_size)
+
+    return hasher.digest() != stream.hasher.digest()
+
+
+def _report_member(
+    name: str, new_name: str, updated: bool, dry_run: bool, log: Callable[[str], None]
+) -> int:
+    """Log changes to an archive member, returning 1 if there were any."""
+    prefix: str = "[DRY RUN] Would " if dry_run else ""
+    if updated:
+        TELEMETRY.add("files_written")
+        log(f"{prefix}{'u' if dry_run else 'U'}pdate content within member: {name}")
+    if new_name != name:
+        TELEMETRY.add("renames")
+        log(f"{prefix}{'r' if dry_run else 'R'}ename member: {name} -> {new_name}")
+
+    return int(updated or new_name != name)
+
+
+def rename_archive(
+    source: str,
+    destination: Union[str, BinaryIO, None],
+    replacer: Replacer,
+    classifier: Optional[Classifier] = None,
+    log: Callable[[str], None] = print,
+) -> int:
+    """Rename a template archive (tar or zip) member by member, in a single pass.
+
+    Members are read as a stream; their paths and (text) contents are replaced just
+    as those of a tree would be, and written to a new archive of the same format on
+    the fly (a tar archive is compressed as the name of its destination implies).
+    Member paths are classified relative to the root of the archive.
 
+    Args:
+        source (str): Archive to read (``-`` reads a tar archive from stdin).
+        destination (Union[str, BinaryIO]): Archive (path, or stream) to write, or
+            None to report what would change (a dry run).
+        replacer (Replacer): Mappings to replace.
+        classifier (Classifier): Decide which members to scan (e.g. not binary).
+        log (Callable[[str], None]): Report each member changed.
 
-def safe_scandir(path: str) -> Iterator[os.DirEntry]:
-    """Wrapper around os.scandir."""
-    try:
-        with os.scandir(path) as it:
-            yield from it
-    except PermissionError:
-        return
+    Returns:
+        (int): Number of members modified (renamed, or updated).
 
+    Notes:
+        * A tar header records the size of its member, so each member is spooled
+          (to a temporary file, beyond ``STREAM_CHUNK`` bytes) before it is written.
+          Zip members are written directly.
+        * Zip archives must be read from a (seekable) file.
 
-def replace_in_file(
-    filepath: str,
-    old: str,
-    new: str,
-    dry_run: bool = False,
+    """
+    if source != "-" and (
+        _archive_format(source) == "zip" or zipfile.is_zipfile(source)
+    ):
+        return _rename_zip(source, destination, replacer, classifier, log)
+
+    return _rename_tar(source, destination, replacer, classifier, log)
+
+
+def _rename_tar(
+    source: str,
+    destination: Union[str, BinaryIO, None],
+    replacer: Replacer,
+    classifier: Optional[Classifier],
+    log: Callable[[str], None],
 ) -> int:
-    """Replace an old keyword found within a file."""
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            content = f.read()
-    except (UnicodeDecodeError, FileNotFoundError) as e:
-        print(f"[Warning] ({e.__class__.__name__}) {filepath}")
-        return 0
+    total: int = 0
+    with contextlib.ExitStack() as stack:
+        reader: tarfile.TarFile = stack.enter_context(
+            tarfile.open(source, "r|*")
+            if source != "-"
+            else tarfile.open(fileobj=sys.stdin.buffer, mode="r|*")
+        )
+        writer: Optional[tarfile.TarFile] = None
+        if isinstance(destination, str):
+            mode: Any = f"w|{_archive_format(destination)}"
+            writer = stack.enter_context(tarfile.open(destination, mode))
+        elif destination is not None:
+            writer = stack.enter_context(tarfile.open(fileobj=destination, mode="w|"))
 
-    if old not in content:
-        return 0
+        for member in reader:
+            info: tarfile.TarInfo = copy.copy(member)
+            # NOTE: Long paths are recorded in pax headers, which take precedence
+            # over the name (and linkname) of a member when it is written.
+            info.pax_headers = {
+                key: value
+                for key, value in member.pax_headers.items()
+                if key not in ("path", "linkpath")
+            }
+            info.name = replacer.sub(member.name)
+            if member.islnk():
+                info.linkname = replacer.sub(member.linkname)
+            updated: bool = False
+            f: Optional[IO[bytes]] = None
+            if member.isreg():
+                f = reader.extractfile(member)
+            if f is None:
+                total += _report_member(
+                    member.name, info.name, updated, writer is None, log
+                )
+                if writer is not None:
+                    writer.addfile(info)
+                continue
 
-    if dry_run:
-        print(f"[DRY RUN] Would update content within file: {filepath}")
+            with tempfile.SpooledTemporaryFile(max_size=STREAM_CHUNK) as spool:
+                st: os.stat_result = _member_stat(member.mode, member.size)
+                updated = _stream_member(
+                    member.name, f, st, spool.write, replacer, classifier
+                )
+                total += _report_member(
+                    member.name, info.name, updated, writer is None, log
+                )
+                if writer is not None:
+                    info.size = spool.tell()
+                    spool.seek(0)
+                    writer.addfile(info, cast(BinaryIO, spool))
+                    TELEMETRY.add("bytes_written", info.size)
 
-    else:
-        new_content: str = content.replace(old, new)
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(new_content)
-        print(f"Updated content within file: {filepath}")
+    return total
 
-    return 1
+
+def _rename_zip(
+    source: str,
+    destination: Union[str, BinaryIO, None],
+    replacer: Replacer,
+    classifier: Optional[Classifier],
+    log: Callable[[str], None],
+) -> int:
+    total: int = 0
+    with contextlib.ExitStack() as stack:
+        reader = stack.enter_context(zipfile.ZipFile(source))
+        writer: Optional[zipfile.ZipFile] = None
+        if destination is not None:
+            writer = stack.enter_context(zipfile.ZipFile(destination, "w"))
+            writer.comment = reader.comment
+
+        for member in reader.infolist():
+            info = zipfile.ZipInfo(replacer.sub(member.filename), member.date_time)
+            info.compress_type = member.compress_type
+            info.external_attr = member.external_attr
+            info.create_system = member.create_system
+            info.comment = member.comment
+            info.extra = member.extra
+            updated: bool = False
+            if member.is_dir():
+                if writer is not None:
+                    writer.writestr(info, b"")
+            else:
+                st: os.stat_result = _member_stat(
+                    member.external_attr >> 16, member.file_size
+                )
+                with contextlib.ExitStack() as streams:
+                    f = streams.enter_context(reader.open(member))
+                    write: Callable[[bytes], Any] = len
+                    if writer is not None:
+                        # NOTE: Sizes are unknown in advance, so zip64 when large.
+                        large: bool = member.file_size > zipfile.ZIP64_LIMIT // 2
+                        output = streams.enter_context(
+                            writer.open(info, "w", force_zip64=large)
+                        )
+                        write = output.write
+                    updated = _stream_member(
+                        member.filename,
+                        f,
+                        st,
+                        write,
+                        replacer,
+                        classifier,
+                    )
+                if writer is not None:
+                    TELEMETRY.add("bytes_written", info.file_size)
+            total += _report_member(
+                member.filename, info.filename, updated, writer is None, log
+            )
+
+    return total
 
 
 def update_project_name(
@@ -122,23 +2522,28 @@ def update_project_name(
     dry_run: bool,
     git_root: str,
     timeout: int = 1,
+    ignored: Optional[Callable[[str], bool]] = None,
+    classifier: Optional[Classifier] = None,
+    replacer: Optional[Replacer] = None,
+    manifest: Optional[Manifest] = None,
 ) -> int:
-    """Recursively search, and modify files in place to update project name if used."""
-    count = 0
-    for entry in safe_scandir(path):
-        full_path = os.path.join(path, entry.name)
+    """Search, and modify files in place to update project name if used."""
+    if ignored is None:
+        ignored = functools.partial(bypass, git_root=git_root, timeout=timeout)
 
-        if bypass(full_path, git_root, timeout):
-            continue
-
-        if entry.is_dir(follow_symlinks=False):
-            count += update_project_name(
-                full_path, old_name, new_name, dry_run, git_root
+    count = 0
+    for full_path, entry in walk(path, ignored):
+        if entry.is_file(follow_symlinks=False):
+            count += replace_in_file(
+                full_path,
+                old_name,
+                new_name,
+                dry_run,
+                classifier=classifier,
+                replacer=replacer,
+                manifest=manifest,
             )
 
-        elif entry.is_file(follow_symlinks=False):
-            count += replace_in_file(full_path, old_name, new_name, dry_run)
-
     return count
 
 
@@ -152,6 +2557,44 @@ def _filetype(entry: os.DirEntry) -> str:
     return key
 
 
+def rename_entry(
+    full_path: str,
+    entry: os.DirEntry,
+    old_name: str,
+    new_name: str,
+    dry_run: bool = False,
+    log: Callable[[str], None] = print,
+    replacer: Optional[Replacer] = None,
+    journal: Optional[Journal] = None,
+) -> int:
+    """Rename a single directory or file if its name contains the old keyword."""
+    replacer = replacer or _single(old_name, new_name)
+    if not replacer.search(entry.name):
+        return 0
+
+    new_path = os.path.join(os.path.dirname(full_path), replacer.sub(entry.name))
+    key: str = _filetype(entry)
+    TELEMETRY.add("renames")
+    if dry_run:
+        log(f"[DRY RUN] Would rename{key}: {full_path} -> {new_path}")
+    elif journal is None:
+        THROTTLE()
+        os.rename(full_path, new_path)
+        log(f"Renamed{key}: {full_path} -> {new_path}")
+    else:
+        op: int = journal.begin_rename(
+            os.path.abspath(full_path),
+            os.path.abspath(new_path),
+            entry.is_dir(follow_symlinks=False),
+        )
+        THROTTLE()
+        os.rename(full_path, new_path)
+        journal.done(op)
+        log(f"Renamed{key}: {full_path} -> {new_path}")
+
+    return 1
+
+
 def rename_directories_and_files(
     path: str,
     old_name: str,
@@ -159,31 +2602,213 @@ def rename_directories_and_files(
     dry_run: bool,
     git_root: str,
     timeout: int = 1,
+    ignored: Optional[Callable[[str], bool]] = None,
+    replacer: Optional[Replacer] = None,
 ) -> int:
     """Rename both directories and filenames alike if old keyword present."""
+    if ignored is None:
+        ignored = functools.partial(bypass, git_root=git_root, timeout=timeout)
+
+    # NOTE: Depth First Search. All children are handled before renaming a directory.
     count: int = 0
-    for entry in safe_scandir(path):
-        full_path = os.path.join(path, entry.name)
-        if bypass(full_path, git_root, timeout):
-            continue
+    for full_path, entry in walk(path, ignored):
+        count += rename_entry(
+            full_path, entry, old_name, new_name, dry_run, replacer=replacer
+        )
+
+    return count
+
+
+def _process_entry(
+    full_path: str,
+    entry: os.DirEntry,
+    replacer: Replacer,
+    dry_run: bool,
+    classifier: Optional[Classifier] = None,
+    journal: Optional[Journal] = None,
+    log: Callable[[str], None] = print,
+    manifest: Optional[Manifest] = None,
+    matches: Optional[MatchIndex] = None,
+) -> int:
+    """Update contents (of a file), then rename an entry."""
+    count: int = 0
+    TELEMETRY.add("entries")
+    if matches is not None and not entry.is_dir(follow_symlinks=False):
+        matches.move(full_path)
+    if entry.is_file(follow_symlinks=False):
+        start: float = time.perf_counter()
+        count += replace_in_file(
+            full_path,
+            "",
+            "",
+            dry_run,
+            log,
+            classifier,
+            replacer,
+            journal,
+            manifest,
+            matches,
+        )
+        TELEMETRY.file(full_path, time.perf_counter() - start)
+    count += rename_entry(full_path, entry, "", "", dry_run, log, replacer, journal)
+
+    return count
+
 
-        # NOTE: Depth First Search. Handle all children before renaming a directory.
-        if entry.is_dir(follow_symlinks=False):
-            count += rename_directories_and_files(
-                full_path, old_name, new_name, dry_run, git_root
+def _final_path(full_path: str, entry: os.DirEntry, replacer: Replacer) -> str:
+    """Absolute path of an entry once renamed."""
+    return os.path.abspath(
+        os.path.join(os.path.dirname(full_path), replacer.sub(entry.name))
+    )
+
+
+def _completed(completed: set[str], ignored: Callable[[str], bool], path: str) -> bool:
+    """Bypass paths which were completed (or are otherwise ignored)."""
+    return os.path.abspath(path) in completed or ignored(path)
+
+
+def _buffered(
+    full_path: str,
+    entry: os.DirEntry,
+    replacer: Replacer,
+    dry_run: bool,
+    classifier: Optional[Classifier] = None,
+    journal: Optional[Journal] = None,
+    manifest: Optional[Manifest] = None,
+    matches: Optional[MatchIndex] = None,
+) -> tuple[int, list[str]]:
+    """Process an entry, buffering (rather than printing) log messages."""
+    messages: list[str] = []
+    count: int = _process_entry(
+        full_path,
+        entry,
+        replacer,
+        dry_run,
+        classifier,
+        journal,
+        messages.append,
+        manifest,
+        matches,
+    )
+
+    return count, messages
+
+
+def _rename_concurrently(
+    entries: Iterator[tuple[str, os.DirEntry]],
+    replacer: Replacer,
+    dry_run: bool,
+    jobs: int,
+    classifier: Optional[Classifier] = None,
+    journal: Optional[Journal] = None,
+    manifest: Optional[Manifest] = None,
+    log: Callable[[str], None] = print,
+    matches: Optional[MatchIndex] = None,
+) -> int:
+    """Process walked entries with a pool of worker threads.
+
+    The walk is the producer, submitting each entry to the pool. At most
+    ``4 * jobs`` entries are in flight at once (a bounded queue). Results are
+    aggregated in submission order, so counts and log output match a sequential
+    run. A directory is only renamed after every entry before it (including all
+    of its children) has completed.
+
+    """
+    count: int = 0
+    pending: deque[tuple[Future, Optional[str]]] = deque()
+
+    def collect() -> None:
+        nonlocal count
+        future, directory = pending.popleft()
+        n, messages = future.result()
+        count += n
+        for message in messages:
+            log(message)
+        if journal is not None and directory is not None:
+            journal.complete(directory)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for full_path, entry in entries:
+            directory: Optional[str] = None
+            if entry.is_dir(follow_symlinks=False):
+                if replacer.search(entry.name):
+                    while pending:
+                        collect()
+                directory = _final_path(full_path, entry, replacer)
+            future: Future = pool.submit(
+                _buffered,
+                full_path,
+                entry,
+                replacer,
+                dry_run,
+                classifier,
+                journal,
+                manifest,
+                matches,
             )
+            pending.append((future, directory))
+            while len(pending) > 4 * jobs or (pending and pending[0][0].done()):
+                collect()
 
-        if old_name not in entry.name:
-            continue
+        while pending:
+            collect()
 
-        new_path = os.path.join(path, entry.name.replace(old_name, new_name))
-        key: str = _filetype(entry)
-        if dry_run:
-            print(f"[DRY RUN] Would rename{key}: {full_path} -> {new_path}")
-        else:
-            os.rename(full_path, new_path)
-            print(f"Renamed{key}: {full_path} -> {new_path}")
-        count += 1
+    return count
+
+
+def rename_project(
+    path: str,
+    old_name: str,
+    new_name: str,
+    dry_run: bool,
+    git_root: str,
+    timeout: int = 1,
+    ignored: Optional[Callable[[str], bool]] = None,
+    jobs: int = 1,
+    classifier: Optional[Classifier] = None,
+    replacer: Optional[Replacer] = None,
+    journal: Optional[Journal] = None,
+    manifest: Optional[Manifest] = None,
+    log: Callable[[str], None] = print,
+    matches: Optional[MatchIndex] = None,
+) -> int:
+    """Update file contents, then rename paths, within a single pass of the tree."""
+    if ignored is None:
+        ignored = functools.partial(bypass, git_root=git_root, timeout=timeout)
+    replacer = replacer or _single(old_name, new_name)
+
+    # NOTE: Prune subtrees which a resumed journal has already completed.
+    if journal is not None and journal.completed:
+        ignored = functools.partial(_completed, journal.completed, ignored)
+
+    if jobs > 1:
+        return _rename_concurrently(
+            walk(path, ignored),
+            replacer,
+            dry_run,
+            jobs,
+            classifier,
+            journal,
+            manifest,
+            log,
+            matches,
+        )
+
+    count: int = 0
+    for full_path, entry in walk(path, ignored):
+        count += _process_entry(
+            full_path,
+            entry,
+            replacer,
+            dry_run,
+            classifier,
+            journal,
+            log,
+            manifest,
+            matches,
+        )
+        if journal is not None and entry.is_dir(follow_symlinks=False):
+            journal.complete(_final_path(full_path, entry, replacer))
 
     return count
 
@@ -216,14 +2841,456 @@ def parse_args() -> argparse.Namespace:
         help="Time in seconds to allow a subprocess to run.",
         type=int,
     )
+    parser.add_argument(
+        "--ignore-backend",
+        choices=["ls-files", "check-ignore", "native"],
+        default="ls-files",
+        help=(
+            "How ignored paths are identified: enumerate candidates once with "
+            "`git ls-files` (default), spawn `git check-ignore` per path, or "
+            "evaluate .gitignore rules natively (git not required)."
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        default=1,
+        help="Number of worker threads used to update files concurrently.",
+        type=int,
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        help="Only update contents of files matching this glob (repeatable).",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Do not update contents of files matching this glob (repeatable).",
+    )
+    parser.add_argument(
+        "--max-size",
+        default=None,
+        help="Skip updating contents of files larger than this size (e.g. 10M).",
+        type=parse_size,
+    )
+    parser.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        help="Additional old=new mapping to replace in the same pass (repeatable).",
+        type=parse_mapping,
+    )
+    parser.add_argument(
+        "--map-file",
+        help="File of additional old=new mappings, one per line.",
+    )
+    parser.add_argument(
+        "--journal",
+        help="Directory of the rename journal (default: .git/rename-journal).",
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="Do not journal operations (a rename can then not be resumed).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume an interrupted rename, skipping completed work.",
+    )
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help="Revert the last (completed or interrupted) rename, then exit.",
+    )
+    parser.add_argument(
+        "--manifest",
+        help="Path of the content manifest (default: .git/rename-manifest.json).",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="Neither consult nor update the content manifest.",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Maintain a trigram index of the tree, and only read files which "
+        "(according to the index) may contain an old name.",
+    )
+    parser.add_argument(
+        "--index-dir",
+        help="Directory of the trigram index (default: .git/rename-index).",
+    )
+    parser.add_argument(
+        "--where",
+        action="append",
+        default=[],
+        help="Report every line using this name (repeatable) with the index, then "
+        "exit.",
+    )
+    parser.add_argument(
+        "--quiet",
+        "-q",
+        action="store_true",
+        help="Do not log each file updated or renamed.",
+    )
+    parser.add_argument(
+        "--report",
+        choices=["text", "json"],
+        default="text",
+        help="Format of the final report: a one line summary (default), or json "
+        "(written to stdout, with every other message written to stderr).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run (cProfile), and report peak memory (tracemalloc).",
+    )
+    parser.add_argument(
+        "--profile-output",
+        help="Write profiling statistics (pstats) to this file.",
+    )
+    parser.add_argument(
+        "--profile-limit",
+        default=15,
+        help="Number of functions listed by --profile (sorted by cumulative time).",
+        type=int,
+    )
+    parser.add_argument(
+        "--case-variants",
+        action="store_true",
+        help="Also replace case variants of each mapping (e.g. pytemplate, "
+        "PYTEMPLATE, py_template, PY_TEMPLATE, py-template).",
+    )
+    parser.add_argument(
+        "--plan",
+        help="Write a plan of every content edit and rename to this file (json), "
+        "listing each as a dry run would, without modifying anything.",
+    )
+    parser.add_argument(
+        "--apply",
+        help="Apply a plan written by --plan, without scanning the tree again.",
+    )
+    parser.add_argument(
+        "--matches",
+        help="Report every match (line and column) to this file (- for stdout), "
+        "as a dry run.",
+    )
+    parser.add_argument(
+        "--matches-format",
+        choices=["jsonl", "diff"],
+        default="jsonl",
+        help="Format of --matches: a json object per line (default), or a unified "
+        "diff.",
+    )
+    parser.add_argument(
+        "--io-limit",
+        help="Limit I/O to bytes[,ops] per second (e.g. 20M, 20M,500 or ,500), "
+        "shared by every worker thread.",
+        type=parse_io_limit,
+    )
+    parser.add_argument(
+        "--low-priority",
+        action="store_true",
+        help="Lower the CPU (nice) and I/O (ionice) priority of this process.",
+    )
+    parser.add_argument(
+        "--archive",
+        help="Rename a template archive (tar or zip, or a tar from stdin with -) "
+        "rather than a tree, writing the result to --output in a single pass.",
+    )
+    parser.add_argument(
+        "--output",
+        help="Archive written by --archive (- writes it to stdout, uncompressed); a "
+        "tar archive is compressed as its name implies (e.g. .tar.gz).",
+    )
+    parser.add_argument(
+        "--deferred",
+        help="Write a summary (json) of renames deferred for paths outside of the "
+        "sparse checkout (or marked skip-worktree) to this file.",
+    )
+    parser.add_argument(
+        "--fleet",
+        help="File of repositories to rename in parallel (in separate processes), "
+        "one `path [old=new]` per line. Every other option applies to each.",
+    )
+    parser.add_argument(
+        "--fleet-jobs",
+        default=None,
+        help="Number of repositories renamed concurrently (default: cpu count).",
+        type=int,
+    )
 
     return parser.parse_args()
 
 
-def main() -> None:
-    """Main script Entry point."""
-    args: argparse.Namespace = parse_args()
-    git_root: str = find_git_root(args.path)
+class BufferedLog:
+    """Log per-file messages in batches, rather than writing each one at once.
+
+    Writing (and flushing) a line at a time to a terminal can dominate the run
+    time of large trees, so lines are written ``batch`` at a time to ``stream``
+    (stdout, as of the time of writing), or discarded entirely when quiet.
+
+    """
+
+    def __init__(
+        self, stream: Optional[TextIO] = None, batch: int = 1024, quiet: bool = False
+    ) -> None:
+        self.stream: Optional[TextIO] = stream
+        self.batch: int = batch
+        self.quiet: bool = quiet
+        self._lines: list[str] = []
+
+    def __call__(self, message: str) -> None:
+        if self.quiet:
+            return
+        self._lines.append(message)
+        if len(self._lines) >= self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every pending line."""
+        if self._lines:
+            stream: TextIO = self.stream or sys.stdout
+            stream.write("\n".join(self._lines) + "\n")
+            stream.flush()
+            self._lines.clear()
+
+
+def _engine() -> Any:
+    """Import the plan / apply rename engine, from the (adjacent) source tree."""
+    # NOTE: This script is run standalone, before the package is (re)named or
+    #       installed, so the engine is imported from source on demand.
+    source: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+    if source not in sys.path:
+        sys.path.insert(0, source)
+
+    return importlib.import_module("PyTemplate.engine")
+
+
+def read_fleet(path: str) -> list[tuple[str, Optional[str], Optional[str]]]:
+    """Read repositories of a fleet from a file, one `path [old=new]` per line.
+
+    Relative paths are relative to the fleet file. Without a mapping, the old and
+    new names of a repository are those given by --old-name and --new-name (or the
+    name of its git root, by default).
+
+    """
+    directory: str = os.path.dirname(os.path.abspath(path))
+    repositories: list[tuple[str, Optional[str], Optional[str]]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for raw in f:
+            line: str = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            repository, _, mapping = line.rpartition(" ")
+            if "=" not in mapping or not repository.strip():
+                repositories.append((os.path.join(directory, line), None, None))
+                continue
+            old, new = parse_mapping(mapping)
+            repositories.append(
+                (os.path.join(directory, repository.strip()), old, new or None)
+            )
+
+    return repositories
+
+
+def _fleet_task(
+    args: argparse.Namespace, path: str, old: Optional[str], new: Optional[str]
+) -> dict[str, Any]:
+    """Rename a single repository of a fleet (within a worker process)."""
+    # NOTE: Each repository runs in isolation: with its own arguments, telemetry,
+    #       and git root, and with its output captured (rather than interleaved).
+    args = copy.deepcopy(args)
+    args.path, args.fleet = path, None
+    args.old_name = old or args.old_name
+    args.new_name = new or args.new_name
+    TELEMETRY.reset()
+    # NOTE: I/O limits apply to each repository (process) of a fleet.
+    if args.io_limit is not None:
+        THROTTLE.configure(*args.io_limit)
+    output = io.StringIO()
+    result: dict[str, Any] = {"path": path, "old": args.old_name, "status": "ok"}
+    start: float = time.perf_counter()
+    try:
+        if not os.path.isdir(path):
+            raise NotADirectoryError(f"Repository not found: {path}")
+        with contextlib.redirect_stdout(output):
+            log = BufferedLog(output, quiet=args.quiet)
+            result.update(run(args, log))
+            log.flush()
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["new"] = args.new_name
+    result["seconds"] = time.perf_counter() - start
+    result["counters"] = dict(TELEMETRY.counters)
+    result["output"] = output.getvalue()
+
+    return result
+
+
+def fleet(args: argparse.Namespace) -> dict[str, Any]:
+    """Rename every repository of a fleet, in parallel, reporting on each.
+
+    Repositories are renamed in a pool of (at most ``--fleet-jobs``) processes. A
+    repository which fails is reported, without interrupting the rest.
+
+    """
+    repositories = read_fleet(args.fleet)
+    results: list[dict[str, Any]] = []
+    with ProcessPoolExecutor(args.fleet_jobs) as executor:
+        futures: dict[Future, str] = {
+            executor.submit(_fleet_task, args, *j): j[0] for j in repositories
+        }
+        for future in as_completed(futures):
+            try:
+                result: dict[str, Any] = future.result()
+            except Exception as e:
+                result = {"path": futures[future], "status": "failed", "seconds": 0.0}
+                result.update(error=f"{type(e).__name__}: {e}", counters={})
+            results.append(result)
+            if result["status"] == "ok":
+                print(f"[ok] {result['path']} ({result['seconds']:.2f}s)")
+            else:
+                print(f"[failed] {result['path']}: {result['error']}")
+
+    results.sort(key=lambda j: j["path"])
+    failed: int = sum(j["status"] != "ok" for j in results)
+    touched: int = sum(
+        j["counters"].get("files_written", 0) + j["counters"].get("renames", 0)
+        for j in results
+    )
+    print(
+        f"Fleet complete. {len(results) - failed} succeeded, {failed} failed. "
+        f"Touched {touched} file(s) and path(s)."
+    )
+
+    return {
+        "total": len(results),
+        "failed": failed,
+        "touched": touched,
+        "repositories": results,
+    }
+
+
+def _mapping(args: argparse.Namespace) -> dict[str, str]:
+    """Collect every old=new mapping configured by parsed arguments."""
+    mapping: dict[str, str] = {args.old_name: args.new_name}
+    mapping.update(args.map)
+    if args.map_file is not None:
+        mapping.update(read_mapping(args.map_file))
+    if args.case_variants:
+        for old, new in list(mapping.items()):
+            mapping.update(
+                {k: v for k, v in case_variants(old, new).items() if k not in mapping}
+            )
+
+    return mapping
+
+
+def _run_archive(args: argparse.Namespace, log: BufferedLog) -> dict:
+    """Rename a template archive, as configured by parsed arguments."""
+    # NOTE: An archive is renamed on its own, without reference to any repository.
+    if args.new_name is None:
+        raise SystemExit("--archive requires --new-name.")
+    if args.output is None and not args.dry_run:
+        raise SystemExit("--archive requires --output (unless a --dry-run).")
+
+    replacer = Replacer(_mapping(args))
+    for old, new in replacer.mapping.items():
+        print(f"Replacing '{old}' --> '{new}'")
+    # NOTE: Members are classified by their path relative to the archive root.
+    classifier = Classifier("", args.include, args.exclude, args.max_size)
+    with TELEMETRY.phase("rename"):
+        total: int = rename_archive(
+            args.archive,
+            None if args.dry_run else args.output,
+            replacer,
+            classifier,
+            log,
+        )
+        log.flush()
+
+    print(classifier.summary())
+    if args.dry_run:
+        print(f"\n[DRY RUN] Complete. Would modify {total} archive member(s).")
+    else:
+        print(f"Success. Modified {total} archive member(s) in total.")
+
+    return {"total": total, "skipped": dict(classifier.skipped)}
+
+
+def _describe(report: dict[str, Any]) -> str:
+    """Summarize throughput of a run (from its report) in a single line."""
+    counters: dict[str, int] = report["counters"]
+    seconds: float = report["phases"].get("rename", {}).get("wall", 0.0)
+
+    summary: str = (
+        f"Scanned {counters.get('files_scanned', 0)} file(s) "
+        f"({counters.get('bytes_read', 0) / 1e6:.1f} MB) in {seconds:.2f}s: "
+        f"{report['files_per_second']:.0f} files/s, "
+        f"{report['mb_per_second']:.1f} MB/s."
+    )
+    if report.get("throttled_seconds"):
+        summary += f" Throttled for {report['throttled_seconds']:.2f}s."
+
+    return summary
+
+
+def run(args: argparse.Namespace, log: Optional[BufferedLog] = None) -> dict:
+    """Run a rename as configured by parsed arguments, returning a summary of it."""
+    log = log or BufferedLog()
+    if args.fleet:
+        with TELEMETRY.phase("fleet"):
+            return fleet(args)
+    if args.rollback:
+        directory: str = args.journal or Journal.default_directory(args.path)
+        total: int = Journal(directory).rollback(log)
+        print(f"Rollback complete. Reverted {total} operation(s).")
+        return {"total": total}
+    if args.archive:
+        return _run_archive(args, log)
+    if args.apply:
+        engine = _engine()
+        with TELEMETRY.phase("rename"):
+            total = engine.apply(engine.Plan.load(args.apply), log=log)
+            log.flush()
+        print(f"Success. Applied {total} planned operation(s).")
+        return {"total": total}
+
+    git_root: str
+    with TELEMETRY.phase("setup"):
+        if args.ignore_backend == "native":
+            git_root = find_repo_root(args.path) or os.path.realpath(args.path)
+        else:
+            git_root = find_git_root(args.path, args.timeout)
+
+        ignored: Callable[[str], bool] = ignore_filter(
+            args.path, git_root, args.ignore_backend, args.timeout
+        )
+        # NOTE: Paths outside of a sparse checkout are bypassed before any other
+        #       check, so they are never opened (nor passed to git check-ignore).
+        sparse = SkipWorktree(args.path, git_root)
+        if len(sparse):
+            ignored = functools.partial(_either, sparse, ignored)
+
+    index: Optional[TrigramIndex] = None
+    if args.index or args.where:
+        with TELEMETRY.phase("index"):
+            index = TrigramIndex(
+                args.index_dir or TrigramIndex.default_directory(args.path), args.path
+            )
+            print(f"Indexed {index.update(ignored)} new or changed file(s).")
+    if index is not None and args.where:
+        with TELEMETRY.phase("where"):
+            total = where(index, args.where)
+            index.close()
+        print(f"Found {total} line(s).")
+        return {"total": total}
 
     # NOTE: When this template is forked, the project should be renamed. So we can
     #       reasonably assume the name of the new project. Report assumption to client.
@@ -231,44 +3298,163 @@ def main() -> None:
         args.new_name = os.path.basename(git_root)
         print(f"Assuming new project name: {args.new_name}")
 
-    if args.new_name == args.old_name:
+    replacer = Replacer(_mapping(args))
+    if not replacer:
         print("Exiting. Both New and old names are identical.")
-        return
+        return {"total": 0}
 
-    print(
-        f"Project Found at: '{args.path}'",
-        f"Replacing '{args.old_name}' --> '{args.new_name}'",
-        sep="\n",
-    )
-    if args.dry_run:
+    print(f"Project Found at: '{args.path}'")
+    for old, new in replacer.mapping.items():
+        print(f"Replacing '{old}' --> '{new}'")
+    # NOTE: Matches are reported against the tree as is, so only by a dry run.
+    args.dry_run = args.dry_run or bool(args.matches)
+    if args.dry_run or args.plan:
         print("[DRY RUN] Confirming Dry Run Mode. No changes will be made.")
 
+    classifier = Classifier(args.path, args.include, args.exclude, args.max_size)
+    if index is not None:
+        classifier.candidates = index.candidates(replacer.mapping)
+        index.close()
+    if args.plan:
+        engine = _engine()
+        with TELEMETRY.phase("rename"):
+            plan = engine.plan(args.path, replacer.mapping, ignored, classifier, log)
+            for line in plan.describe():
+                log(line)
+            log.flush()
+        plan.dump(args.plan)
+        print(f"\n[DRY RUN] Planned {len(plan)} operation(s), written to {args.plan}")
+        print(classifier.summary())
+        return {"total": len(plan)}
+    journal: Optional[Journal] = None
+    if not (args.dry_run or args.no_journal):
+        journal = Journal(args.journal or Journal.default_directory(args.path))
+        journal.start(replacer.mapping, resume=args.resume)
+    manifest: Optional[Manifest] = None
+    if not args.no_manifest:
+        manifest = Manifest(
+            args.manifest or Manifest.default_path(args.path),
+            args.path,
+            replacer,
+            renames=not args.dry_run,
+        )
+    matches: Optional[MatchIndex] = None
+    if args.matches:
+        matches = MatchIndex(args.path, replacer)
+
     # NOTE: this script may also be updated to reflect the new project name.
-    total: int = 0
-    print("\nStep I: Update File contents.")
-    total += update_project_name(
-        args.path,
-        args.old_name,
-        args.new_name,
-        dry_run=args.dry_run,
-        git_root=git_root,
-        timeout=args.timeout,
-    )
-    print("\nStep II: Update Filepath Names.")
-    total += rename_directories_and_files(
-        args.path,
-        args.old_name,
-        args.new_name,
-        dry_run=args.dry_run,
-        git_root=git_root,
-        timeout=args.timeout,
-    )
+    # NOTE: File contents are updated before (post-order) renames, in a single pass.
+    print("\nUpdating file contents and filepath names.")
+    with TELEMETRY.phase("rename"):
+        total = rename_project(
+            args.path,
+            args.old_name,
+            args.new_name,
+            dry_run=args.dry_run,
+            git_root=git_root,
+            timeout=args.timeout,
+            ignored=ignored,
+            jobs=args.jobs,
+            classifier=classifier,
+            replacer=replacer,
+            journal=journal,
+            manifest=manifest,
+            log=log,
+            matches=matches,
+        )
+        log.flush()
+    with TELEMETRY.phase("finish"):
+        if manifest is not None:
+            manifest.save()
+        if journal is not None:
+            journal.finish()
+        if matches is not None:
+            with contextlib.ExitStack() as stack:
+                stream: BinaryIO = args.matches
+                if isinstance(args.matches, str):
+                    stream = stack.enter_context(open(args.matches, "wb"))
+                if args.matches_format == "diff":
+                    matches.diff(stream)
+                else:
+                    matches.jsonl(stream)
+                stream.flush()
 
+    print(classifier.summary())
+    if manifest is not None:
+        print(f"Skipped {manifest.hits} unchanged file(s) known to be clean.")
+    deferred: list[tuple[str, str]] = sparse.deferred(replacer)
+    if len(sparse):
+        print(
+            f"Bypassed {len(sparse)} path(s) outside of the sparse checkout, "
+            f"deferring {len(deferred)} rename(s)."
+        )
+    if args.deferred:
+        with open(args.deferred, "w", encoding="utf-8") as f:
+            json.dump({"skip_worktree": len(sparse), "renames": deferred}, f, indent=2)
+    if matches is not None:
+        print(f"Reported {len(matches)} match(es) within {len(matches.paths)} file(s).")
     if args.dry_run:
         print(f"\n[DRY RUN] Complete. Would modify {total} file(s).")
     else:
         print(f"Success. Modified {total} file(s) in total.")
 
+    return {
+        "total": total,
+        "skipped": dict(classifier.skipped),
+        "deferred": len(deferred),
+    }
+
+
+def main() -> None:
+    """Main script Entry point."""
+    args: argparse.Namespace = parse_args()
+    stdout: TextIO = sys.stdout
+    log = BufferedLog(quiet=args.quiet)
+    TELEMETRY.reset()
+    if args.io_limit is not None:
+        THROTTLE.configure(*args.io_limit)
+    if args.low_priority:
+        lower_priority()
+
+    profiler: Optional[cProfile.Profile] = None
+    if args.profile:
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    # NOTE: Only the report (or an archive, or matches) is written to stdout.
+    report_stream: TextIO = stdout
+    if args.output == "-":
+        args.output, report_stream = stdout.buffer, sys.stderr
+    if args.matches == "-":
+        args.matches, report_stream = stdout.buffer, sys.stderr
+    redirect: bool = args.report == "json" or report_stream is not stdout
+    with contextlib.redirect_stdout(sys.stderr if redirect else stdout):
+        try:
+            summary: dict = run(args, log)
+        finally:
+            log.flush()
+
+        report: dict[str, Any] = {"dry_run": args.dry_run, "jobs": args.jobs}
+        report.update(summary)
+        report.update(TELEMETRY.report())
+        if profiler is not None:
+            profiler.disable()
+            report["tracemalloc_peak"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            if args.profile_output:
+                profiler.dump_stats(args.profile_output)
+            stats = pstats.Stats(profiler, stream=sys.stderr)
+            stats.sort_stats("cumulative").print_stats(args.profile_limit)
+
+        if args.report == "json":
+            report_stream.write(json.dumps(report, indent=2) + "\n")
+        else:
+            print(_describe(report))
+
+    if summary.get("failed"):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,364 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Primitives shared by the rename script (rename.py) and the rename engine.
+
+Both walk a tree in the same order, bypass the same paths, classify file contents
+alike, and replace files the same way, so a plan made by the engine covers exactly
+what the script would change.
+
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fnmatch
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import stat
+import subprocess
+import threading
+from collections import Counter
+from typing import (
+    Any,
+    Callable,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+
+# NOTE: Version control and tool directories are never walked.
+PRUNED_DIRECTORIES: FrozenSet[str] = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".tox",
+        ".nox",
+        ".venv",
+        "__pycache__",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".rename-journal",
+    }
+)
+
+SNIFF_SIZE: int = 8192
+
+MAGIC_NUMBERS: Tuple[bytes, ...] = (
+    b"\x89PNG",
+    b"\xff\xd8\xff",  # jpeg
+    b"GIF87a",
+    b"GIF89a",
+    b"%PDF-",
+    b"PK\x03\x04",  # zip (wheel, jar, docx, ...)
+    b"\x1f\x8b",  # gzip
+    b"\xfd7zXZ\x00",  # xz
+    b"7z\xbc\xaf",
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"\x7fELF",
+    b"\xcf\xfa\xed\xfe",  # mach-o
+    b"\x00asm",  # wasm
+)
+
+LFS_POINTER: bytes = b"version https://git-lfs.github.com/spec/v1"
+# NOTE: Hardlinked files are copied back over their original in chunks of this size.
+COPY_CHUNK: int = 1024 * 1024
+
+
+def never(path: str) -> bool:
+    """Bypass no path."""
+    return False
+
+
+def list_candidates(root: str, timeout: Optional[float] = None) -> set[str]:
+    """Enumerate all tracked and untracked (but not ignored) paths beneath root.
+
+    A single ``git ls-files`` call replaces one ``git check-ignore`` call per entry.
+    Paths are joined onto ``root`` as given, so they compare equal to those built
+    while walking the tree with ``os.path.join``. Parent directories are included.
+
+    """
+    result = subprocess.run(
+        ["git", "-C", root, "ls-files", "-c", "-o", "--exclude-standard", "-z"],
+        check=True,
+        capture_output=True,
+        timeout=timeout,
+    )
+
+    candidates: set[str] = set()
+    for raw in result.stdout.split(b"\0"):
+        if not raw:
+            continue
+        parts: list[str] = os.fsdecode(raw).split("/")
+        # NOTE: Stop ascending once a parent is known, since its ancestors are too.
+        for depth in range(len(parts), 0, -1):
+            full_path = os.path.join(root, *parts[:depth])
+            if full_path in candidates:
+                break
+            candidates.add(full_path)
+
+    return candidates
+
+
+def listing(path: str) -> list[os.DirEntry]:
+    """List a directory, sorted by name (empty, if it cannot be listed)."""
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entries, key=lambda e: e.name)
+    except (PermissionError, FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def walk(
+    path: str,
+    ignored: Callable[[str], bool] = never,
+    scandir: Callable[[str], Iterable[os.DirEntry]] = listing,
+) -> Iterator[tuple[str, os.DirEntry]]:
+    """Iteratively walk a tree, yielding each (path, entry) once in post-order.
+
+    Children are always yielded before their parent directory, so a directory may
+    be renamed as soon as it is yielded. An explicit stack replaces recursion, and
+    memory is bounded by tree depth (one directory listing per level). Version
+    control and tool directories (``PRUNED_DIRECTORIES``) are never entered.
+
+    Args:
+        path (str): Root directory of the tree.
+        ignored (Callable[[str], bool]): Identify paths to bypass (and never enter).
+        scandir (Callable[[str], Iterable[os.DirEntry]]): List a directory, sorted by
+            name (e.g. ``listing``).
+
+    """
+    # NOTE: Listings are read eagerly, since renaming entries while a directory is
+    #       still being read may yield them twice (or not at all).
+    stack: list[tuple[str, Optional[os.DirEntry], Iterator[os.DirEntry]]] = [
+        (path, None, iter(scandir(path)))
+    ]
+    while stack:
+        directory, parent, entries = stack[-1]
+        for entry in entries:
+            full_path: str = os.path.join(directory, entry.name)
+            if entry.name in PRUNED_DIRECTORIES and entry.is_dir(follow_symlinks=False):
+                continue
+
+            if ignored(full_path):
+                continue
+
+            if entry.is_dir(follow_symlinks=False):
+                stack.append((full_path, entry, iter(scandir(full_path))))
+                break
+
+            yield full_path, entry
+
+        else:
+            stack.pop()
+            if parent is not None:
+                yield directory, parent
+
+
+def _compile_globs(patterns: Sequence[str]) -> Optional[re.Pattern]:
+    """Combine glob patterns into a single regular expression, compiled once."""
+    if not patterns:
+        return None
+
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+class Classifier:
+    """Decide, before any full read, whether the contents of a file are scanned.
+
+    Checks are ordered from cheapest to most expensive: include / exclude globs
+    (path only), then size and hardlinks (from ``fstat``), and finally the first
+    few KB of content, sniffed for NUL bytes, magic numbers, or git LFS pointers.
+    Globs without a slash are matched against the file name, otherwise against the
+    path relative to root. Reasons for each skipped file are tallied.
+
+    When ``candidates`` is set (e.g. from a ``TrigramIndex``), only files within
+    it (by path relative to root) are scanned at all.
+
+    """
+
+    def __init__(
+        self,
+        root: str,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        max_size: Optional[int] = None,
+    ) -> None:
+        self.root: str = root
+        self.max_size: Optional[int] = max_size
+        self.skipped: Counter[str] = Counter()
+        self._prefix: str = os.path.join(root, "")
+        self._include_name = _compile_globs([p for p in include if "/" not in p])
+        self._include_path = _compile_globs([p for p in include if "/" in p])
+        self._exclude_name = _compile_globs([p for p in exclude if "/" not in p])
+        self._exclude_path = _compile_globs([p for p in exclude if "/" in p])
+        self._include: bool = bool(include)
+        self.candidates: Optional[set[str]] = None
+        self._inodes: set[tuple[int, int]] = set()
+        self._lock = threading.Lock()
+
+    def _skip(self, reason: str) -> bool:
+        with self._lock:
+            self.skipped[reason] += 1
+
+        return True
+
+    def skip_path(self, path: str) -> bool:
+        """Return True if path is filtered out by include / exclude globs."""
+        if path.startswith(self._prefix):
+            rel: str = path[len(self._prefix) :]
+        else:
+            rel = os.path.relpath(path, self.root)
+        rel = rel.replace(os.sep, "/")
+        name: str = rel.rpartition("/")[2]
+
+        if self._include and not (
+            (self._include_name and self._include_name.match(name))
+            or (self._include_path and self._include_path.match(rel))
+        ):
+            return self._skip("not-included")
+
+        if (self._exclude_name and self._exclude_name.match(name)) or (
+            self._exclude_path and self._exclude_path.match(rel)
+        ):
+            return self._skip("excluded")
+
+        if self.candidates is not None and rel not in self.candidates:
+            return self._skip("no-match")
+
+        return False
+
+    def skip_content(self, st: os.stat_result, head: bytes) -> bool:
+        """Return True if a file is too large, already seen, or not text."""
+        if self.max_size is not None and st.st_size > self.max_size:
+            return self._skip("max-size")
+
+        if st.st_nlink > 1:
+            key: tuple[int, int] = (st.st_dev, st.st_ino)
+            with self._lock:
+                seen: bool = key in self._inodes
+                self._inodes.add(key)
+            if seen:
+                return self._skip("hardlink")
+
+        if head.startswith(LFS_POINTER):
+            return self._skip("lfs-pointer")
+
+        if b"\x00" in head or head.startswith(MAGIC_NUMBERS):
+            return self._skip("binary")
+
+        return False
+
+    def summary(self) -> str:
+        """Summarize counts of skipped files by reason."""
+        total: int = sum(self.skipped.values())
+        reasons: str = ", ".join(f"{k}={v}" for k, v in sorted(self.skipped.items()))
+
+        return f"Skipped {total} file(s)" + (f": {reasons}" if reasons else "")
+
+
+def new_hasher() -> Any:
+    """Hash of file contents, as recorded (and compared) by fingerprints."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def hexdigest(data: Union[bytes, mmap.mmap]) -> str:
+    """Fingerprint file contents."""
+    hasher = new_hasher()
+    hasher.update(data)
+
+    return hasher.hexdigest()
+
+
+def temporary(path: str) -> str:
+    """Temporary (sibling) path a file is written to before replacing it."""
+    directory, name = os.path.split(path)
+
+    return os.path.join(directory, f".{name}.rename-tmp")
+
+
+def atomic_write(
+    path: str,
+    data: Union[bytes, Iterable[bytes]],
+    st: os.stat_result,
+    chunk_size: int = COPY_CHUNK,
+) -> int:
+    """Write data (or chunks of it) to a temporary file, then atomically replace path.
+
+    Files with several hardlinks are rewritten in place instead, since replacing
+    one link would silently detach it from the others. Chunks may be produced
+    from path itself, so they are only copied in place once fully written. Data
+    is not synced here.
+
+    Args:
+        path (str): File to replace.
+        data (Union[bytes, Iterable[bytes]]): Contents (or chunks of them) to write.
+        st (os.stat_result): Stat of the file replaced (its mode and links).
+        chunk_size (int): Size of chunks copied in place (over hardlinked files).
+
+    Returns:
+        (int): Number of bytes written.
+
+    """
+    written: int = 0
+    if st.st_nlink > 1 and isinstance(data, bytes):
+        with open(path, "r+b") as f:
+            written = f.write(data)
+            f.truncate()
+        return written
+
+    partial: str = temporary(path)
+    try:
+        with open(partial, "wb") as f:
+            for chunk in [data] if isinstance(data, bytes) else data:
+                written += f.write(chunk)
+        if st.st_nlink > 1:
+            with open(partial, "rb") as src, open(path, "r+b") as dst:
+                shutil.copyfileobj(src, dst, chunk_size)
+                dst.truncate()
+            os.remove(partial)
+            return written
+        os.chmod(partial, stat.S_IMODE(st.st_mode))
+        os.replace(partial, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(partial)
+        raise
+
+    return written
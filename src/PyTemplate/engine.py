@@ -0,0 +1,307 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Importable rename engine, split into separate plan and apply phases.
+
+``plan`` walks a tree once, recording the byte offset of every keyword found within
+file contents, and every path to rename (in post-order). A ``Plan`` is compact and
+serializable (json), so it may be reviewed (as a dry run) and later applied, in
+another process, by ``apply`` without scanning any file again.
+
+Example:
+    >>> from PyTemplate import engine
+    >>> plan = engine.plan(root, {"PyTemplate": "my_project"}, engine.git_ignored(root))
+    >>> plan.dump("rename-plan.json")
+    >>> engine.apply(engine.Plan.load("rename-plan.json"))
+
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Callable, Iterator, Mapping, NamedTuple, Optional
+
+from PyTemplate.common import (
+    SNIFF_SIZE,
+    Classifier,
+    atomic_write,
+    hexdigest,
+    list_candidates,
+    never,
+    walk,
+)
+
+
+PLAN_VERSION: int = 1
+
+
+class StalePlanError(RuntimeError):
+    """Raised when a tree no longer matches the plan made from it."""
+
+
+class FileEdits(NamedTuple):
+    """Planned edits of a single file, and its state when planned.
+
+    Edits are flattened pairs of (byte offset, keyword index), in ascending order.
+
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    digest: str
+    edits: tuple[int, ...]
+
+
+class Plan:
+    """Content edits and path renames planned for a tree.
+
+    Paths are relative to root (``/`` separated). Renames are listed in post-order,
+    by the path of each entry at the time it is renamed: children are renamed
+    before their parent directory.
+
+    """
+
+    def __init__(
+        self,
+        root: str,
+        mapping: Mapping[str, str],
+        files: list[FileEdits],
+        renames: list[tuple[str, str]],
+    ) -> None:
+        self.root: str = root
+        self.mapping: dict[str, str] = dict(mapping)
+        self.files: list[FileEdits] = files
+        self.renames: list[tuple[str, str]] = renames
+
+    @property
+    def keys(self) -> list[str]:
+        """Old keywords, indexed by edits (longest first)."""
+        return sorted(self.mapping, key=len, reverse=True)
+
+    def __len__(self) -> int:
+        return len(self.files) + len(self.renames)
+
+    def to_dict(self) -> dict:
+        """Represent the plan with json serializable types."""
+        return {
+            "version": PLAN_VERSION,
+            "root": self.root,
+            "mapping": self.mapping,
+            "files": [list(j) for j in self.files],
+            "renames": [list(j) for j in self.renames],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Plan:
+        """Restore a plan from its json serializable representation."""
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version: {data.get('version')}")
+
+        return cls(
+            data["root"],
+            data["mapping"],
+            [
+                FileEdits(path, size, mtime_ns, digest, tuple(edits))
+                for path, size, mtime_ns, digest, edits in data["files"]
+            ],
+            [(src, dst) for src, dst in data["renames"]],
+        )
+
+    def dump(self, path: str) -> None:
+        """Write the plan to a json file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> Plan:
+        """Read a plan from a json file."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def describe(self) -> Iterator[str]:
+        """Describe each planned operation, as a dry run would."""
+        for edit in self.files:
+            n: int = len(edit.edits) // 2
+            yield f"Would update content within file: {edit.path} ({n} edit(s))"
+        for src, dst in self.renames:
+            yield f"Would rename: {src} -> {dst}"
+
+
+def git_ignored(root: str, timeout: Optional[float] = None) -> Callable[[str], bool]:
+    """Identify paths ignored by git, from a single ``git ls-files`` call.
+
+    Paths are compared as joined onto root (as given), as they are while walking.
+
+    """
+    candidates: set[str] = list_candidates(root, timeout)
+
+    return lambda path: path not in candidates
+
+
+def plan(
+    root: str,
+    mapping: Mapping[str, str],
+    ignored: Optional[Callable[[str], bool]] = None,
+    classifier: Optional[Classifier] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> Plan:
+    """Walk a tree once, planning every content edit and path rename.
+
+    Args:
+        root (str): Root directory of the tree.
+        mapping (Mapping[str, str]): Old keywords, and their replacements.
+        ignored (Callable[[str], bool]): Identify paths to bypass (and never
+            enter), e.g. ``git_ignored(root)``.
+        classifier (Classifier): Decide which files to scan (by default, any file
+            which is not binary, a git LFS pointer, or a hardlink already seen).
+        log (Callable[[str], None]): Report files which cannot be read.
+
+    Returns:
+        (Plan): Serializable plan, for ``apply``.
+
+    Notes:
+        * Files skipped by the classifier (or which cannot be read) are only
+          renamed.
+
+    """
+    mapping = {k: v for k, v in mapping.items() if k != v}
+    classifier = classifier or Classifier(root)
+    report: Callable[[str], object] = log or never
+    result = Plan(os.path.abspath(root), mapping, [], [])
+    keys: list[str] = result.keys
+    index: dict[bytes, int] = {k.encode("utf-8"): i for i, k in enumerate(keys)}
+    names = re.compile("|".join(map(re.escape, keys)) or "(?!)")
+    contents = re.compile(b"|".join(map(re.escape, index)) or b"(?!)")
+    prefix: str = os.path.join(root, "")
+
+    for path, entry in walk(root, ignored or never):
+        rel: str = path[len(prefix) :].replace(os.sep, "/")
+        if entry.is_file(follow_symlinks=False) and not classifier.skip_path(path):
+            try:
+                with open(path, "rb") as f:
+                    st: os.stat_result = os.fstat(f.fileno())
+                    data: bytes = f.read()
+            except OSError as e:
+                report(f"[Warning] ({e.__class__.__name__}) {path}")
+                data = b""
+            edits: list[int] = []
+            if data and not classifier.skip_content(st, data[:SNIFF_SIZE]):
+                for match in contents.finditer(data):
+                    edits += (match.start(), index[match.group()])
+            if edits:
+                edit = FileEdits(rel, st.st_size, st.st_mtime_ns, hexdigest(data), ())
+                result.files.append(edit._replace(edits=tuple(edits)))
+
+        if names.search(entry.name):
+            new: str = names.sub(lambda m: mapping[m.group()], entry.name)
+            result.renames.append((rel, rel[: len(rel) - len(entry.name)] + new))
+
+    return result
+
+
+def _check(path: str, edit: FileEdits) -> None:
+    """Confirm a file is unchanged (by stat, or else content) since planned."""
+    try:
+        st: os.stat_result = os.stat(path)
+    except FileNotFoundError as e:
+        raise StalePlanError(f"Planned file no longer exists: {path}") from e
+    if (st.st_size, st.st_mtime_ns) == (edit.size, edit.mtime_ns):
+        return
+
+    with open(path, "rb") as f:
+        if hexdigest(f.read()) != edit.digest:
+            raise StalePlanError(f"File changed since it was planned: {path}")
+
+
+def _splice(data: bytes, edit: FileEdits, encoded: list[tuple[bytes, bytes]]) -> bytes:
+    """Apply the edits of a file to its content, by byte offset."""
+    pieces: list[bytes] = []
+    end: int = 0
+    for i in range(0, len(edit.edits), 2):
+        offset, key = edit.edits[i], edit.edits[i + 1]
+        old, new = encoded[key]
+        if data[offset : offset + len(old)] != old:
+            raise StalePlanError(f"File changed since it was planned: {edit.path}")
+        pieces += (data[end:offset], new)
+        end = offset + len(old)
+    pieces.append(data[end:])
+
+    return b"".join(pieces)
+
+
+def apply(
+    plan: Plan,
+    root: Optional[str] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> int:
+    """Execute a plan, without scanning any file for keywords again.
+
+    Every planned file is first confirmed unchanged (a stat, or a hash if its stat
+    differs), so a stale plan raises ``StalePlanError`` before anything changes.
+
+    Args:
+        plan (Plan): Plan to execute.
+        root (str): Root directory of the tree (defaults to that of the plan).
+        log (Callable[[str], None]): Report each operation as it is applied.
+
+    Returns:
+        (int): Number of files updated and paths renamed.
+
+    """
+    root = plan.root if root is None else root
+    report: Callable[[str], object] = log or never
+    encoded: list[tuple[bytes, bytes]] = [
+        (k.encode("utf-8"), plan.mapping[k].encode("utf-8")) for k in plan.keys
+    ]
+
+    for edit in plan.files:
+        _check(os.path.join(root, *edit.path.split("/")), edit)
+    for src, _ in plan.renames:
+        if not os.path.lexists(os.path.join(root, *src.split("/"))):
+            raise StalePlanError(f"Planned path no longer exists: {src}")
+
+    for edit in plan.files:
+        path: str = os.path.join(root, *edit.path.split("/"))
+        with open(path, "rb") as f:
+            st: os.stat_result = os.fstat(f.fileno())
+            data: bytes = f.read()
+        atomic_write(path, _splice(data, edit, encoded), st)
+        report(f"Updated content within file: {edit.path}")
+
+    for src, dst in plan.renames:
+        target: str = os.path.join(root, *dst.split("/"))
+        if os.path.lexists(target):
+            raise FileExistsError(f"Cannot rename {src}, {dst} already exists.")
+        os.rename(os.path.join(root, *src.split("/")), target)
+        report(f"Renamed: {src} -> {dst}")
+
+    return len(plan)
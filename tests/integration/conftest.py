@@ -26,3 +26,68 @@
 # CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Integration test fixtures."""
+
+import os
+import subprocess
+
+import pytest
+
+
+FILES: dict[str, str] = {
+    ".gitignore": "*.log\nbuild/\n",
+    "README.md": "# PyTemplate\n",
+    "src/PyTemplate/__init__.py": '"""PyTemplate Project."""\n',
+    "src/PyTemplate/core.py": "import os\n",
+    "build/PyTemplate.txt": "PyTemplate\n",
+    "debug.log": "PyTemplate\n",
+}
+
+
+@pytest.fixture
+def git_repo(tmp_path) -> str:
+    """Small git repository with tracked, untracked, and ignored files."""
+    root = str(tmp_path)
+    for name, content in FILES.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    subprocess.run(["git", "init", "-q", root], check=True)
+    subprocess.run(["git", "-C", root, "add", "src", ".gitignore"], check=True)
+
+    return root
+
+
+@pytest.fixture
+def sparse_repo(tmp_path, request) -> str:
+    """Committed git repository, with a sparse checkout of src (cone mode).
+
+    Object names are sha1, unless parametrized (indirectly) with another format.
+
+    """
+    root = str(tmp_path / "sparse")
+    files: dict[str, str] = {
+        "README.md": "# PyTemplate\n",
+        "src/PyTemplate/__init__.py": '"""PyTemplate Project."""\n',
+        "docs/PyTemplate.md": "PyTemplate\n",
+        "docs/api/PyTemplate.rst": "PyTemplate\n",
+    }
+    for name, content in files.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    git = ["git", "-C", root, "-c", "user.name=test", "-c", "user.email=t@test"]
+    object_format: str = getattr(request, "param", "sha1")
+    subprocess.run(
+        ["git", "init", "-q", f"--object-format={object_format}", root], check=True
+    )
+    subprocess.run([*git, "add", "."], check=True)
+    subprocess.run([*git, "commit", "-q", "-m", "initial"], check=True)
+    subprocess.run([*git, "sparse-checkout", "set", "--cone", "src"], check=True)
+
+    return root
@@ -0,0 +1,159 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Integration tests of the custom sphinx extensions (docs/source/_ext)."""
+
+import filecmp
+import io
+import os
+import sys
+
+import pytest
+
+
+sphinx_application = pytest.importorskip("sphinx.application")
+
+EXT: str = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "docs", "source", "_ext"
+)
+CONF: str = f"""
+import sys
+
+sys.path.append({os.path.abspath(EXT)!r})
+
+project = "Sample"
+extensions = ["lexers", "cache"]
+pygments_style = "styles.VSCodeDarkPlus"
+highlight_cache_dir = ""
+"""
+CODE: str = """
+.. code-block:: python
+
+    CONSTANT = {{"key": [call(x) for x in range({n})]}}
+
+.. code-block:: cython
+
+    cdef int value = array[({n} + 1)]
+
+.. code-block:: python
+
+    unbalanced = ((({n}
+"""
+
+
+@pytest.fixture
+def sample(tmp_path) -> str:
+    """Sphinx project of many documents, each with several code blocks."""
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "conf.py").write_text(CONF)
+    names: list[str] = [f"page_{n}" for n in range(16)]
+    toctree: str = "\n".join(f"    {name}" for name in names)
+    (source / "index.rst").write_text(f"Sample\n======\n\n.. toctree::\n\n{toctree}\n")
+    for n, name in enumerate(names):
+        (source / f"{name}.rst").write_text(
+            f"{name}\n{'=' * len(name)}\n{CODE}".format(n=n)
+        )
+
+    return str(source)
+
+
+def build(source: str, output: str, parallel: int) -> "sphinx_application.Sphinx":
+    """Build html documentation of source, with parallel processes."""
+    app = sphinx_application.Sphinx(
+        source,
+        source,
+        output,
+        os.path.join(output, ".doctrees"),
+        "html",
+        status=None,
+        warning=None,
+        freshenv=True,
+        parallel=parallel,
+    )
+    app.build()
+
+    return app
+
+
+def _compare(a: str, b: str) -> list[str]:
+    """Files of html outputs a and b which differ (or are missing)."""
+    comparison = filecmp.dircmp(a, b, ignore=[".doctrees", ".buildinfo"])
+    different: list[str] = [
+        *comparison.diff_files,
+        *comparison.left_only,
+        *comparison.right_only,
+    ]
+    for name, sub in comparison.subdirs.items():
+        different.extend(os.path.join(name, j) for j in _compare(sub.left, sub.right))
+
+    return different
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="parallel builds require fork")
+def test_parallel_build(sample, tmp_path) -> None:
+    """Test a parallel (-j 4) build uses every process, and matches a serial build."""
+    serial = build(sample, str(tmp_path / "serial"), 1)
+    parallel = build(sample, str(tmp_path / "parallel"), 4)
+
+    assert parallel.is_parallel_allowed("read")
+    assert parallel.is_parallel_allowed("write")
+    assert _compare(serial.outdir, parallel.outdir) == []
+    with open(os.path.join(parallel.outdir, "page_3.html"), encoding="utf-8") as f:
+        html: str = f.read()
+    assert '<span class="p p-Level0">{</span>' in html
+    assert parallel.highlight_cache.misses == serial.highlight_cache.misses == 48
+
+
+def test_cached_warnings(tmp_path) -> None:
+    """Test code blocks which warn are reported by every build (cache not used)."""
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "conf.py").write_text(CONF)
+    (source / "index.rst").write_text(
+        "Sample\n======\n\n.. code-block:: unknown\n\n    x = 1\n"
+    )
+
+    for n in range(2):
+        output: str = str(tmp_path / f"build_{n}")
+        warning = io.StringIO()
+        app = sphinx_application.Sphinx(
+            str(source),
+            str(source),
+            output,
+            os.path.join(output, ".doctrees"),
+            "html",
+            confoverrides={"highlight_cache_dir": str(tmp_path / "cache")},
+            status=None,
+            warning=warning,
+            freshenv=True,
+        )
+        app.build()
+        assert "'unknown' is not known" in warning.getvalue()
+        assert app.highlight_cache.hits == 0
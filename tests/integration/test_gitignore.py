@@ -0,0 +1,254 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Conformance of the native gitignore engine against `git check-ignore`."""
+
+import os
+import random
+import shutil
+import subprocess
+
+import pytest
+
+import rename
+
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+
+NAMES: tuple[str, ...] = (
+    "a",
+    "abc.txt",
+    "keep.log",
+    "x.log",
+    "build",
+    "dist",
+    "docs",
+    "tmp",
+    "cache",
+    "foo",
+    "bar.py",
+    "by.md",
+    "xy.md",
+    "main.pyc",
+    "#hash",
+    "!bang",
+    "important",
+    "nested",
+    "deep",
+    "sub",
+    "t.txt",
+    "name with space.txt",
+    "[x]",
+)
+
+PATTERNS: tuple[str, ...] = (
+    "*.log",
+    "!keep.log",
+    "build/",
+    "/dist",
+    "docs/**/tmp",
+    "**/cache",
+    "a?c.txt",
+    "[ab]*.py",
+    "[!x]y.md",
+    "nested/deep/",
+    "*.py[co]",
+    "foo/**",
+    "\\#hash",
+    "\\!bang",
+    "!important/",
+    "important",
+    "name with space.txt",
+    "t.txt   ",
+    "sub/*.txt",
+    "**/deep/**",
+    "/a/",
+    "\\[x\\]",
+    "# comment",
+    "",
+    "*",
+    "!*/",
+    "!*.txt",
+    "a/**/t.txt",
+    "[a-c]*",
+    "d*/",
+)
+
+
+@pytest.fixture(autouse=True)
+def isolate_config(tmp_path_factory, monkeypatch) -> str:
+    """Prevent user or system git configuration from affecting results."""
+    home = str(tmp_path_factory.mktemp("home"))
+    monkeypatch.setenv("HOME", home)
+    monkeypatch.setenv("XDG_CONFIG_HOME", os.path.join(home, ".config"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.delenv("GIT_CONFIG_GLOBAL", raising=False)
+
+    return home
+
+
+def write(path: str, content: str = "") -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def generate(root: str, seed: int) -> None:
+    """Generate a random tree with nested .gitignore files."""
+    rng = random.Random(seed)
+    subprocess.run(["git", "init", "-q", root], check=True)
+    stack: list[tuple[str, int]] = [(root, 0)]
+    while stack:
+        directory, depth = stack.pop()
+        os.makedirs(directory, exist_ok=True)
+        if depth == 0 or rng.random() < 0.5:
+            patterns = rng.sample(PATTERNS, rng.randint(1, 6))
+            write(os.path.join(directory, ".gitignore"), "\n".join(patterns) + "\n")
+
+        for name in rng.sample(NAMES, rng.randint(3, 8)):
+            path = os.path.join(directory, name)
+            if depth < 3 and "." not in name and rng.random() < 0.6:
+                stack.append((path, depth + 1))
+            else:
+                write(path, name)
+
+
+def walk(root: str, ignored) -> set[str]:
+    """Collect files reached by a walk pruned with the ignored predicate."""
+    found: set[str] = set()
+    stack: list[str] = [root]
+    while stack:
+        for entry in rename.safe_scandir(stack.pop()):
+            path = os.path.join(root, os.path.relpath(entry.path, root))
+            if ignored(path):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(path)
+            else:
+                found.add(os.path.relpath(path, root).replace(os.sep, "/"))
+
+    return found
+
+
+def git_ignored(root: str, paths: list[str]) -> set[str]:
+    """Ask git which of the paths (relative to root) are ignored."""
+    result = subprocess.run(
+        ["git", "-C", root, "check-ignore", "--stdin", "-z"],
+        input="\0".join(paths).encode(),
+        capture_output=True,
+        check=False,
+    )
+    assert result.returncode in (0, 1), result.stderr
+
+    return {os.fsdecode(j) for j in result.stdout.split(b"\0") if j}
+
+
+def git_untracked(root: str) -> set[str]:
+    """List untracked, non-ignored files as reported by git."""
+    result = subprocess.run(
+        ["git", "-C", root, "ls-files", "-o", "--exclude-standard", "-z"],
+        capture_output=True,
+        check=True,
+    )
+
+    return {os.fsdecode(j) for j in result.stdout.split(b"\0") if j}
+
+
+def reachable(root: str) -> list[str]:
+    """Relative paths of every entry whose ancestors git does not ignore."""
+    found: list[str] = []
+    level: list[str] = [""]
+    while level:
+        entries: list[str] = []
+        for directory in level:
+            for entry in rename.safe_scandir(os.path.join(root, directory)):
+                if entry.name != ".git":
+                    entries.append(f"{directory}/{entry.name}".lstrip("/"))
+        found.extend(entries)
+        ignored = git_ignored(root, entries)
+        level = [
+            j for j in entries if j not in ignored and os.path.isdir(f"{root}/{j}")
+        ]
+
+    return found
+
+
+@pytest.mark.parametrize("seed", range(24))
+def test_conformance(tmp_path, seed: int) -> None:
+    """Test per-path answers and pruned walks agree with git on random fixtures."""
+    root = str(tmp_path / "repo")
+    generate(root, seed)
+    engine = rename.GitIgnore(root)
+
+    paths = reachable(root)
+    expected = git_ignored(root, paths)
+    actual = {j for j in paths if engine(os.path.join(root, *j.split("/")))}
+    assert actual == expected
+
+    assert walk(root, rename.GitIgnore(root)) == git_untracked(root)
+
+
+def test_excludes_sources(tmp_path, isolate_config) -> None:
+    """Test core.excludesFile and .git/info/exclude are honoured."""
+    root = str(tmp_path / "repo")
+    subprocess.run(["git", "init", "-q", root], check=True)
+    write(
+        os.path.join(isolate_config, ".gitconfig"), "[core]\n\texcludesFile = ~/ign\n"
+    )
+    write(os.path.join(isolate_config, "ign"), "*.global\n")
+    write(os.path.join(root, ".git", "info", "exclude"), "*.local\n!keep.global\n")
+    for name in ("a.global", "keep.global", "b.local", "c.txt"):
+        write(os.path.join(root, name))
+
+    assert walk(root, rename.GitIgnore(root)) == git_untracked(root)
+    assert walk(root, rename.GitIgnore(root)) == {"keep.global", "c.txt"}
+
+
+def test_subdirectory_root(tmp_path) -> None:
+    """Test rules of parent directories apply when walking a subdirectory."""
+    root = str(tmp_path / "repo")
+    generate(root, 7)
+    write(os.path.join(root, ".gitignore"), "*.txt\n/top.md\n")
+    write(os.path.join(root, "inner", "top.md"))
+    write(os.path.join(root, "inner", "a.txt"))
+    write(os.path.join(root, "inner", "b.py"))
+
+    inner = os.path.join(root, "inner")
+    assert walk(inner, rename.GitIgnore(inner)) == {"top.md", "b.py"}
+
+
+def test_without_git(tmp_path) -> None:
+    """Test the engine works on an exported tree lacking a .git directory."""
+    root = str(tmp_path / "repo")
+    generate(root, 3)
+    expected = git_untracked(root)
+    shutil.rmtree(os.path.join(root, ".git"))
+
+    assert rename.find_repo_root(root) is None
+    assert walk(root, rename.GitIgnore(root)) == expected
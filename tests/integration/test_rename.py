@@ -0,0 +1,122 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Integration tests of rename.py against a git repository."""
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import rename
+
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+
+
+def test_list_candidates(git_repo) -> None:
+    """Test only tracked and untracked, non-ignored paths are enumerated."""
+    expected = {
+        os.path.join(git_repo, *name.split("/"))
+        for name in (
+            ".gitignore",
+            "README.md",
+            "src",
+            "src/PyTemplate",
+            "src/PyTemplate/__init__.py",
+            "src/PyTemplate/core.py",
+        )
+    }
+    assert rename.list_candidates(git_repo) == expected
+
+
+@pytest.mark.parametrize(
+    "step", ["update_project_name", "rename_directories_and_files"]
+)
+def test_backends_agree(git_repo, step: str) -> None:
+    """Test ls-files and check-ignore backends select the same paths."""
+    function = getattr(rename, step)
+    counts: list[int] = []
+    for backend in ("check-ignore", "ls-files"):
+        ignored = rename.ignore_filter(git_repo, git_repo, backend, timeout=10)
+        counts.append(
+            function(git_repo, "PyTemplate", "Renamed", True, git_repo, 10, ignored)
+        )
+
+    assert counts[0] == counts[1] > 0
+
+
+def test_ls_files_spawns_once(git_repo, monkeypatch) -> None:
+    """Test the ls-files backend spawns a single subprocess (never timed out)."""
+    calls: list[list[str]] = []
+    timeouts: list = []
+    original = subprocess.run
+
+    def counted(args, **kwargs):
+        calls.append(args)
+        timeouts.append(kwargs.get("timeout"))
+        return original(args, **kwargs)
+
+    monkeypatch.setattr(subprocess, "run", counted)
+    ignored = rename.ignore_filter(git_repo, git_repo, "ls-files", timeout=10)
+    rename.update_project_name(
+        git_repo, "PyTemplate", "Renamed", False, git_repo, 1, ignored
+    )
+    rename.rename_directories_and_files(
+        git_repo, "PyTemplate", "Renamed", False, git_repo, 1, ignored
+    )
+
+    assert len(calls) == 1
+    assert timeouts == [None]
+    assert os.path.isdir(os.path.join(git_repo, "src", "Renamed"))
+    assert os.path.isfile(os.path.join(git_repo, "build", "PyTemplate.txt"))
+
+
+def test_match_diff_applies(git_repo, tmp_path, monkeypatch) -> None:
+    """Test the diff of a dry run renames the tree (directories included)."""
+    output = str(tmp_path / "matches.diff")
+    argv = ["rename.py", "--path", git_repo, "--new-name", "Renamed", "--no-manifest"]
+    argv += ["--matches", output, "--matches-format", "diff"]
+    monkeypatch.setattr(sys, "argv", argv)
+    rename.main()
+    subprocess.run(["git", "-C", git_repo, "apply", output], check=True)
+
+    assert not os.path.exists(os.path.join(git_repo, "src", "PyTemplate"))
+    with open(os.path.join(git_repo, "src", "Renamed", "core.py")) as f:
+        assert f.read() == "import os\n"
+    with open(os.path.join(git_repo, "src", "Renamed", "__init__.py")) as f:
+        assert f.read() == '"""Renamed Project."""\n'
+
+
+def test_ls_files_error(tmp_path) -> None:
+    """Test a failure of git ls-files is reported, rather than a traceback of git."""
+    with pytest.raises(RuntimeError, match="--ignore-backend native"):
+        rename.ignore_filter(str(tmp_path), str(tmp_path), "ls-files")
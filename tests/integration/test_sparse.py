@@ -0,0 +1,146 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Integration tests of rename.py against a sparse checkout."""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import rename
+
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+
+
+def ls_files(root: str) -> list[tuple[str, bool]]:
+    result = subprocess.run(
+        ["git", "-C", root, "ls-files", "-t", "-z", "--sparse"],
+        check=True,
+        capture_output=True,
+    )
+    entries = [j.decode() for j in result.stdout.split(b"\0") if j]
+
+    return [(j[2:], j[0] == "S") for j in entries]
+
+
+@pytest.mark.parametrize("sparse_repo", ["sha1", "sha256"], indirect=True)
+@pytest.mark.parametrize("version", [3, 4])
+@pytest.mark.parametrize("sparse_index", [False, True])
+def test_read_index(
+    sparse_repo: str, request, version: int, sparse_index: bool
+) -> None:
+    """Test the index is parsed as git lists it, in every supported format."""
+    git = ["git", "-C", sparse_repo]
+    if sparse_index:
+        subprocess.run([*git, "sparse-checkout", "init", "--sparse-index"], check=True)
+    subprocess.run([*git, "update-index", "--index-version", str(version)], check=True)
+    object_format = request.node.callspec.params["sparse_repo"]
+    entries = rename.read_index(
+        os.path.join(sparse_repo, ".git", "index"), object_format
+    )
+
+    assert entries == ls_files(sparse_repo)
+    assert ("src/PyTemplate/__init__.py", False) in entries
+    assert ("docs/" if sparse_index else "docs/PyTemplate.md", True) in entries
+
+
+def test_read_index_missing(tmp_path) -> None:
+    """Test a missing, or unrecognized, index has no entries."""
+    path = str(tmp_path / "index")
+    assert rename.read_index(path) == []
+    with open(path, "wb") as f:
+        f.write(b"DIRC\0\0\0\x09\0\0\0\0")
+    assert rename.read_index(path) == []
+
+
+@pytest.mark.parametrize("sparse_repo", ["sha256"], indirect=True)
+def test_read_index_format(sparse_repo: str) -> None:
+    """Test an index is only parsed with the object format of its repository."""
+    path = os.path.join(sparse_repo, ".git", "index")
+    assert rename.read_index(path, "md5") == []
+
+    sparse = rename.SkipWorktree(sparse_repo, sparse_repo)
+    assert sparse.relative == ["docs/PyTemplate.md", "docs/api/PyTemplate.rst"]
+    assert not sparse(os.path.join(sparse_repo, "README.md"))
+
+
+def test_skip_worktree(sparse_repo: str) -> None:
+    """Test paths outside of the sparse checkout (and their directories) bypassed."""
+    sparse = rename.SkipWorktree(sparse_repo, sparse_repo)
+    docs = os.path.join(sparse_repo, "docs")
+
+    assert len(sparse) == 2
+    assert sparse(docs)
+    assert sparse(os.path.join(docs, "api", "PyTemplate.rst"))
+    assert not sparse(os.path.join(sparse_repo, "src"))
+    assert not sparse(os.path.join(sparse_repo, "README.md"))
+
+    subdirectory = rename.SkipWorktree(docs, sparse_repo)
+    assert subdirectory.relative == ["PyTemplate.md", "api/PyTemplate.rst"]
+    assert subdirectory(os.path.join(docs, "api"))
+
+
+def test_sparse_rename(sparse_repo: str, tmp_path, monkeypatch, capsys) -> None:
+    """Test a sparse checkout is renamed, without opening paths outside of it."""
+    # NOTE: Rehydrate a file (as a virtualized checkout would), keeping its bit set.
+    hydrated = os.path.join(sparse_repo, "docs", "PyTemplate.md")
+    os.makedirs(os.path.dirname(hydrated))
+    with open(hydrated, "w", encoding="utf-8") as f:
+        f.write("PyTemplate\n")
+    opened: list[str] = []
+    original = rename._contents
+
+    def contents(f, st):
+        opened.append(f.name)
+        return original(f, st)
+
+    deferred = str(tmp_path / "deferred.json")
+    monkeypatch.setattr(rename, "_contents", contents)
+    argv = ["rename.py", "--path", sparse_repo, "--new-name", "Renamed"]
+    monkeypatch.setattr(sys, "argv", [*argv, "--no-manifest", "--deferred", deferred])
+    rename.main()
+
+    assert "Bypassed 2 path(s)" in capsys.readouterr().out
+    assert os.path.isdir(os.path.join(sparse_repo, "src", "Renamed"))
+    assert os.path.isfile(hydrated)
+    assert opened
+    assert not [j for j in opened if "docs" in j]
+    with open(deferred, "r", encoding="utf-8") as f:
+        assert json.load(f) == {
+            "skip_worktree": 2,
+            "renames": [
+                ["docs/PyTemplate.md", "docs/Renamed.md"],
+                ["docs/api/PyTemplate.rst", "docs/api/Renamed.rst"],
+            ],
+        }
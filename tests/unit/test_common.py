@@ -0,0 +1,61 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Unit tests of primitives shared by rename.py and the rename engine."""
+
+import os
+
+import rename
+from PyTemplate import common
+
+
+def test_listing_unreadable(tmp_path) -> None:
+    """Test directories which cannot be listed are treated as empty."""
+    assert common.listing(str(tmp_path / "missing")) == []
+    (tmp_path / "file").touch()
+    assert common.listing(str(tmp_path / "file")) == []
+
+
+def test_walk_sorted(tmp_path) -> None:
+    """Test entries are walked in post-order, sorted by name."""
+    for name in ("b/d", "b/c", "a"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).touch()
+    (tmp_path / ".git").mkdir()
+
+    found = [os.path.relpath(j, tmp_path) for j, _ in common.walk(str(tmp_path))]
+    assert found == ["a", os.path.join("b", "c"), os.path.join("b", "d"), "b"]
+
+
+def test_rename_agrees() -> None:
+    """Test the copies kept by rename.py (which must run standalone) agree."""
+    assert rename.PRUNED_DIRECTORIES == common.PRUNED_DIRECTORIES
+    assert rename.SNIFF_SIZE == common.SNIFF_SIZE
+    assert rename.MAGIC_NUMBERS == common.MAGIC_NUMBERS
+    assert rename.LFS_POINTER == common.LFS_POINTER
@@ -0,0 +1,269 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Unit tests of the plan / apply rename engine."""
+
+import os
+
+import pytest
+
+from PyTemplate import engine
+
+
+MAPPING: dict[str, str] = {"PyTemplate": "Renamed", "Template": "Form"}
+
+
+def write(root: str, files: dict[str, bytes]) -> None:
+    for name, content in files.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+
+def read(root: str) -> dict[str, bytes]:
+    found: dict[str, bytes] = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                found[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+
+    return found
+
+
+@pytest.fixture
+def tree(tmp_path) -> str:
+    root = str(tmp_path / "tree")
+    write(
+        root,
+        {
+            "src/PyTemplate/__init__.py": b'"""PyTemplate Project (a Template)."""\n',
+            "src/PyTemplate/core.py": b"import os\n",
+            "README.md": b"# PyTemplate\n",
+            "logo.png": b"\x89PNG\x00PyTemplate",
+            ".git/PyTemplate": b"PyTemplate\n",
+        },
+    )
+
+    return root
+
+
+def test_plan(tree: str) -> None:
+    """Test every edit and rename is planned, in post-order, without changes."""
+    before = read(tree)
+    plan = engine.plan(tree, MAPPING)
+
+    assert read(tree) == before
+    assert plan.keys == ["PyTemplate", "Template"]
+    assert [j.path for j in plan.files] == ["README.md", "src/PyTemplate/__init__.py"]
+    assert plan.files[0].edits == (2, 0)
+    assert plan.files[1].edits == (3, 0, 25, 1)
+    assert plan.renames == [("src/PyTemplate", "src/Renamed")]
+    assert len(plan) == 3
+
+
+def test_plan_ignored(tree: str) -> None:
+    """Test ignored paths are neither scanned nor renamed."""
+    ignored = os.path.join(tree, "src")
+    plan = engine.plan(tree, MAPPING, lambda path: path == ignored)
+
+    assert [j.path for j in plan.files] == ["README.md"]
+    assert plan.renames == []
+
+
+def test_plan_classified(tree: str) -> None:
+    """Test files are classified as by a rename (globs, size, magic numbers)."""
+    write(tree, {"image.gif": b"GIF89aPyTemplate", "notes.txt": b"PyTemplate\n"})
+    plan = engine.plan(tree, MAPPING)
+    assert [j.path for j in plan.files] == [
+        "README.md",
+        "notes.txt",
+        "src/PyTemplate/__init__.py",
+    ]
+
+    classifier = engine.Classifier(tree, exclude=["*.md"], max_size=16)
+    plan = engine.plan(tree, MAPPING, classifier=classifier)
+    assert [j.path for j in plan.files] == ["notes.txt"]
+    assert classifier.skipped == {"binary": 2, "excluded": 1, "max-size": 1}
+    assert plan.renames == [("src/PyTemplate", "src/Renamed")]
+
+
+def test_plan_unreadable(tree: str, monkeypatch) -> None:
+    """Test a file which cannot be read is reported, and only renamed."""
+    missing = os.path.join(tree, "README.md")
+    opened = open
+
+    def vanish(path, *args, **kwargs):
+        if path == missing:
+            raise FileNotFoundError(path)
+        return opened(path, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", vanish)
+    logged: list[str] = []
+    plan = engine.plan(tree, {**MAPPING, "README": "READ"}, log=logged.append)
+
+    assert [j.path for j in plan.files] == ["src/PyTemplate/__init__.py"]
+    assert ("README.md", "READ.md") in plan.renames
+    assert logged == [f"[Warning] (FileNotFoundError) {missing}"]
+
+
+def test_plan_identical(tree: str) -> None:
+    """Test an identity mapping plans nothing."""
+    assert len(engine.plan(tree, {"PyTemplate": "PyTemplate"})) == 0
+
+
+def test_round_trip(tree: str, tmp_path) -> None:
+    """Test a plan is restored identically from json."""
+    plan = engine.plan(tree, MAPPING)
+    path = str(tmp_path / "plan.json")
+    plan.dump(path)
+    restored = engine.Plan.load(path)
+
+    assert restored.to_dict() == plan.to_dict()
+    assert list(restored.describe()) == [
+        "Would update content within file: README.md (1 edit(s))",
+        "Would update content within file: src/PyTemplate/__init__.py (2 edit(s))",
+        "Would rename: src/PyTemplate -> src/Renamed",
+    ]
+    with pytest.raises(ValueError, match="Unsupported"):
+        engine.Plan.from_dict({**plan.to_dict(), "version": 0})
+
+
+def test_apply(tree: str) -> None:
+    """Test a plan is applied without scanning files again."""
+    plan = engine.plan(tree, MAPPING)
+    logged: list[str] = []
+
+    assert engine.apply(plan, log=logged.append) == 3
+    assert len(logged) == 3
+    assert read(tree) == {
+        "src/Renamed/__init__.py": b'"""Renamed Project (a Form)."""\n',
+        "src/Renamed/core.py": b"import os\n",
+        "README.md": b"# Renamed\n",
+        "logo.png": b"\x89PNG\x00PyTemplate",
+        ".git/PyTemplate": b"PyTemplate\n",
+    }
+
+
+def test_apply_elsewhere(tree: str, tmp_path) -> None:
+    """Test a plan may be applied to a copy of the tree it was made from."""
+    plan = engine.plan(tree, MAPPING)
+    copy = str(tmp_path / "copy")
+    os.rename(tree, copy)
+    engine.apply(plan, copy)
+
+    assert read(copy)["README.md"] == b"# Renamed\n"
+
+
+def test_apply_touched(tree: str) -> None:
+    """Test a file touched (but unchanged) since planned is still applied."""
+    plan = engine.plan(tree, MAPPING)
+    os.utime(os.path.join(tree, "README.md"), ns=(0, 0))
+    engine.apply(plan)
+
+    assert read(tree)["README.md"] == b"# Renamed\n"
+
+
+@pytest.mark.parametrize(
+    ("name", "content"),
+    [("README.md", b"# Changed PyTemplate\n"), ("src/PyTemplate/__init__.py", None)],
+)
+def test_apply_stale(tree: str, name: str, content) -> None:
+    """Test a stale plan is rejected before any change is made."""
+    plan = engine.plan(tree, MAPPING)
+    path = os.path.join(tree, *name.split("/"))
+    if content is None:
+        os.remove(path)
+    else:
+        write(tree, {name: content})
+    before = read(tree)
+
+    with pytest.raises(engine.StalePlanError):
+        engine.apply(plan)
+    assert read(tree) == before
+
+
+def test_apply_missing_rename(tree: str) -> None:
+    """Test a plan is rejected when a path to rename no longer exists."""
+    plan = engine.plan(tree, {"core": "main"})
+    os.remove(os.path.join(tree, "src", "PyTemplate", "core.py"))
+
+    with pytest.raises(engine.StalePlanError, match="no longer exists"):
+        engine.apply(plan)
+
+
+def test_splice_stale() -> None:
+    """Test an edit is rejected unless its keyword is found at its offset."""
+    edit = engine.FileEdits("a", 0, 0, "", (1, 0))
+    assert engine._splice(b"_abc_", edit, [(b"abc", b"x")]) == b"_x_"
+    with pytest.raises(engine.StalePlanError):
+        engine._splice(b"abc__", edit, [(b"abc", b"x")])
+
+
+def test_apply_conflict(tree: str) -> None:
+    """Test a rename never replaces an existing path."""
+    plan = engine.plan(tree, MAPPING)
+    os.makedirs(os.path.join(tree, "src", "Renamed"))
+
+    with pytest.raises(FileExistsError):
+        engine.apply(plan)
+
+
+def test_apply_hardlink(tree: str) -> None:
+    """Test hardlinked files are rewritten in place, preserving the link."""
+    path = os.path.join(tree, "README.md")
+    link = os.path.join(tree, "..", "link.md")
+    os.link(path, link)
+    engine.apply(engine.plan(tree, MAPPING))
+
+    with open(link, "rb") as f:
+        assert f.read() == b"# Renamed\n"
+    assert os.path.samefile(path, link)
+
+
+def test_apply_mode(tree: str) -> None:
+    """Test permissions of replaced files are preserved."""
+    path = os.path.join(tree, "README.md")
+    os.chmod(path, 0o640)
+    engine.apply(engine.plan(tree, MAPPING))
+
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+
+def test_write_failure(tree: str, monkeypatch) -> None:
+    """Test the temporary file is removed when a file cannot be replaced."""
+
+    def fail(src, dst):
+        raise OSError("replace")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError, match="replace"):
+        engine.apply(engine.plan(tree, MAPPING))
+    assert not [j for j in read(tree) if j.endswith("rename-tmp")]
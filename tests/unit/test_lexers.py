@@ -0,0 +1,254 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Unit tests of the custom documentation lexers (docs/source/_ext)."""
+
+import glob
+import os
+import pickle
+import random
+import sys
+import threading
+
+import pytest
+from pygments.util import OptionError
+
+
+ROOT: str = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
+)
+EXT: str = os.path.join(ROOT, "docs", "source", "_ext")
+sys.path.append(EXT)
+lexers = pytest.importorskip("lexers")
+sys.path.remove(EXT)
+
+SOURCES: list[str] = [
+    os.path.join(ROOT, "rename.py"),
+    *(
+        path
+        for j in ("src", "tests", "benchmarks", "docs")
+        for path in sorted(
+            glob.glob(os.path.join(ROOT, j, "**", "*.py"), recursive=True)
+        )
+    ),
+]
+CYTHON: str = """
+# cython: language_level=3
+from libc.stdlib cimport malloc, free
+cimport numpy as cnp
+ctypedef unsigned long long u64
+
+cdef extern from "math.h" nogil:
+    double sqrt(double x)
+
+cdef class Vector:
+    cdef public double[:] data
+    cdef readonly Py_ssize_t size
+
+    def __cinit__(self, Py_ssize_t size):
+        self.data = <double[:size]> malloc(size * sizeof(double))
+
+    cpdef double norm(self) except? -1 nogil:
+        cdef Py_ssize_t i
+        cdef double total = 0
+        for i in prange(self.size):
+            total += self.data[i] ** 2
+        return sqrt(total)
+
+DEF CONSTANT = 0x1F
+"""
+EDGES: tuple[str, ...] = (
+    "",
+    "\n",
+    "x = Rb'raw' + fR'{x!r:>{width}}' + b\"\\x00\" + rf'''{{}}'''\n",
+    's = \'unterminated\nt = """open\n',
+    "@decorator(arg=[1, 2])\nasync def f(*a, **k) -> 'T':\n    await g()\n",
+    "π = ñame + 1_000.5e-3j\r\n$ ? `\\\n",
+    "match value:\n    case [1, *rest] if rest: pass\n    case _: ...\n",
+    "class A(B, metaclass=M): x: int = 0; __slots__ = ()\n",
+    "def f(): return f'{x:{y}}' f\"{'a' 'b'}\"\n",
+    "\tif x:\n\t\tyield from (i for i in range(10) if i % 2 == 0)\n",
+    "x.עִברִית = 1\n",
+)
+
+SNIPPETS: tuple[str, ...] = (
+    "value = ((1)",
+    "CONSTANT = {'key': [f(x) for x in range(3)]}",
+    "g(h(i(j(k(l(m())))))) ]",
+    "def f(a: list[dict[str, tuple[int, ...]]]) -> None: ...",
+)
+
+
+def test_lexer_state() -> None:
+    """Test lexers carry no state between calls, and pickle cleanly."""
+    lexer = lexers.CustomPythonLexer(n_brackets=3)
+    list(lexer.get_tokens("value = ((1)"))
+
+    fresh = list(lexers.CustomPythonLexer(n_brackets=3).get_tokens("f(x)"))
+    # NOTE: Unbalanced brackets of one code block do not offset those of the next.
+    assert list(lexer.get_tokens("f(x)")) == fresh
+
+    clone = pickle.loads(pickle.dumps(lexer))
+    assert clone.n_brackets == 3
+    assert list(clone.get_tokens("f(x)")) == fresh
+
+
+def test_interleaved() -> None:
+    """Test interleaved calls of a single instance do not share bracket depth."""
+    lexer = lexers.CustomPythonLexer()
+    a = lexer.get_tokens_unprocessed(SNIPPETS[0] * 4)
+    b = lexer.get_tokens_unprocessed(SNIPPETS[2] * 4)
+    tokens: dict[str, list] = {SNIPPETS[0] * 4: [], SNIPPETS[2] * 4: []}
+    for x, y in zip(a, b):
+        tokens[SNIPPETS[0] * 4].append(x)
+        tokens[SNIPPETS[2] * 4].append(y)
+    tokens[SNIPPETS[0] * 4].extend(a)
+    tokens[SNIPPETS[2] * 4].extend(b)
+
+    for text, result in tokens.items():
+        assert result == list(lexers.CustomPythonLexer().get_tokens_unprocessed(text))
+
+
+def test_threads() -> None:
+    """Stress test a single instance shared by many threads."""
+    lexer = lexers.CustomPythonLexer()
+    expected: dict[str, list] = {
+        j: list(lexers.CustomPythonLexer().get_tokens(j)) for j in SNIPPETS
+    }
+    n_threads: int = 16
+    barrier = threading.Barrier(n_threads)
+    failures: list[str] = []
+
+    def work(n: int) -> None:
+        barrier.wait()
+        for k in range(200):
+            text: str = SNIPPETS[(n + k) % len(SNIPPETS)]
+            if list(lexer.get_tokens(text)) != expected[text]:
+                failures.append(text)
+
+    interval: float = sys.getswitchinterval()
+    # NOTE: Switch threads as often as possible, to interleave tokenization.
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert failures == []
+
+
+def _engines(cls, text: str) -> tuple[list, list]:
+    """Tokens of text, from the regex and machine engines."""
+    return (
+        list(cls().get_tokens_unprocessed(text)),
+        list(cls(engine="machine").get_tokens_unprocessed(text)),
+    )
+
+
+@pytest.mark.parametrize("cls", ["CustomPythonLexer", "CustomCythonLexer"])
+def test_machine(cls: str) -> None:
+    """Test the machine engine produces tokens identical to the regex engine."""
+    lexer = getattr(lexers, cls)
+    texts: list[str] = [CYTHON, *EDGES]
+    for path in SOURCES:
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+
+    for text in texts:
+        regex, machine = _engines(lexer, text)
+        assert machine == regex
+
+
+@pytest.mark.parametrize("cls", ["CustomPythonLexer", "CustomCythonLexer"])
+def test_machine_fuzz(cls: str) -> None:
+    """Test engines agree over random fragments of source (and characters)."""
+    lexer = getattr(lexers, cls)
+    rng = random.Random(0)
+    fragments: list[str] = [
+        *(j for text in (CYTHON, *EDGES) for j in text.split(" ")),
+        *"()[]{}<>'\"\\#@$!?:;.,=+-*/%&|^~\n\t\r ",
+        "é",
+        "日本",
+    ]
+    for _ in range(300):
+        text: str = "".join(rng.choices(fragments, k=rng.randint(1, 40)))
+        regex, machine = _engines(lexer, text)
+        assert machine == regex, text
+
+
+def test_machine_option() -> None:
+    """Test the engine is selected by a lexer option."""
+    assert lexers.CustomPythonLexer().engine == "regex"
+    assert lexers.CustomPythonLexer(engine="machine").engine == "machine"
+    with pytest.raises(OptionError):
+        lexers.CustomPythonLexer(engine="unknown")
+
+
+def test_tokenize() -> None:
+    """Test the tokenize engine produces tokens identical to the regex engine."""
+    texts: list[str] = [*EDGES, *SNIPPETS]
+    for path in SOURCES:
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+
+    lexer = lexers.CustomPythonLexer(engine="tokenize")
+    for text in texts:
+        regex: list = list(lexers.CustomPythonLexer().get_tokens_unprocessed(text))
+        assert list(lexer.get_tokens_unprocessed(text)) == regex
+
+
+def test_tokenize_fuzz() -> None:
+    """Test engines agree over random sequences of python tokens (in context)."""
+    rng = random.Random(0)
+    fragments: list[str] = [
+        *"()[]{}.,:;=+-*/%@&|^~<>",
+        *("**=", "->", "...", ":=", "!=", "//", ">>=", " ", "  ", "\n", "\\\n"),
+        *("x", "_", "self", "print", "Exception", "__init__", "__name__", "CONSTANT"),
+        *("yield", "from", "import", "async", "for", "not", "in", "is", "None", "def"),
+        *("class", "match", "case", "type", "lambda", "if", "else", "as", "print ("),
+        *("1", "0x1F", "0o17", "0b1", "1_000.5e-3j", ".5", "1j", "π", "ñame"),
+        *("'s'", '"""doc"""', "rb'\\x00'", "f'{x!r}'", "# NOTE: c", "#!", "# c"),
+        *("\n    ", "\n\t", "\n    \n", ':\n    """\n    Args:\n    """\n'),
+    ]
+    lexer = lexers.CustomPythonLexer(engine="tokenize")
+    for _ in range(500):
+        text: str = "".join(rng.choices(fragments, k=rng.randint(1, 40)))
+        regex: list = list(lexers.CustomPythonLexer().get_tokens_unprocessed(text))
+        assert list(lexer.get_tokens_unprocessed(text)) == regex, text
+
+
+def test_tokenize_option() -> None:
+    """Test the tokenize engine is only available to the python lexer."""
+    assert lexers.CustomPythonLexer(engine="tokenize").engine == "tokenize"
+    with pytest.raises(OptionError):
+        lexers.CustomCythonLexer(engine="tokenize")
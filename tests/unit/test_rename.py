@@ -0,0 +1,986 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2025, Spill-Tea
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Unit tests of rename.py which do not require git."""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tarfile
+import tracemalloc
+import zipfile
+from typing import Any
+
+import pytest
+
+import rename
+
+
+def never(path: str) -> bool:
+    return False
+
+
+def make_tree(root: str, names: list[str]) -> None:
+    for name in names:
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"from PyTemplate import {len(name)}\n")
+
+
+def snapshot(root: str) -> dict[str, str]:
+    found: dict[str, str] = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            with open(path, "r", encoding="utf-8") as f:
+                found[os.path.relpath(path, root)] = f.read()
+
+    return found
+
+
+def test_standalone() -> None:
+    """Test the script runs without the package it renames (e.g. to roll back)."""
+    code = "import sys, rename; assert 'PyTemplate' not in sys.modules"
+    subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(rename.__file__)),
+        check=True,
+    )
+
+
+def test_walk_post_order(tmp_path) -> None:
+    """Test children are yielded before their parent directory, exactly once."""
+    root = str(tmp_path)
+    make_tree(root, ["a/b/c.txt", "a/d.txt", "e.txt"])
+    order = [os.path.relpath(path, root) for path, _ in rename.walk(root, never)]
+
+    assert sorted(order) == sorted({*order})
+    assert order.index(os.path.join("a", "b", "c.txt")) < order.index(
+        os.path.join("a", "b")
+    )
+    assert order.index(os.path.join("a", "b")) < order.index("a")
+    assert order.index("a") < order.index("e.txt")
+
+
+def test_walk_deep_tree(tmp_path) -> None:
+    """Test trees deeper than the recursion limit are walked without error."""
+    depth = sys.getrecursionlimit() + 10
+    path = str(tmp_path)
+    for _ in range(depth):
+        path = os.path.join(path, "d")
+        os.mkdir(path)
+
+    try:
+        assert sum(1 for _ in rename.walk(str(tmp_path), never)) == depth
+    finally:
+        # NOTE: shutil.rmtree (used by pytest to clean up) is itself recursive.
+        for path, _ in rename.walk(str(tmp_path), never):
+            os.rmdir(path)
+
+
+def test_single_pass_matches_two_phases(tmp_path) -> None:
+    """Test the fused pass produces the same tree as both phases in sequence."""
+    names = ["PyTemplate/PyTemplate.py", "PyTemplate/sub/x.txt", "docs/PyTemplate.md"]
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    make_tree(first, names)
+    make_tree(second, names)
+
+    calls: list[str] = []
+
+    def counted(path: str) -> bool:
+        calls.append(path)
+        return False
+
+    total = rename.update_project_name(
+        first, "PyTemplate", "Renamed", False, "", 1, never
+    )
+    total += rename.rename_directories_and_files(
+        first, "PyTemplate", "Renamed", False, "", 1, never
+    )
+    fused = rename.rename_project(
+        second, "PyTemplate", "Renamed", False, "", 1, counted
+    )
+
+    assert fused == total == 6
+    assert snapshot(first) == snapshot(second)
+    assert len(calls) == len(set(calls)) == 6
+
+
+def test_concurrent_matches_sequential(tmp_path, capsys) -> None:
+    """Test a worker pool yields the same tree, count, and ordered log output."""
+    names = [
+        f"{a}/{b}/{c}"
+        for a in ("PyTemplate", "docs")
+        for b in ("PyTemplate_x", "y")
+        for c in ("PyTemplate.py", "a.txt", "b.txt")
+    ]
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    make_tree(first, names)
+    make_tree(second, names)
+
+    sequential = rename.rename_project(
+        first, "PyTemplate", "Renamed", False, "", 1, never
+    )
+    expected = capsys.readouterr().out.replace(first, "<root>")
+    concurrent = rename.rename_project(
+        second, "PyTemplate", "Renamed", False, "", 1, never, jobs=4
+    )
+    actual = capsys.readouterr().out.replace(second, "<root>")
+
+    assert concurrent == sequential == 19
+    assert actual == expected
+    assert snapshot(first) == snapshot(second)
+
+
+def test_walk_prunes_tool_directories(tmp_path) -> None:
+    """Test version control and tool directories are never entered."""
+    root = str(tmp_path)
+    make_tree(root, [".git/config", "src/__pycache__/a.pyc", "src/a.py", ".tox/x"])
+    found = {os.path.relpath(path, root) for path, _ in rename.walk(root, never)}
+
+    assert found == {"src", os.path.join("src", "a.py")}
+
+
+def test_parse_size() -> None:
+    """Test human readable sizes are parsed into bytes."""
+    assert rename.parse_size("512") == 512
+    assert rename.parse_size("64K") == 65536
+    assert rename.parse_size("1.5mb") == 1572864
+
+
+def test_classifier(tmp_path) -> None:
+    """Test files are classified (and counted) before being read in full."""
+    root = str(tmp_path)
+    files: dict[str, bytes] = {
+        "text.py": b"PyTemplate\r\n",
+        "nul.bin": b"PyTemplate\x00",
+        "image.png": b"\x89PNG\r\n\x1a\nPyTemplate",
+        "large.txt": b"PyTemplate" * 100,
+        "pointer.dat": rename.LFS_POINTER + b"\noid sha256:0\nsize 1\n",
+        "skip.md": b"PyTemplate",
+        "vendor/lib.py": b"PyTemplate",
+    }
+    for name, content in files.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+    os.link(os.path.join(root, "text.py"), os.path.join(root, "link.py"))
+
+    classifier = rename.Classifier(
+        root, exclude=["*.md", "vendor/*"], max_size=rename.parse_size("512")
+    )
+    count = rename.update_project_name(
+        root, "PyTemplate", "Renamed", False, "", 1, never, classifier
+    )
+
+    assert count == 1
+    assert classifier.skipped == {
+        "binary": 2,
+        "excluded": 2,
+        "hardlink": 1,
+        "lfs-pointer": 1,
+        "max-size": 1,
+    }
+    with open(os.path.join(root, "link.py"), "rb") as f:
+        assert f.read() == b"Renamed\r\n"
+
+
+def test_classifier_include(tmp_path) -> None:
+    """Test only files matching an include glob are read."""
+    root = str(tmp_path)
+    make_tree(root, ["a.py", "b.txt", "docs/c.py"])
+    classifier = rename.Classifier(root, include=["*.py"])
+    count = rename.update_project_name(
+        root, "PyTemplate", "Renamed", True, "", 1, never, classifier
+    )
+
+    assert count == 2
+    assert classifier.summary() == "Skipped 1 file(s): not-included=1"
+
+
+def test_case_variants() -> None:
+    """Test common case variants are generated for a mapping."""
+    assert rename.case_variants("PyTemplate", "my-project") == {
+        "PyTemplate": "my-project",
+        "pytemplate": "my-project",
+        "PYTEMPLATE": "MY-PROJECT",
+        "py_template": "my_project",
+        "PY_TEMPLATE": "MY_PROJECT",
+        "py-template": "my-project",
+    }
+
+
+def test_replacer() -> None:
+    """Test longest keywords win, and replaced text is never rescanned."""
+    replacer = rename.Replacer({"Py": "PyPy", "PyTemplate": "X", "same": "same"})
+
+    assert replacer.mapping == {"Py": "PyPy", "PyTemplate": "X"}
+    assert replacer.sub("Py PyTemplate") == "PyPy X"
+    assert not rename.Replacer({"a": "a"})
+
+
+def test_parse_mapping(tmp_path) -> None:
+    """Test old=new mappings are parsed from arguments and files."""
+    path = str(tmp_path / "map.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# comment\nSpill-Tea=someone\n\na=b=c\n")
+
+    assert rename.parse_mapping("old=new") == ("old", "new")
+    assert rename.read_mapping(path) == {"Spill-Tea": "someone", "a": "b=c"}
+    with pytest.raises(argparse.ArgumentTypeError):
+        rename.parse_mapping("missing")
+
+
+def test_multiple_mappings_single_read(tmp_path, monkeypatch) -> None:
+    """Test every file is opened at most twice (read, write) for many mappings."""
+    root = str(tmp_path)
+    with open(os.path.join(root, "PY_TEMPLATE.env"), "w", encoding="utf-8") as f:
+        f.write("PY_TEMPLATE_HOME=1\nimport pytemplate\nimport py_template\n")
+
+    opened: list[str] = []
+
+    def counted(file, *args, **kwargs):
+        opened.append(file)
+        return open(file, *args, **kwargs)
+
+    monkeypatch.setattr(rename, "open", counted, raising=False)
+    replacer = rename.Replacer(rename.case_variants("PyTemplate", "Renamed"))
+    count = rename.rename_project(root, "", "", False, "", 1, never, replacer=replacer)
+
+    assert count == 2
+    assert len(opened) == 2
+    with open(os.path.join(root, "RENAMED.env"), encoding="utf-8") as f:
+        assert f.read() == "RENAMED_HOME=1\nimport renamed\nimport renamed\n"
+
+
+JOURNALED: list[str] = [
+    f"{a}/{b}/{c}"
+    for a in ("PyTemplate", "docs")
+    for b in ("PyTemplate_x", "y")
+    for c in ("PyTemplate.py", "a.txt")
+]
+
+
+def journaled_rename(root: str, journal_dir: str, resume: bool = False) -> int:
+    journal = rename.Journal(journal_dir)
+    replacer = rename.Replacer({"PyTemplate": "Renamed"})
+    journal.start(replacer.mapping, resume=resume)
+    count = rename.rename_project(
+        root, "", "", False, "", 1, never, replacer=replacer, journal=journal
+    )
+    journal.finish()
+
+    return count
+
+
+def test_journal_rollback(tmp_path) -> None:
+    """Test a journaled rename is reverted exactly, including hardlinked files."""
+    root, journal_dir = str(tmp_path / "root"), str(tmp_path / "journal")
+    make_tree(root, JOURNALED)
+    os.link(os.path.join(root, "docs", "y", "a.txt"), os.path.join(root, "link.txt"))
+    original = snapshot(root)
+
+    assert journaled_rename(root, journal_dir) == 15
+    assert os.path.isdir(os.path.join(root, "Renamed", "Renamed_x"))
+    assert os.path.samefile(
+        os.path.join(root, "docs", "y", "a.txt"), os.path.join(root, "link.txt")
+    )
+    assert rename.Journal(journal_dir).rollback(log=lambda _: None) == 15
+    assert snapshot(root) == original
+    assert not os.path.exists(journal_dir)
+
+
+def test_journal_directory(tmp_path) -> None:
+    """Test only the journal (and its backups) are removed from its directory."""
+    root, journal_dir = str(tmp_path / "root"), tmp_path / "journal"
+    make_tree(root, JOURNALED)
+    journal_dir.mkdir()
+    (journal_dir / "notes.txt").write_text("notes")
+    with pytest.raises(RuntimeError, match="not empty"):
+        journaled_rename(root, str(journal_dir))
+    assert (journal_dir / "notes.txt").read_text() == "notes"
+
+    (journal_dir / "notes.txt").unlink()
+    journaled_rename(root, str(journal_dir))
+    (journal_dir / "notes.txt").write_text("notes")
+    rename.Journal(str(journal_dir)).rollback(log=lambda _: None)
+    assert os.listdir(journal_dir) == ["notes.txt"]
+
+
+def test_journal_resume(tmp_path, monkeypatch) -> None:
+    """Test an interrupted rename resumes without redoing (or rereading) work."""
+    root, journal_dir = str(tmp_path / "root"), str(tmp_path / "journal")
+    expected = str(tmp_path / "expected")
+    make_tree(root, JOURNALED)
+    make_tree(expected, JOURNALED)
+    rename.rename_project(expected, "PyTemplate", "Renamed", False, "", 1, never)
+
+    written: list[str] = []
+    atomic_write = rename.atomic_write
+
+    def interrupt(path, *args) -> None:
+        if len(written) == 5:
+            raise KeyboardInterrupt
+        written.append(path)
+        atomic_write(path, *args)
+
+    monkeypatch.setattr(rename, "atomic_write", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        journaled_rename(root, journal_dir)
+
+    with pytest.raises(RuntimeError, match="--resume"):
+        rename.Journal(journal_dir).start({"PyTemplate": "Renamed"})
+
+    written.clear()
+    monkeypatch.setattr(rename, "atomic_write", atomic_write)
+    opened: list[str] = []
+
+    def counted(file, *args, **kwargs):
+        opened.append(file)
+        return open(file, *args, **kwargs)
+
+    monkeypatch.setattr(rename, "open", counted, raising=False)
+    journaled_rename(root, journal_dir, resume=True)
+
+    assert snapshot(root) == snapshot(expected)
+    # NOTE: Files within completed directories are never read again.
+    read = {j for j in opened if j.startswith(root) and "rename-tmp" not in j}
+    assert read and all(j.startswith(os.path.join(root, "docs")) for j in read)
+    assert rename.Journal(journal_dir).rollback(log=lambda _: None) > 0
+
+
+def manifested_rename(
+    root: str, path: str, mapping: dict[str, str], dry_run: bool
+) -> tuple[int, list[str]]:
+    """Rename using a manifest, returning the count and paths of files opened."""
+    replacer = rename.Replacer(mapping)
+    manifest = rename.Manifest(path, root, replacer, renames=not dry_run)
+    opened: list[str] = []
+
+    def counted(file, *args, **kwargs):
+        opened.append(file)
+        return open(file, *args, **kwargs)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(rename, "open", counted, raising=False)
+        count = rename.rename_project(
+            root, "", "", dry_run, "", 1, never, replacer=replacer, manifest=manifest
+        )
+    manifest.save()
+
+    # NOTE: Age the manifest, so entries written within the same tick are not racy.
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**10))
+
+    return count, [j for j in opened if j.startswith(root)]
+
+
+def test_manifest(tmp_path) -> None:
+    """Test unchanged files are skipped without being opened, by dry and real runs."""
+    root, path = str(tmp_path / "root"), str(tmp_path / "manifest.json")
+    make_tree(root, ["PyTemplate/a.py", "b.txt", "c/d.txt"])
+    for name in ("b.txt", "c/d.txt"):
+        with open(os.path.join(root, name), "w", encoding="utf-8") as f:
+            f.write(f"{name}\n")
+    mapping = {"PyTemplate": "Renamed"}
+
+    assert manifested_rename(root, path, mapping, True) == (
+        2,
+        [
+            os.path.join(root, "PyTemplate", "a.py"),
+            os.path.join(root, "b.txt"),
+            os.path.join(root, "c", "d.txt"),
+        ],
+    )
+    # NOTE: Only files containing an old keyword are opened again.
+    assert manifested_rename(root, path, mapping, True) == (
+        2,
+        [os.path.join(root, "PyTemplate", "a.py")],
+    )
+
+    with open(os.path.join(root, "b.txt"), "a", encoding="utf-8") as f:
+        f.write("PyTemplate\n")
+    count, opened = manifested_rename(root, path, mapping, False)
+    assert count == 3
+    assert os.path.join(root, "b.txt") in opened
+    assert os.path.join(root, "c", "d.txt") not in opened
+
+    # NOTE: Rewritten files are recorded under their new path.
+    assert manifested_rename(root, path, mapping, True) == (0, [])
+
+    # NOTE: A different mapping invalidates every entry.
+    count, opened = manifested_rename(root, path, {"Renamed": "Other"}, True)
+    assert count == 3
+    assert len(opened) == 3
+
+
+def open_index(root: str, directory: str) -> rename.TrigramIndex:
+    """Reopen an index, aged so entries written within the same tick are not racy."""
+    path = os.path.join(directory, "index.json")
+    if os.path.exists(path):
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**10))
+
+    return rename.TrigramIndex(directory, root)
+
+
+def test_trigram_index(tmp_path) -> None:
+    """Test candidates are found from postings, and updates only read changes."""
+    root, directory = str(tmp_path / "root"), str(tmp_path / "index")
+    make_tree(root, ["a.py", "b/c.py", "b/d.txt"])
+    with open(os.path.join(root, "b", "d.txt"), "w", encoding="utf-8") as f:
+        f.write("unrelated\n")
+    with open(os.path.join(root, "e.bin"), "wb") as f:
+        f.write(b"\x00PyTemplate")
+
+    index = open_index(root, directory)
+    assert index.update(never) == 4
+    assert index.candidates(["PyTemplate"]) == {"a.py", "b/c.py"}
+    assert index.candidates(["PyTemplateX", "unrelated"]) == {"b/d.txt"}
+    assert index.candidates(["Py"]) == {"a.py", "b/c.py", "b/d.txt"}
+    index.close()
+
+    index = open_index(root, directory)
+    assert index.update(never) == 0
+    with open(os.path.join(root, "b", "d.txt"), "a", encoding="utf-8") as f:
+        f.write("PyTemplate\n")
+    os.remove(os.path.join(root, "a.py"))
+    assert index.update(never) == 1
+    assert index.candidates(["PyTemplate"]) == {"b/c.py", "b/d.txt"}
+
+    lines: list[str] = []
+    assert rename.where(index, ["PyTemplate"], lines.append) == 2
+    assert lines == ["b/c.py:1: from PyTemplate import 6", "b/d.txt:2: PyTemplate"]
+    index.close()
+
+    # NOTE: Segments are compacted, rather than accumulating without bound.
+    for i in range(2 * rename.TrigramIndex.max_segments):
+        with open(os.path.join(root, "b", "c.py"), "a", encoding="utf-8") as f:
+            f.write(f"{i}\n")
+        index = open_index(root, directory)
+        index.update(never)
+        index.close()
+    assert len(index.segments) <= rename.TrigramIndex.max_segments
+    assert len(os.listdir(directory)) == len(index.segments) + 1
+    assert index.candidates(["PyTemplate"]) == {"b/c.py", "b/d.txt"}
+    index.close()
+
+
+@pytest.mark.parametrize("threshold", [0, 1 << 30])
+def test_bytes_engine(tmp_path, monkeypatch, threshold) -> None:
+    """Test files are spliced as bytes (mapped or read), preserving their encoding."""
+    monkeypatch.setattr(rename, "MMAP_THRESHOLD", threshold)
+    latin = tmp_path / "latin.txt"
+    latin.write_bytes("café PyTemplate\r\n".encode("latin-1"))
+    large = tmp_path / "large.txt"
+    large.write_bytes(b"x = 1\r\n" * 20000 + b"py_template PyTemplate\r\n")
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+
+    replacer = rename.Replacer({"PyTemplate": "Renamed", "py_template": "renamed"})
+    for path in (latin, large, empty):
+        rename.replace_in_file(str(path), "", "", log=never, replacer=replacer)
+
+    assert latin.read_bytes() == "café Renamed\r\n".encode("latin-1")
+    assert large.read_bytes() == b"x = 1\r\n" * 20000 + b"renamed Renamed\r\n"
+    assert empty.read_bytes() == b""
+
+
+@pytest.mark.parametrize("threshold", [0, 1 << 30])
+def test_replace_binary(tmp_path, monkeypatch, threshold) -> None:
+    """Test binary files are left untouched, even without a classifier."""
+    monkeypatch.setattr(rename, "STREAM_THRESHOLD", threshold)
+    path = tmp_path / "blob.bin"
+    path.write_bytes(b"PyTemplate\x00\xff\xfe")
+
+    assert rename.replace_in_file(str(path), "PyTemplate", "Renamed", False, never) == 0
+    assert path.read_bytes() == b"PyTemplate\x00\xff\xfe"
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_stream_splice(seed, monkeypatch) -> None:
+    """Test streamed output is byte identical to splicing whole contents."""
+    rng = random.Random(seed)
+    monkeypatch.setattr(rename, "STREAM_CHUNK", rng.randint(1, 8))
+    replacer = rename.Replacer({"aab": "X", "ab": "", "ba": "aab", "b": "bb"})
+    data = bytes(rng.choice(b"abc") for _ in range(rng.randint(0, 400)))
+
+    streamed = b"".join(replacer.stream_splice(io.BytesIO(data)))
+    assert streamed == replacer.splice(data)
+    assert replacer.stream_find(io.BytesIO(data)) == replacer.find(data)
+
+
+def test_stream_bounded(tmp_path, monkeypatch) -> None:
+    """Test huge files are rewritten in bounded memory, preserving hardlinks."""
+    monkeypatch.setattr(rename, "STREAM_THRESHOLD", 0)
+    monkeypatch.setattr(rename, "STREAM_CHUNK", 1 << 14)
+    line = b"PyTemplate = 'PyTemplate'\r\n"
+    path = tmp_path / "huge.txt"
+    path.touch()
+    os.link(path, tmp_path / "link.txt")
+
+    peaks: list[int] = []
+    for n in (1 << 14, 1 << 16):
+        path.write_bytes(line * n)
+        tracemalloc.start()
+        try:
+            rename.replace_in_file(str(path), "PyTemplate", "Renamed", log=never)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        assert path.read_bytes() == b"Renamed = 'Renamed'\r\n" * n
+
+    assert os.path.samefile(path, tmp_path / "link.txt")
+    assert peaks[1] < 1.5 * peaks[0]
+    assert peaks[1] < len(line) * (1 << 16) // 4
+
+
+def test_telemetry(tmp_path) -> None:
+    """Test counters of a run, and that only the slowest files are retained."""
+    root = str(tmp_path)
+    make_tree(root, ["PyTemplate/a.py", "b.py", "c.txt"])
+    rename.TELEMETRY.reset()
+    with rename.TELEMETRY.phase("rename"):
+        rename.rename_project(root, "PyTemplate", "Renamed", False, "", 1, never, 2)
+
+    report = rename.TELEMETRY.report()
+    assert report["counters"] == {
+        "entries": 4,
+        "stats": 3,
+        "bytes_read": 76,
+        "bytes_written": 67,
+        "files_scanned": 3,
+        "files_written": 3,
+        "renames": 1,
+    }
+    assert report["phases"]["rename"]["wall"] > 0
+    assert len(report["slowest"]) == 3
+
+    telemetry = rename.Telemetry(slowest=2)
+    for i in range(5):
+        telemetry.file(str(i), i / 10)
+    assert [j["path"] for j in telemetry.report()["slowest"]] == ["4", "3"]
+
+
+def test_report_json(tmp_path, monkeypatch, capsys) -> None:
+    """Test only the (json) report is written to stdout, when requested."""
+    make_tree(str(tmp_path), ["PyTemplate/a.py"])
+    argv = ["rename.py", "--path", str(tmp_path), "--new-name", "Renamed"]
+    argv += ["--ignore-backend", "native", "--no-manifest", "--report", "json"]
+    monkeypatch.setattr(sys, "argv", [*argv, "--dry-run", "--profile"])
+    rename.main()
+
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert report["total"] == 2
+    assert report["dry_run"] is True
+    assert report["tracemalloc_peak"] > 0
+    assert set(report["phases"]) == {"setup", "rename", "finish"}
+    assert "Would rename directory" in captured.err
+
+
+def test_buffered_log() -> None:
+    """Test messages are written in batches, and never when quiet."""
+    stream = io.StringIO()
+    log = rename.BufferedLog(stream, batch=2)
+    log("a")
+    assert stream.getvalue() == ""
+    log("b")
+    log("c")
+    assert stream.getvalue() == "a\nb\n"
+    log.flush()
+    assert stream.getvalue() == "a\nb\nc\n"
+
+    quiet = rename.BufferedLog(stream, quiet=True)
+    quiet("d")
+    quiet.flush()
+    assert stream.getvalue() == "a\nb\nc\n"
+
+
+def test_plan_apply(tmp_path, monkeypatch, capsys) -> None:
+    """Test a plan written by --plan is applied by --apply, without a rescan."""
+    root = str(tmp_path / "tree")
+    make_tree(root, ["PyTemplate/a.py", "b.txt"])
+    plan = str(tmp_path / "plan.json")
+    argv = ["rename.py", "--path", root, "--new-name", "Renamed"]
+    argv += ["--ignore-backend", "native", "--no-manifest"]
+    monkeypatch.setattr(sys, "argv", [*argv, "--plan", plan])
+    rename.main()
+
+    assert "Would rename: PyTemplate -> Renamed" in capsys.readouterr().out
+    assert os.path.isdir(os.path.join(root, "PyTemplate"))
+
+    monkeypatch.setattr(sys, "argv", ["rename.py", "--apply", plan])
+    monkeypatch.setattr(rename, "walk", None)
+    rename.main()
+
+    assert "Applied 3 planned operation(s)" in capsys.readouterr().out
+    assert snapshot(root) == {
+        os.path.join("Renamed", "a.py"): "from Renamed import 15\n",
+        "b.txt": "from Renamed import 5\n",
+    }
+
+
+def test_fleet(tmp_path, monkeypatch, capsys) -> None:
+    """Test a fleet is renamed in parallel, and a failure does not stop the rest."""
+    make_tree(str(tmp_path / "a"), ["PyTemplate/a.py"])
+    make_tree(str(tmp_path / "b c"), ["Old.txt"])
+    with open(tmp_path / "fleet.txt", "w", encoding="utf-8") as f:
+        f.write("# comment\n\na\nb c Old=New\nmissing\n")
+    argv = ["rename.py", "--fleet", str(tmp_path / "fleet.txt"), "--report", "json"]
+    argv += ["--ignore-backend", "native", "--new-name", "Renamed", "--no-manifest"]
+    monkeypatch.setattr(sys, "argv", [*argv, "--fleet-jobs", "2"])
+
+    with pytest.raises(SystemExit):
+        rename.main()
+    report = json.loads(capsys.readouterr().out)
+    a, b, missing = report["repositories"]
+    assert (report["total"], report["failed"], report["touched"]) == (3, 1, 3)
+    assert (a["status"], a["new"], a["counters"]["renames"]) == ("ok", "Renamed", 1)
+    assert (b["status"], b["old"], b["new"]) == ("ok", "Old", "New")
+    assert missing["status"] == "failed"
+    assert "NotADirectoryError" in missing["error"]
+    assert not os.path.exists(missing["path"])
+    with open(tmp_path / "a" / "Renamed" / "a.py", encoding="utf-8") as f:
+        assert f.read() == "from Renamed import 15\n"
+
+
+def make_archive(tmp_path, suffix: str, files: dict[str, bytes]) -> str:
+    root = tmp_path / "archive"
+    for name, content in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_bytes(content)
+    base = str(tmp_path / "template")
+    if suffix == ".zip":
+        return shutil.make_archive(base, "zip", root)
+
+    compression = {".tar": "", ".tar.gz": "gz", ".tar.xz": "xz"}[suffix]
+    path = base + suffix
+    with tarfile.open(path, f"w:{compression}") as tar:
+        tar.add(root, "PyTemplate-1.0")
+
+    return path
+
+
+def read_archive(path: str) -> dict[str, bytes]:
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as zf:
+            return {j: zf.read(j) for j in zf.namelist() if not j.endswith("/")}
+
+    with tarfile.open(path) as tar:
+        return {j.name: tar.extractfile(j).read() for j in tar if j.isreg()}
+
+
+@pytest.mark.parametrize("suffix", [".tar", ".tar.gz", ".tar.xz", ".zip"])
+def test_archive(tmp_path, suffix: str) -> None:
+    """Test archive members are renamed and replaced, skipping binary members."""
+    files = {
+        "src/PyTemplate/__init__.py": b'"""PyTemplate Project."""\n',
+        "PyTemplate.png": b"\x89PNG\r\n\x1a\nPyTemplate",
+        "notes.txt": b"Not a template.\n",
+    }
+    source = make_archive(tmp_path, suffix, files)
+    destination = str(tmp_path / f"renamed{suffix}")
+    replacer = rename.Replacer({"PyTemplate": "Renamed"})
+    classifier = rename.Classifier("")
+    logged: list[str] = []
+
+    total = rename.rename_archive(source, destination, replacer, classifier, never)
+    assert classifier.skipped == {"binary": 1}
+    dry_run = rename.rename_archive(
+        source, None, replacer, rename.Classifier(""), logged.append
+    )
+    assert dry_run == total
+    assert all(j.startswith("[DRY RUN]") for j in logged)
+
+    prefix = "" if suffix == ".zip" else "Renamed-1.0/"
+    assert read_archive(destination) == {
+        f"{prefix}src/Renamed/__init__.py": b'"""Renamed Project."""\n',
+        f"{prefix}Renamed.png": b"\x89PNG\r\n\x1a\nPyTemplate",
+        f"{prefix}notes.txt": b"Not a template.\n",
+    }
+
+
+@pytest.mark.parametrize("fmt", [tarfile.PAX_FORMAT, tarfile.GNU_FORMAT])
+def test_archive_long_names(tmp_path, fmt: int) -> None:
+    """Test members with paths beyond a tar header (100 characters) are renamed."""
+    name = "PyTemplate-1.0/" + "nested/" * 15 + "PyTemplate.txt"
+    link = "PyTemplate-1.0/" + "linked/" * 15 + "PyTemplate.txt"
+    source = str(tmp_path / "template.tar")
+    with tarfile.open(source, "w", format=fmt) as tar:
+        info = tarfile.TarInfo(name)
+        info.size = 11
+        tar.addfile(info, io.BytesIO(b"PyTemplate\n"))
+        hardlink = tarfile.TarInfo(link)
+        hardlink.type = tarfile.LNKTYPE
+        hardlink.linkname = name
+        tar.addfile(hardlink)
+
+    destination = str(tmp_path / "renamed.tar")
+    replacer = rename.Replacer({"PyTemplate": "Renamed"})
+    assert rename.rename_archive(source, destination, replacer, None, never) == 2
+
+    with tarfile.open(destination) as tar:
+        members = tar.getmembers()
+        assert [j.name for j in members] == [
+            replacer.sub(name),
+            replacer.sub(link),
+        ]
+        assert members[1].linkname == replacer.sub(name)
+        assert tar.extractfile(members[0]).read() == b"Renamed\n"
+
+
+def test_archive_bounded(tmp_path, monkeypatch) -> None:
+    """Test archive members are streamed in bounded memory."""
+    # NOTE: Uncompressed, since a highly compressible member inflates in bursts.
+    monkeypatch.setattr(rename, "STREAM_CHUNK", 1 << 14)
+    replacer = rename.Replacer({"PyTemplate": "Renamed"})
+    line = b"PyTemplate = 'PyTemplate'\n"
+
+    peaks: list[int] = []
+    for n in (1 << 14, 1 << 16):
+        source = make_archive(tmp_path, ".tar", {"huge.txt": line * n})
+        destination = str(tmp_path / "renamed.tar")
+        tracemalloc.start()
+        try:
+            rename.rename_archive(source, destination, replacer, None, never)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        assert read_archive(destination)["Renamed-1.0/huge.txt"] == (
+            b"Renamed = 'Renamed'\n" * n
+        )
+
+    assert peaks[1] < 1.5 * peaks[0]
+    assert peaks[1] < len(line) * (1 << 16) // 4
+
+
+def test_archive_stdio(tmp_path, monkeypatch, capsys) -> None:
+    """Test an archive written to stdout is not interleaved with any message."""
+    source = make_archive(tmp_path, ".tar", {"PyTemplate.txt": b"PyTemplate\n"})
+    output = io.BytesIO()
+    stdout = io.TextIOWrapper(output)
+    argv = ["rename.py", "--archive", source, "--output", "-", "--new-name", "New"]
+    monkeypatch.setattr(sys, "argv", argv)
+    monkeypatch.setattr(sys, "stdout", stdout)
+    rename.main()
+    stdout.flush()
+
+    output.seek(0)
+    with tarfile.open(fileobj=output) as tar:
+        assert tar.extractfile("New-1.0/New.txt").read() == b"New\n"
+    assert "Modified 2 archive member(s)" in capsys.readouterr().err
+
+    monkeypatch.setattr(sys, "argv", argv[:-4])
+    with pytest.raises(SystemExit, match="--new-name"):
+        rename.main()
+    monkeypatch.setattr(sys, "argv", argv[:-4] + argv[-2:])
+    with pytest.raises(SystemExit, match="--output"):
+        rename.main()
+
+
+def test_throttle(monkeypatch) -> None:
+    """Test each token bucket holds a second of tokens, and sleeps off any debt."""
+    clock: list[float] = [100.0]
+    slept: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        slept.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(rename.time, "sleep", sleep)
+    monkeypatch.setattr(rename.time, "monotonic", lambda: clock[0])
+    rename.TELEMETRY.reset()
+
+    throttle = rename.Throttle()
+    throttle(1 << 30)
+    assert not throttle
+    assert slept == []
+
+    throttle.configure(1000, 10)
+    throttle(1000, 0)
+    throttle(500, 0)
+    for _ in range(15):
+        throttle()
+    assert slept == pytest.approx([0.5] + [0.1] * 5)
+    assert rename.TELEMETRY.report()["throttled_seconds"] == pytest.approx(1.0)
+
+    clock[0] += 10
+    throttle(1000, 10)
+    assert len(slept) == 6
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("20M", (20 << 20, None)), ("1K,50", (1 << 10, 50.0)), (",0.5", (None, 0.5))],
+)
+def test_parse_io_limit(value: str, expected) -> None:
+    """Test I/O limits are parsed as bytes[,ops] per second."""
+    assert rename.parse_io_limit(value) == expected
+    with pytest.raises(argparse.ArgumentTypeError):
+        rename.parse_io_limit(value + "x")
+
+
+def test_io_limit(tmp_path, monkeypatch, capsys) -> None:
+    """Test the walker, readers, and writers respect an I/O limit."""
+    slept: list[float] = []
+    monkeypatch.setattr(rename.time, "sleep", slept.append)
+    monkeypatch.setattr(rename, "THROTTLE", rename.Throttle())
+    make_tree(str(tmp_path), ["PyTemplate/a.py", "b.py"])
+    argv = ["rename.py", "--path", str(tmp_path), "--new-name", "Renamed"]
+    argv += ["--ignore-backend", "native", "--no-manifest", "--no-journal"]
+    monkeypatch.setattr(sys, "argv", [*argv, "--io-limit", "10,1", "--report", "json"])
+    rename.main()
+
+    report = json.loads(capsys.readouterr().out)
+    assert report["throttled_seconds"] == pytest.approx(sum(slept))
+    assert report["throttled_seconds"] > 1
+    assert snapshot(str(tmp_path))["b.py"] == "from Renamed import 4\n"
+
+
+def test_lower_priority(monkeypatch) -> None:
+    """Test both CPU and I/O priority are lowered, or a warning is logged."""
+    calls: list[Any] = []
+    monkeypatch.setattr(rename.os, "nice", calls.append, raising=False)
+    monkeypatch.setattr(rename.shutil, "which", lambda name: None)
+    logged: list[str] = []
+    rename.lower_priority(logged.append)
+
+    assert calls == [10]
+    assert "ionice is unavailable" in logged[0]
+
+    monkeypatch.setattr(rename.shutil, "which", lambda name: name)
+    monkeypatch.setattr(
+        rename.subprocess,
+        "run",
+        lambda args, **kwargs: (
+            calls.append(args) or argparse.Namespace(returncode=1, stderr=b"denied")
+        ),
+    )
+    rename.lower_priority(logged.append)
+    assert calls[-1][:5] == ["ionice", "-c", "2", "-n", "7"]
+    assert logged[-1] == "[Warning] ionice failed: denied"
+
+
+def test_match_index(tmp_path) -> None:
+    """Test matches are indexed by line and column, and written as json lines."""
+    replacer = rename.Replacer({"PyTemplate": "Renamed", "Template": "Form"})
+    (tmp_path / "a.txt").write_bytes(
+        b"PyTemplate\nx Template PyTemplate\r\n\n  Template"
+    )
+    (tmp_path / "b.txt").write_bytes(b"")
+    index = rename.MatchIndex(str(tmp_path), replacer)
+
+    assert index.scan(str(tmp_path / "b.txt")) == 0
+    assert index.scan(str(tmp_path / "a.txt")) == 4
+    assert index.add("c.txt", b"Template") == 1
+    assert list(index.lines) == [1, 2, 2, 4, 1]
+    assert list(index.columns) == [1, 3, 12, 3, 1]
+    assert list(index.file_ids) == [0, 0, 0, 0, 1]
+    assert index.paths == ["a.txt", "c.txt"]
+
+    stream = io.BytesIO()
+    index.jsonl(stream)
+    records = [json.loads(j) for j in stream.getvalue().splitlines()]
+    assert len(records) == len(index) == 5
+    assert records[1] == {
+        "path": "a.txt",
+        "line": 2,
+        "column": 3,
+        "offset": 13,
+        "old": "Template",
+        "new": "Form",
+    }
+
+
+def test_match_index_bounded(tmp_path) -> None:
+    """Test each match is held in a few machine words, not python objects."""
+    n = 1 << 16
+    (tmp_path / "a.txt").write_bytes(b"PyTemplate PyTemplate\n" * n)
+    index = rename.MatchIndex(str(tmp_path), rename.Replacer({"PyTemplate": "X"}))
+    tracemalloc.start()
+    try:
+        index.scan(str(tmp_path / "a.txt"))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert len(index) == 2 * n
+    assert peak < 2 * n * 64
+
+
+def test_match_diff(tmp_path, monkeypatch, capsys) -> None:
+    """Test matches are reported as a unified diff of the dry run, file by file."""
+    lines = [f"{j}\n" for j in "abcdefghijklmnop"]
+    lines[2] = "import PyTemplate\n"
+    lines[3] = "PyTemplate.x = 1\n"
+    lines[12] = "PyTemplate"
+    root = tmp_path / "tree"
+    (root / "PyTemplate").mkdir(parents=True)
+    (root / "PyTemplate" / "a.py").write_text("".join(lines[:13]))
+    (root / "PyTemplate" / "c.txt").write_text("c\n")
+    (root / "b.txt").write_text("PyTemplate\n")
+    output = str(tmp_path / "matches.diff")
+    argv = ["rename.py", "--path", str(root), "--new-name", "Renamed", "--jobs", "2"]
+    argv += ["--ignore-backend", "native", "--no-manifest", "--matches", output]
+    monkeypatch.setattr(sys, "argv", [*argv, "--matches-format", "diff"])
+    rename.main()
+
+    assert "Reported 4 match(es) within 2 file(s)" in capsys.readouterr().out
+    assert os.path.isdir(root / "PyTemplate")
+    with open(output, "r", encoding="utf-8") as f:
+        assert f.read() == (
+            "diff --git a/PyTemplate/a.py b/Renamed/a.py\n"
+            "rename from PyTemplate/a.py\n"
+            "rename to Renamed/a.py\n"
+            "--- a/PyTemplate/a.py\n"
+            "+++ b/Renamed/a.py\n"
+            "@@ -1,7 +1,7 @@\n a\n b\n"
+            "-import PyTemplate\n-PyTemplate.x = 1\n"
+            "+import Renamed\n+Renamed.x = 1\n"
+            " e\n f\n g\n"
+            "@@ -10,4 +10,4 @@\n j\n k\n l\n"
+            "-PyTemplate\n\\ No newline at end of file\n"
+            "+Renamed\n\\ No newline at end of file\n"
+            "diff --git a/PyTemplate/c.txt b/Renamed/c.txt\n"
+            "similarity index 100%\n"
+            "rename from PyTemplate/c.txt\n"
+            "rename to Renamed/c.txt\n"
+            "diff --git a/b.txt b/b.txt\n"
+            "--- a/b.txt\n"
+            "+++ b/b.txt\n"
+            "@@ -1,1 +1,1 @@\n-PyTemplate\n+Renamed\n"
+        )